@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+多路批量推理基准：N 路设备各自以目标帧率产生画面，对比逐路推理 (max_batch=1) 与批量调度的每路开销。
+
+用法:
+    python benchmarks/bench_batch.py [--streams 1,2,4,8] [--seconds 5] [--model yolov8n.pt]
+
+没有权重文件时使用 yolov8n.yaml 构建同结构的未训练模型 (计算量相同，检测结果无意义)。
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+from ultralytics.utils import ASSETS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import config  # noqa: E402
+from services.batch_scheduler import BatchScheduler  # noqa: E402
+from services.state import AppState  # noqa: E402
+from services.vision_service import VisionService  # noqa: E402
+
+
+def run(vision, n_streams: int, max_batch: int, seconds: float, fps: float):
+    sched = BatchScheduler(vision, max_batch=max_batch)
+    states = [AppState() for _ in range(n_streams)]
+    streams = [sched.register(f"dev{i}", lambda s=s: s.frame, fps=fps) for i, s in enumerate(states)]
+    frame = cv2.resize(cv2.imread(str(ASSETS / "bus.jpg")), (640, 480))
+    stop = threading.Event()
+
+    def camera():
+        """每路以目标帧率更新画面 (模拟各自的相机线程)"""
+        while not stop.is_set():
+            for s in states:
+                s.update_frame(frame, time.time())
+            time.sleep(1.0 / fps)
+
+    def consumer(stream):
+        while not stop.is_set():
+            stream.get(timeout=0.1)
+
+    threads = [threading.Thread(target=camera, daemon=True)]
+    threads += [threading.Thread(target=consumer, args=(s,), daemon=True) for s in streams]
+    for t in threads:
+        t.start()
+    sched.start()
+    time.sleep(1.0)  # 预热
+    base = sched.get_stats()
+    time.sleep(seconds)
+    stats = sched.get_stats()
+    sched.stop()
+    stop.set()
+
+    frames = stats["frames"] - base["frames"]
+    batches = stats["batches"] - base["batches"]
+    busy_ms = stats["ms_per_frame"] * stats["frames"] - base["ms_per_frame"] * base["frames"]
+    return {
+        "fps_per_stream": frames / seconds / n_streams,
+        "ms_per_frame": busy_ms / frames if frames else 0.0,
+        "avg_batch": frames / batches if batches else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", default="1,2,4,8")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=config.STREAM_FPS_TARGET, help="每路目标帧率")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    args = parser.parse_args()
+
+    model = args.model if os.path.exists(args.model) else "yolov8n.yaml"
+    vision = VisionService(model)
+    print(f"model={model}, imgsz={config.IMG_SIZE}, 每路目标 {args.fps:.0f} FPS, 采样 {args.seconds:.0f}s")
+    print(f"{'streams':>7} | {'逐路 ms/帧':>10} {'FPS/路':>7} | {'批量 ms/帧':>10} {'FPS/路':>7} {'平均批':>6}")
+    for n in (int(x) for x in args.streams.split(",")):
+        single = run(vision, n, 1, args.seconds, args.fps)
+        batched = run(vision, n, n, args.seconds, args.fps)
+        print(f"{n:>7} | {single['ms_per_frame']:>10.1f} {single['fps_per_stream']:>7.1f} | "
+              f"{batched['ms_per_frame']:>10.1f} {batched['fps_per_stream']:>7.1f} {batched['avg_batch']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
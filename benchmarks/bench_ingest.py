@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+相机接入基准：N 路 MJPEG 相机，对比每台相机一个线程 (CameraService) 与单事件循环接入引擎
+(CameraIngestEngine) 的每路 CPU 开销与线程数。
+
+用法:
+    python benchmarks/bench_ingest.py [--streams 1,8,32] [--fps 20] [--seconds 5] [--no-decode]
+
+模拟相机在独立子进程中以 aiohttp 推送 640x480 JPEG (multipart 带 Content-Length，与 ESP32 固件一致)；
+两种接入方式也各自在独立子进程中运行，只统计接入进程的 CPU 时间。
+--no-decode 时两种方式都跳过 JPEG 解码，只比较连接读取与分帧本身的开销。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# =========================
+# 模拟相机 (子进程)
+# =========================
+def serve_cameras(port: int, fps: float) -> None:
+    """每个 /stream/<i> 连接以 fps 推送同一张 JPEG"""
+    import asyncio
+
+    import cv2
+    from aiohttp import web
+    from ultralytics.utils import ASSETS
+
+    from services.video_broadcaster import make_chunk
+
+    frame = cv2.resize(cv2.imread(str(ASSETS / "bus.jpg")), (640, 480))
+    jpg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+    async def stream(request):
+        resp = web.StreamResponse(headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame"})
+        await resp.prepare(request)
+        loop = asyncio.get_running_loop()
+        next_ts = loop.time()
+        seq = 0
+        try:
+            while True:
+                seq += 1
+                await resp.write(make_chunk(jpg, seq))
+                next_ts += 1.0 / fps
+                await asyncio.sleep(max(0.0, next_ts - loop.time()))
+        except ConnectionError:
+            pass  # 接入进程已退出
+        return resp
+
+    async def ready(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/stream/{i}", stream)
+    app.router.add_get("/ready", ready)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+# =========================
+# 接入进程 (子进程)
+# =========================
+def run_client(mode: str, n: int, port: int, seconds: float, decode: bool) -> None:
+    """以指定方式接入 n 路相机，预热后采样 seconds 秒，输出 JSON 结果"""
+    import cv2
+    import numpy as np
+
+    if not decode:
+        stub = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.imdecode = lambda buf, flags: stub
+
+    from services.state import AppState
+
+    states = [AppState() for _ in range(n)]
+    urls = [f"http://127.0.0.1:{port}/stream/{i}" for i in range(n)]
+    if mode == "thread":
+        from services.camera_service import CameraService
+        cams = [CameraService(s, url=u) for s, u in zip(states, urls)]
+    else:
+        from services.camera_ingest import CameraIngestEngine
+        engine = CameraIngestEngine()
+        for i, (s, u) in enumerate(zip(states, urls)):
+            engine.add_mjpeg(f"cam{i}", u, s)
+
+    time.sleep(2.0)  # 预热 (建立连接)
+    seq0 = [s.frame.seq for s in states]
+    cpu0, t0 = time.process_time(), time.time()
+    time.sleep(seconds)
+    cpu1, t1 = time.process_time(), time.time()
+    frames = sum(s.frame.seq for s in states) - sum(seq0)
+    print(json.dumps({
+        "cpu_ms_per_s": (cpu1 - cpu0) / (t1 - t0) * 1000.0,
+        "fps": frames / (t1 - t0),
+        "threads": threading.active_count(),
+    }))
+    sys.stdout.flush()
+    os._exit(0)  # 相机线程无法快速退出，直接结束子进程
+
+
+def measure(mode: str, n: int, port: int, seconds: float, decode: bool) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--client", mode, "--n", str(n),
+           "--port", str(port), "--seconds", str(seconds)]
+    if not decode:
+        cmd.append("--no-decode")
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("camera simulator did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", default="1,8,32")
+    parser.add_argument("--fps", type=float, default=20.0, help="每路相机帧率")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--no-decode", action="store_true", help="跳过 JPEG 解码，只比较读取与分帧")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--client", choices=("thread", "async"), help=argparse.SUPPRESS)
+    parser.add_argument("--n", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_cameras(args.port, args.fps)
+        return
+    if args.client:
+        run_client(args.client, args.n, args.port, args.seconds, not args.no_decode)
+        return
+
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve",
+                               "--port", str(args.port), "--fps", str(args.fps)])
+    try:
+        wait_ready(args.port)
+        decode = not args.no_decode
+        print(f"640x480 JPEG @ {args.fps:.0f} FPS/路, 解码={'是' if decode else '否'}, 采样 {args.seconds:.0f}s")
+        print(f"{'streams':>7} | {'线程 CPU ms/s/路':>15} {'FPS/路':>7} {'线程数':>6} | "
+              f"{'事件循环 CPU ms/s/路':>19} {'FPS/路':>7} {'线程数':>6}")
+        for n in (int(x) for x in args.streams.split(",")):
+            t = measure("thread", n, args.port, args.seconds, decode)
+            a = measure("async", n, args.port, args.seconds, decode)
+            print(f"{n:>7} | {t['cpu_ms_per_s'] / n:>15.1f} {t['fps'] / n:>7.1f} {t['threads']:>6} | "
+                  f"{a['cpu_ms_per_s'] / n:>19.1f} {a['fps'] / n:>7.1f} {a['threads']:>6}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
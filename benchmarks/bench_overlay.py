@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+HUD 渲染基准：ultralytics Results.plot() + draw_hud  vs  OverlayRenderer
+
+不需要模型权重：用合成检测结果构造 ultralytics Results 对象，
+对同一帧分别执行两种渲染 (均包含 JPEG 编码前的全部绘制工作)，统计每帧耗时。
+另外单独统计每帧文字 (HUD 四行 + 标签) 的绘制耗时：逐帧 cv2.putText 与
+"首次渲染成位图、之后按不透明度混合" 的字形缓存方案对比，用于判断文字是否值得缓存。
+
+用法:
+    python benchmarks/bench_overlay.py [--frames 300] [--boxes 8] [--width 640 --height 480]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+from ultralytics.utils import ASSETS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import config  # noqa: E402
+from services.overlay_renderer import OverlayRenderer  # noqa: E402
+
+# COCO 前 80 类中与本项目相关的几个类别编号
+NAMES = {0: "person", 1: "bicycle", 2: "car", 39: "bottle", 41: "cup", 56: "chair", 67: "cell phone"}
+
+
+def make_detections(n: int, w: int, h: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    classes = list(NAMES)
+    rows, boxes = [], []
+    for _ in range(n):
+        x1, y1 = rng.uniform(0, w * 0.7), rng.uniform(0, h * 0.7)
+        x2, y2 = x1 + rng.uniform(30, w * 0.3), y1 + rng.uniform(30, h * 0.3)
+        conf, cls = float(rng.uniform(0.4, 0.95)), int(rng.choice(classes))
+        rows.append([x1, y1, x2, y2, conf, cls])
+        boxes.append({"label": NAMES[cls], "conf": conf, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+    return torch.tensor(rows, dtype=torch.float32), boxes
+
+
+def draw_hud_legacy(annotated, fps, delay, count, level):
+    """原 VisionService.render_hud 的逐帧 putText 绘制 (已由 OverlayRenderer 取代，保留于此作对照)"""
+    cv2.putText(annotated, f"FPS: {fps:.1f}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(annotated, f"Delay: {delay:.0f} ms", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(annotated, f"Count: {count}", (10, 75), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    if level > 0:
+        cv2.putText(annotated, f"ALERT L{level}", (10, 105), cv2.FONT_HERSHEY_SIMPLEX, 0.85, (0, 0, 255), 2)
+    return annotated
+
+
+class GlyphCache:
+    """对照方案：文字首次出现时渲染成不透明度位图并缓存，之后逐帧混合到画面 (与 putText 逐像素一致)"""
+
+    def __init__(self):
+        self._glyphs = {}
+
+    def draw(self, img, text, org, scale, color, thickness, line_type=cv2.LINE_8):
+        key = (text, scale, color, thickness, line_type)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            pad = thickness + 2
+            alpha = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+            cv2.putText(alpha, text, (pad, pad + h), cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness, line_type)
+            glyph = self._glyphs[key] = (alpha[..., None].astype(np.uint16), np.array(color, np.uint16), pad, pad + h)
+        a, c, dx, dy = glyph
+        x, y = org[0] - dx, org[1] - dy
+        roi = img[y:y + a.shape[0], x:x + a.shape[1]]
+        roi[:] = (roi * (255 - a) + c * a + 127) // 255
+
+
+def draw_texts(draw, img, i, captions):
+    """一帧的全部文字：HUD 四行 + 关注类别标签"""
+    draw(img, f"FPS: {20.0 + i % 10:.1f}", (10, 25), 0.7, (0, 255, 0), 2)
+    draw(img, f"Delay: {80 + i % 50:.0f} ms", (10, 50), 0.7, (0, 255, 0), 2)
+    draw(img, f"Count: {len(captions)}", (10, 75), 0.7, (0, 255, 0), 2)
+    draw(img, "ALERT L2", (10, 105), 0.85, (0, 0, 255), 2)
+    for k, caption in enumerate(captions):
+        draw(img, caption, (120, 150 + 30 * k), 2 / 3, (255, 255, 255), 1, cv2.LINE_AA)
+
+
+def put_text(img, text, org, scale, color, thickness, line_type=cv2.LINE_8):
+    cv2.putText(img, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, line_type)
+
+
+def bench(fn, frames: int):
+    for _ in range(10):  # 预热
+        fn(0)
+    samples = []
+    for i in range(frames):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return sum(samples) / len(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--boxes", type=int, default=8)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    frame = cv2.resize(cv2.imread(str(ASSETS / "bus.jpg")), (args.width, args.height))
+    det, boxes = make_detections(args.boxes, args.width, args.height)
+    results = Results(frame, path="bench", names=NAMES, boxes=det)
+    renderer = OverlayRenderer({v: k for k, v in NAMES.items()})
+    search_box = boxes[-1]
+
+    def legacy(i):
+        draw_hud_legacy(results.plot(), 20.0 + i % 10, 80 + i % 50, len(boxes), 2)
+
+    def light(i):
+        renderer.render(frame, boxes, 20.0 + i % 10, 80 + i % 50, 2, search_box)
+
+    print(f"帧尺寸 {args.width}x{args.height}, 检测框 {args.boxes} 个 "
+          f"(其中关注类别 {sum(b['label'] in config.ALERT_CLASSES for b in boxes)} 个), {args.frames} 帧")
+    results_ms = {}
+    for name, fn in (("Results.plot + draw_hud", legacy), ("OverlayRenderer", light)):
+        mean, p50, p95 = bench(fn, args.frames)
+        results_ms[name] = mean
+        print(f"{name:<26} mean {mean:6.2f} ms   p50 {p50:6.2f} ms   p95 {p95:6.2f} ms")
+
+    captions = [f"{b['label']} {b['conf']:.2f}" for b in boxes if b["label"] in config.ALERT_CLASSES]
+    captions.append(f"{search_box['label']} {search_box['conf']:.2f}")
+    canvas = frame.copy()
+    glyphs = GlyphCache()
+    print(f"\n每帧文字 ({4 + len(captions)} 段) 绘制耗时:")
+    for name, draw in (("cv2.putText", put_text), ("GlyphCache blend", glyphs.draw)):
+        mean, p50, p95 = bench(lambda i: draw_texts(draw, canvas, i, captions), args.frames)
+        share = mean / results_ms["OverlayRenderer"] * 100
+        print(f"{name:<26} mean {mean:6.3f} ms   p50 {p50:6.3f} ms   p95 {p95:6.3f} ms   "
+              f"(占 OverlayRenderer {share:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
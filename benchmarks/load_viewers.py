@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+观看者负载测试：逐步增加 /video + /events 观看者，观察处理循环帧率与服务端线程数。
+
+两种模式:
+    # 对运行中的服务 (python main.py) 施压，帧率取自 /detect 的 fps_infer，线程数取自 /metrics
+    python benchmarks/load_viewers.py --url http://127.0.0.1:5000
+
+    # 不需要模型与相机：在子进程中启动合成处理循环 (模拟推理 + HUD 渲染 + 编码)，
+    # 分别用 async / flask 两种服务器对比
+    python benchmarks/load_viewers.py --synthetic --backend async
+    python benchmarks/load_viewers.py --synthetic --backend flask
+
+每个"观看者"相当于一个浏览器页面：一条 /video 连接 + 一条 /events 连接。
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# =========================
+# 合成服务端 (子进程)
+# =========================
+def serve_synthetic(backend: str, port: int) -> None:
+    """启动合成处理循环与指定的 Web 服务器 (阻塞)"""
+    import cv2
+    import numpy as np
+    from flask import Flask, Response, jsonify, request
+    from ultralytics.utils import ASSETS
+
+    from services import config
+    from services.async_server import run_async_server
+    from services.device_registry import DeviceRegistry
+    from services.overlay_renderer import OverlayRenderer
+    from services.video_broadcaster import resolve_profile
+
+    devices = DeviceRegistry()
+    session = devices.add("default", "127.0.0.1")
+    state, payloads, hub = session.state, session.payloads, session.video_hub
+    renderer = OverlayRenderer()
+    stats = {"frames": 0, "ts": time.time()}
+
+    frame = cv2.resize(cv2.imread(str(ASSETS / "bus.jpg")), (640, 480))
+    boxes = [{"label": "person", "conf": 0.9, "x1": 50.0, "y1": 120.0, "x2": 200.0, "y2": 420.0},
+             {"label": "bus", "conf": 0.8, "x1": 220.0, "y1": 60.0, "x2": 600.0, "y2": 400.0}]
+    weights = np.random.default_rng(0).standard_normal((384, 384)).astype(np.float32)
+
+    def fake_inference():
+        """模拟推理：一段释放 GIL 的数值计算 + 一段持有 GIL 的 Python 后处理"""
+        x = weights
+        for _ in range(8):
+            x = np.tanh(x @ weights)
+        acc = 0.0
+        for i in range(50000):
+            acc += i * 0.5
+        return acc
+
+    def processing_loop():
+        """与 main.processing_loop 相同的节奏：按 INFER_INTERVAL 限速"""
+        next_infer = 0.0
+        while True:
+            now = time.time()
+            if now < next_infer:
+                time.sleep(0.003)
+                continue
+            next_infer = now + config.INFER_INTERVAL
+            seq = state.update_frame(frame, time.time())
+            t0 = time.perf_counter()
+            fake_inference()
+            infer_ms = (time.perf_counter() - t0) * 1000.0
+            if hub.wants_frames:
+                hub.publish_frame(renderer.render(frame, boxes, 1000.0 / infer_ms, infer_ms, 1))
+            state.update_alert(1, "注意", None, False)
+            state.update_detection(boxes, infer_ms, 1000.0 / infer_ms, infer_ms, seq)
+            stats["frames"] += 1
+
+    app = Flask(__name__)
+
+    @app.get("/detect")
+    def detect():
+        return Response(payloads.current()[1], mimetype="application/json")
+
+    @app.get("/events")
+    def events():
+        def gen():
+            version, msg = payloads.snapshot_event()
+            yield msg
+            while True:
+                if state.wait_for_version(version, config.PUSH_KEEPALIVE_INTERVAL) == version:
+                    yield b": keepalive\n\n"
+                    continue
+                version, msg = payloads.delta_event(version)
+                if msg:
+                    yield msg
+                time.sleep(config.PUSH_MIN_INTERVAL)
+        return Response(gen(), mimetype="text/event-stream")
+
+    @app.get("/video")
+    def video():
+        profile = resolve_profile(request.args.get("profile"), request.args.get("kbps", type=float))
+        return Response(hub.stream(profile), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+    @app.get("/metrics")
+    def metrics():
+        return jsonify({
+            "server": {"backend": backend, "threads": threading.active_count()},
+            "synthetic": {"frames": stats["frames"], "ts": time.time()},
+        })
+
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    threading.Thread(target=processing_loop, daemon=True).start()
+    if backend == "async":
+        run_async_server(app, devices, host="127.0.0.1", port=port)
+    else:
+        app.run(host="127.0.0.1", port=port, threaded=True)
+
+
+# =========================
+# 负载驱动 (客户端)
+# =========================
+class Viewer:
+    """一个浏览器页面：持续读取 /video 与 /events"""
+
+    def __init__(self, session: aiohttp.ClientSession, base: str, profile: str):
+        self.frames = 0
+        self.tasks = [
+            asyncio.ensure_future(self._read(session, f"{base}/video?profile={profile}", b"--frame")),
+            asyncio.ensure_future(self._read(session, f"{base}/events", None)),
+        ]
+
+    async def _read(self, session, url, marker):
+        try:
+            async with session.get(url) as resp:
+                async for chunk in resp.content.iter_any():
+                    if marker:
+                        self.frames += chunk.count(marker)
+        except (aiohttp.ClientError, asyncio.CancelledError):
+            pass
+
+    def close(self):
+        for t in self.tasks:
+            t.cancel()
+
+
+async def sample(session, base: str, duration: float):
+    """采样 duration 秒：返回 (处理循环帧率, 推理帧率, 线程数)"""
+    async def metrics():
+        async with session.get(f"{base}/metrics") as resp:
+            return await resp.json()
+
+    async def detect():
+        async with session.get(f"{base}/detect") as resp:
+            return await resp.json(content_type=None)
+
+    m0 = await metrics()
+    fps_samples = []
+    t_end = time.time() + duration
+    while time.time() < t_end:
+        fps_samples.append((await detect()).get("fps_infer", 0.0))
+        await asyncio.sleep(0.25)
+    m1 = await metrics()
+
+    loop_fps = None
+    if "synthetic" in m0:
+        s0, s1 = m0["synthetic"], m1["synthetic"]
+        loop_fps = (s1["frames"] - s0["frames"]) / max(s1["ts"] - s0["ts"], 1e-6)
+    infer_fps = sum(fps_samples) / len(fps_samples) if fps_samples else 0.0
+    return loop_fps, infer_fps, m1.get("server", {}).get("threads")
+
+
+async def drive(base: str, steps, duration: float, profile: str) -> None:
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        viewers = []
+        print(f"{'viewers':>8} {'threads':>8} {'loop fps':>9} {'infer fps':>10} {'video fps/viewer':>17}")
+        for n in steps:
+            while len(viewers) < n:
+                viewers.append(Viewer(session, base, profile))
+            await asyncio.sleep(1.0)  # 等待连接建立
+            start = [v.frames for v in viewers]
+            t0 = time.time()
+            loop_fps, infer_fps, threads = await sample(session, base, duration)
+            elapsed = time.time() - t0
+            per_viewer = (sum(v.frames for v in viewers) - sum(start)) / elapsed / n if n else 0.0
+            loop_col = f"{loop_fps:9.1f}" if loop_fps is not None else f"{'-':>9}"
+            print(f"{n:>8} {threads if threads is not None else '-':>8} {loop_col} "
+                  f"{infer_fps:10.1f} {per_viewer:17.1f}")
+        for v in viewers:
+            v.close()
+        await asyncio.gather(*(t for v in viewers for t in v.tasks), return_exceptions=True)
+
+
+def wait_ready(base: str, timeout: float = 30.0) -> None:
+    import urllib.request
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base}/metrics", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="对运行中的服务施压 (如 http://127.0.0.1:5000)")
+    parser.add_argument("--synthetic", action="store_true", help="在子进程中启动合成服务端")
+    parser.add_argument("--backend", choices=("async", "flask"), default="async")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--steps", default="0,8,16,32,48", help="逐步增加到的观看者数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每档采样秒数")
+    parser.add_argument("--profile", default="low", help="观看者请求的视频档位")
+    parser.add_argument("--serve-synthetic", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_synthetic:
+        serve_synthetic(args.backend, args.port)
+        return
+
+    steps = [int(s) for s in args.steps.split(",")]
+    if args.synthetic:
+        base = f"http://127.0.0.1:{args.port}"
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-synthetic",
+                                 "--backend", args.backend, "--port", str(args.port)])
+        try:
+            wait_ready(base)
+            print(f"synthetic server, backend={args.backend}")
+            asyncio.run(drive(base, steps, args.duration, args.profile))
+        finally:
+            proc.terminate()
+            proc.wait()
+    elif args.url:
+        asyncio.run(drive(args.url.rstrip("/"), steps, args.duration, args.profile))
+    else:
+        parser.error("需要 --url 或 --synthetic")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,24 @@
 import time
 import threading
-from flask import Flask, jsonify, Response, render_template
+from flask import Flask, abort, jsonify, Response, render_template, request
 from flask.wrappers import Response as FlaskResponse
 from flask_cors import CORS
 
 from services import config
-from services.state import AppState
+from services.alert_filter import AlertFilter
+from services.device_registry import DeviceRegistry, DeviceSession
+from services.video_broadcaster import resolve_profile
+from services.async_server import AIOHTTP_AVAILABLE, run_async_server
+from services.inference_pool import InferencePool
+from services.batch_scheduler import BatchScheduler
 from services.vision_service import VisionService
 from services.audio_service import AudioService
 from services.camera_service import CameraService
+from services.camera_ingest import CameraIngestEngine
+from services.camera_link import CameraLink, CameraPushServer
+from services.camera_controller import CameraRateController
+from services.imu_service import ImuService, ImuTrack
+from services.search_refine import SearchRefiner
 from services.microphone_service import MicrophoneService
 
 
@@ -22,89 +32,176 @@ CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 from services.api_docs import init_api_docs
 init_api_docs(app)
 
-# 初始化核心服务组件
-state = AppState()
+# 初始化共享服务组件 (所有设备会话共用)
 vision = VisionService()
-audio = AudioService(state)
-camera = CameraService(state)
-mic = MicrophoneService()
+mic = MicrophoneService(port=config.MIC_TCP_PORT)
 
-# 根据配置选择语音服务模式
-voice_ai = VoiceAssistant(state, audio)
-mic.set_callback(voice_ai.on_recording_complete)
-print("Main: Using VoiceAssistant")
+# 实际使用的 Web 服务器 (启动时确定，见 __main__)
+server_backend = "flask"
+# 推理进程池 (INFER_WORKERS >= 1 时在 __main__ 中创建，只服务默认设备)
+infer_pool = None
+# 多路批量推理调度器：每台设备登记为一路，合并为批量前向
+scheduler = BatchScheduler(vision)
+# 相机接入引擎：所有设备的相机连接由一个事件循环线程持有 (CAMERA_INGEST=thread 时每台相机一个线程)
+camera_engine = None
+if config.CAMERA_INGEST == "async":
+    if AIOHTTP_AVAILABLE:
+        camera_engine = CameraIngestEngine()
+    else:
+        print("[Camera] aiohttp not installed, falling back to one thread per camera")
+# 处理循环是否已启动 (运行中新建的会话立即启动自己的处理循环)
+loops_started = False
 
 
-def processing_loop() -> None:
+def attach_device(session: DeviceSession) -> None:
     """
-    核心处理循环 (Backbone Loop)。
+    为新设备会话挂载设备服务：相机 (接入引擎中的一路或独立线程)、扬声器、语音助手与推理流。
+    语音助手共用第一台设备的 API 客户端、线程池与 VLM/TTS 缓存。
+    """
+    session.audio = AudioService(session.state, host=session.ip)
+    if camera_engine is not None:
+        session.camera = camera_engine.add_mjpeg(session.id, f"http://{session.ip}:81/stream",
+                                                 session.state, session.video_hub.publish_raw)
+        # WebSocket 推流设备经推流连接下发命令，MJPEG 固件经 http://<设备IP>/control
+        session.camera_link = CameraLink(session.id, http_base=f"http://{session.ip}", loop=camera_engine.loop)
+    else:
+        session.camera = CameraService(session.state, on_jpeg=session.video_hub.publish_raw, host=session.ip)
+        session.camera_link = CameraLink(session.id)
+    shared = devices.default.voice if devices.default is not session else None
+    session.voice = VoiceAssistant(session.state, session.audio, share_with=shared, camera_link=session.camera_link)
+    session.renderer = vision.new_renderer()
+    session.refiner = SearchRefiner(vision)
+    # 按佩戴者运动状态调整本路推理频率：静止时降频，快速转头时跳过模糊帧
+    session.imu = ImuTrack(session.id)
+    session.stream = scheduler.register(session.id, lambda: session.state.frame, pace=session.imu.infer_interval)
+    if loops_started:
+        threading.Thread(target=processing_loop, args=(session,), daemon=True).start()
 
-    职责：
-    1. 从 state 获取最新帧。
-    2. 调用 vision 服务进行推理 (YOLO)。
-    3. 根据检测结果计算风险等级。
-    4. 执行去抖动逻辑 (Stability Filter)，产生稳定的警报状态。
-    5. 根据冷却时间决定是否推送语音警报。
-    6. 绘制 HUD 并更新全局状态供前端查询。
+
+# 设备会话注册表：第一台为默认设备，麦克风连接按握手/来源 IP 路由到会话
+devices = DeviceRegistry(on_create=attach_device)
+for device_id, device_ip in config.DEVICES.items():
+    devices.add(device_id, device_ip)
+mic.set_router(devices.route_mic)
+# WebSocket 推流接入 (example/compile.ino)：与 MJPEG 拉流共用接入引擎的事件循环，在 __main__ 中开始监听
+camera_push = CameraPushServer(camera_engine, devices) if camera_engine is not None else None
+# 相机闭环码控：按处理链路的消费能力与警报等级调整各设备的发送帧率、JPEG 质量与分辨率
+camera_ctrl = None
+if camera_engine is not None and config.CAMERA_CTRL_ENABLED:
+    camera_ctrl = CameraRateController(devices)
+# IMU 接收 (UDP)：包按设备 ID / 来源 IP 写入会话的 ImuTrack，在 __main__ 中开始监听
+imu_service = ImuService(devices)
+print(f"Main: Using VoiceAssistant ({len(config.DEVICES)} device(s))")
+
+
+def inference_results(session: DeviceSession):
     """
-    print("Core processing loop started.")
+    按帧序产出一台设备的推理结果 (帧快照, 检测框, 推理耗时 ms)，并按 INFER_INTERVAL 控制推理频率
+    (按佩戴者运动状态调整：静止时降频，快速转头时跳过模糊帧)。
+
+    - 由批量调度器按本路 FPS 目标推理 (多台设备时与其他路合并为一次批量前向)。
+    - 启用推理进程池时默认设备改为流水线提交：每有空闲进程就提交最新的新帧，多个进程交替处理相邻帧，
+      结果仍按帧序返回；超出共享内存槽位的大帧退回本线程推理。
+    """
+    state = session.state
+    if infer_pool is None or session is not devices.default:
+        while True:
+            result = session.stream.get(timeout=config.INFER_INTERVAL)
+            if result is not None:
+                yield result
+            elif state.frame.raw is None:
+                # 即使没有画面，也定期更新心跳，避免前端显示离线
+                state.heartbeat()
+
     next_infer = 0.0
+    last_submitted = 0
 
     while True:
         now = time.time()
+        # 等待进程池结果的同时让出 CPU
+        result = infer_pool.get(timeout=0.003)
+        if result is not None:
+            yield result
+            continue
         # 控制推理频率，避免过热
         if now < next_infer:
-            time.sleep(0.003)
             continue
-        next_infer = now + config.INFER_INTERVAL
 
         # 获取最新帧 (非阻塞)
-        frame, frame_ts = state.get_frame()
-        if frame is None:
+        snap = state.frame
+        if snap.raw is None:
             # 即使没有画面，也定期更新心跳，避免前端显示离线
+            next_infer = now + config.INFER_INTERVAL
             state.heartbeat()
             continue
 
-        # 1. 视觉推理 (Inference)
-        boxes, r, infer_ms = vision.predict(frame)
+        interval = session.imu.infer_interval(config.INFER_INTERVAL)
+        if interval is None:
+            continue  # 快速转头，画面模糊
+        if snap.seq == last_submitted:
+            continue  # 没有新帧
+        if infer_pool.in_flight == 0 and not infer_pool.fits(snap.raw):
+            last_submitted = snap.seq
+            next_infer = now + interval
+            boxes, _, infer_ms = vision.predict(snap.raw)
+            yield snap, boxes, infer_ms
+        elif infer_pool.submit(snap.raw, snap):
+            last_submitted = snap.seq
+            next_infer = now + interval
+
+
+def processing_loop(session: DeviceSession) -> None:
+    """
+    核心处理循环 (Backbone Loop)，每台设备一个。
+
+    职责：
+    1. 从设备会话的 state 获取最新帧。
+    2. 调用 vision 服务或推理进程池进行推理 (YOLO)。
+    3. 根据检测结果计算风险等级。
+    4. 执行去抖动逻辑 (Stability Filter)，产生稳定的警报状态。
+    5. 根据冷却时间决定是否推送语音警报。
+    6. 有观看者时绘制 HUD 并编码，更新全局状态供前端查询。
+    """
+    print(f"Core processing loop started for device '{session.id}'.")
+    state, audio, video_hub = session.state, session.audio, session.video_hub
+    # 迟滞计数、冷却时间等只由本循环读写，不放入共享状态
+    alert_filter = AlertFilter()
+    last_beep_ts = 0.0  # 上次哔哔声时间
+
+    # 1. 视觉推理 (Inference)：本线程或推理进程池，结果按帧序到达
+    for snap, boxes, infer_ms in inference_results(session):
+        now = time.time()
+        frame, frame_ts = snap.raw, snap.ts
+        h, w = frame.shape[:2]
 
         # 2. 风险评估 (Risk Computation)
         level, text, target, curr_area = vision.compute_risk(
-            boxes, state.latest_shape[1], state.latest_shape[0], state.prev_max_area_ratio
+            boxes, w, h, alert_filter.prev_max_area_ratio
         )
-        state.prev_max_area_ratio = curr_area
+        alert_filter.prev_max_area_ratio = curr_area
 
         # 3. 稳定性滤波 (Stability Filter / Hysteresis)
         # 避免警报在边缘频繁闪烁
-        if level > 0:
-            state.alert_on_count += 1
-            state.alert_off_count = 0
-            if state.alert_on_count >= config.ALERT_CONSECUTIVE_ON:
-                state.stable_alert_level = level
-                state.stable_alert_text = text
-                state.stable_alert_target = target
-        else:
-            state.alert_off_count += 1
-            state.alert_on_count = 0
-            if state.alert_off_count >= config.ALERT_CONSECUTIVE_OFF:
-                state.stable_alert_level = 0
-                state.stable_alert_text = ""
-                state.stable_alert_target = None
+        final_level, final_text, final_target = alert_filter.update(level, text, target)
 
         # 4. 语音通知逻辑 (Audio Notification Logic)
-        final_level = state.stable_alert_level
         should_notify = False
-        
+        search_box = None
+        # 每个领域只读取一次快照，本帧内的判断基于一致的状态
+        search = state.search
+
         # 寻物模式处理 (Search Mode Geiger Counter)
-        if state.search_mode:
-            # 在寻物模式下，定位目标物品
-            target_info = vision.locate_target(
-                boxes, state.search_target_class, 
-                state.latest_shape[1], state.latest_shape[0]
-            )
-            state.update_search_target(target_info)
+        if search.active:
+            # 在寻物模式下，定位目标物品 (全图推理之后在目标附近的原始分辨率区域精搜一次)
+            target_boxes = boxes
+            if config.SEARCH_REFINE_ENABLED:
+                target_boxes = boxes + session.refiner.refine(frame, boxes, search.target_class, now)
+            target_info = vision.locate_target(target_boxes, search.target_class, w, h)
+            # 携带开始时间，避免寻物已被语音线程关闭后又写回旧目标
+            state.update_search_target(target_info, started_ts=search.started_ts)
             
             if target_info:
+                search_box = target_info["box"]
                 # 根据距离计算哔哔间隔
                 distance = target_info["distance"]
                 if distance == "near":
@@ -115,104 +212,245 @@ def processing_loop() -> None:
                     interval = config.GEIGER_INTERVAL_FAR
                 
                 # 检查是否需要播放哔哔声
-                if (now - state.search_last_beep_ts) >= interval:
+                if (now - last_beep_ts) >= interval:
                     audio.play_geiger_beep()
-                    state.search_last_beep_ts = now
-                    # 可选：打印调试信息
-                    # print(f"[SearchMode] Beep! Target: {state.search_target_class}, Dir: {target_info['direction']}, Dist: {distance}")
+                    last_beep_ts = now
         
         # 常规警报逻辑（寻物模式下暂停避障警报，避免干扰）
         elif final_level > 0:
             # DEBUG: Print why we are alarming
-            if state.alert_on_count == config.ALERT_CONSECUTIVE_ON: # Only print on initial stable trigger or generally
-                 print(f"[DEBUG] ALARM ACTIVE | Level: {final_level} | Target: {state.stable_alert_target} | Last emit: {now - state.last_alert_emit_ts:.1f}s")
+            if alert_filter.just_triggered:
+                 print(f"[DEBUG] ALARM ACTIVE | Level: {final_level} | Target: {final_target} | Last emit: {now - alert_filter.last_emit_ts:.1f}s")
 
-            cd = config.ALERT_COOLDOWN.get(final_level, 1.0)
-            repeat_min = config.ALERT_REPEAT_MIN.get(final_level, 1.0)
             # 检查 CD 和重复时间间隔
             # [Fix] 如果正在进行语音交互 (非 idle)，则暂停播放新的避障警报，避免干扰对话
-            if state.latest_voice_status != "idle":
-                 # Optional: print debug to show we are skipping
-                 # print(f"[DEBUG] Skipping Alert L{final_level} due to Voice Active: {state.latest_voice_status}")
+            if state.voice.status != "idle":
                  pass
-            elif (now - state.last_alert_time[final_level]) >= cd and (now - state.last_alert_emit_ts) >= repeat_min:
+            elif alert_filter.ready(final_level, now):
                 print(f"[DEBUG] Enqueueing Alert L{final_level}")
                 audio.enqueue_alert(final_level)
-                state.last_alert_time[final_level] = now
-                state.last_alert_emit_ts = now
+                alert_filter.mark_emitted(final_level, now)
                 should_notify = True
 
         # 5. UI 更新与 HUD 绘制 (UI Updates)
         fps = 1000.0 / infer_ms if infer_ms > 0 else 0.0
         delay = (time.time() - frame_ts) * 1000.0 if frame_ts > 0 else 0.0
 
-        # 绘制带数据的 JPEG 图片
-        jpg = vision.draw_hud(r.plot(), fps, delay, len(boxes), final_level, state.stable_alert_text)
+        # 绘制 HUD，并只为有观看者的视频档位编码 JPEG；无人观看时跳过绘制与编码
+        if video_hub.wants_frames:
+            t_render = time.perf_counter()
+            hud = vision.render_overlay(frame, boxes, fps, delay, final_level, search_box, session.renderer)
+            video_hub.publish_frame(hud)
+            video_hub.record_render((time.perf_counter() - t_render) * 1000.0)
+        else:
+            video_hub.record_skip()
 
-        # 将结果发布到全局状态
-        state.update_detection(boxes, infer_ms, fps, delay, jpg)
-        state.update_alert(final_level, state.stable_alert_text, state.stable_alert_target, should_notify)
+        # 将结果发布到全局状态 (先发布警报，保证按检测帧推送的叠加数据带上本帧警报)
+        state.update_alert(final_level, final_text, final_target, should_notify)
+        state.update_detection(boxes, infer_ms, fps, delay, snap.seq)
 
 # =========================
 # API 路由定义
 # =========================
 
+def device_session(device_id) -> DeviceSession:
+    """按 URL 中的设备 ID 取会话 (无前缀时为默认设备)；未知设备返回 404"""
+    session = devices.get(device_id)
+    if session is None:
+        abort(404, description="unknown device")
+    return session
+
 @app.route("/")
-def index() -> str:
-    """前端首页"""
+@app.route("/d/<device_id>/")
+def index(device_id=None) -> str:
+    """前端首页 (设备页面 /d/<设备ID>/ 下，前端自动为所有 HUD 端点加上设备前缀)"""
+    device_session(device_id)
     return render_template("index.html")
 
 @app.get("/health")
-def health() -> FlaskResponse:
+@app.get("/d/<device_id>/health")
+def health(device_id=None) -> FlaskResponse:
     """健康检查接口"""
+    device_session(device_id)
     return jsonify({"ok": True})
 
+@app.get("/devices")
+def list_devices() -> FlaskResponse:
+    """已登记的设备会话列表 (第一台为默认设备)"""
+    return jsonify({"default": devices.default.id, "devices": devices.get_stats()})
+
 @app.get("/detect")
-def detect() -> FlaskResponse:
+@app.get("/d/<device_id>/detect")
+def detect(device_id=None) -> FlaskResponse:
     """
     前端轮询接口。
     返回当前的检测数据、状态指标和警报信息 (JSON)。
+    `/d/<设备ID>/detect` 返回指定设备的数据，不带前缀时为默认设备。
+
+    - 响应携带 `ETag: "<version>"`，请求头 `If-None-Match` 命中时返回 304。
+    - `?since=<version>&wait=<ms>` 长轮询：状态版本号与 since 不同时立即返回，
+      等待超时仍无变化则返回 304。
     """
-    return jsonify(state.get_ui_data())
+    session = device_session(device_id)
+    since = request.args.get("since", type=int)
+    wait_ms = request.args.get("wait", default=0, type=int)
+    if since is not None and wait_ms > 0:
+        session.state.wait_for_version(since, min(wait_ms, config.DETECT_LONG_POLL_MAX_MS) / 1000.0)
+
+    # 每个版本只序列化一次，所有客户端共享同一份字节串
+    version, body = session.payloads.current()
+    unchanged = (since is not None and version == since) or request.if_none_match.contains(str(version))
+    if unchanged:
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="application/json")
+    resp.set_etag(str(version))
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.get("/events")
+@app.get("/d/<device_id>/events")
+def events(device_id=None) -> Response:
+    """
+    HUD 推送接口 (Server-Sent Events)。
+    连接后先推送一条完整快照 (event: snapshot)，之后每当状态版本号变化，
+    推送只包含变化字段的增量 (event: delta)；长时间无变化时发送注释行保活。
+    """
+    session = device_session(device_id)
+    state, payloads = session.state, session.payloads
+
+    def gen():
+        version, msg = payloads.snapshot_event()
+        yield msg
+        while True:
+            if state.wait_for_version(version, config.PUSH_KEEPALIVE_INTERVAL) == version:
+                yield b": keepalive\n\n"
+                continue
+            # 增量按起始版本缓存，同时订阅的客户端共用同一份消息
+            version, msg = payloads.delta_event(version)
+            if msg:
+                yield msg
+            # 合并高频发布 (如每帧的检测结果)，限制单个客户端的推送频率
+            time.sleep(config.PUSH_MIN_INTERVAL)
+
+    resp = Response(gen(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # 避免反向代理缓冲
+    return resp
+
+@app.get("/overlay")
+@app.get("/d/<device_id>/overlay")
+def overlay(device_id=None) -> Response:
+    """
+    叠加数据推送接口 (Server-Sent Events)。
+    每次推理完成推送一条 `event: overlay`，携带检测所用帧的序号，
+    配合 `/video?profile=raw` (响应分段头 X-Frame-Seq) 在前端按帧对齐绘制检测框与 HUD。
+    """
+    session = device_session(device_id)
+    state, payloads = session.state, session.payloads
+
+    def gen():
+        version, last_seq = -1, None
+        while True:
+            new = state.wait_for_version(version, config.PUSH_KEEPALIVE_INTERVAL)
+            if new == version:
+                yield b": keepalive\n\n"
+                continue
+            version = new
+            seq, msg = payloads.overlay_event()
+            if seq != last_seq:
+                last_seq = seq
+                yield msg
+
+    resp = Response(gen(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+@app.get("/metrics")
+def metrics() -> FlaskResponse:
+    """
+    运行指标接口。
+    返回投机视觉请求、VLM 描述缓存、TTS 短语缓存、HUD 数据序列化缓存、视频流各客户端延迟、
+    Web 服务器类型与进程线程数、相机接入等内部统计 (JSON)。设备相关的指标为默认设备，`devices` 列出所有设备会话。
+    """
+    session = devices.default
+    voice_ai, payloads, video_hub = session.voice, session.payloads, session.video_hub
+    return jsonify({
+        "speculation": voice_ai.speculation.get_stats(),
+        "hq_snapshot": dict(voice_ai.hq_stats),
+        "frame_select": session.state.recent_frames.get_stats(),
+        "search_refine": session.refiner.get_stats(),
+        "vision_cache": voice_ai.vision_cache.get_stats(),
+        "tts_cache": voice_ai.tts_cache.get_stats(),
+        "payload_cache": payloads.get_stats(),
+        "video": video_hub.get_stats(),
+        "server": {"backend": server_backend, "threads": threading.active_count()},
+        "inference": infer_pool.get_stats() if infer_pool is not None else {"workers": []},
+        "batch": scheduler.get_stats(),
+        "devices": devices.get_stats(),
+        "camera": camera_engine.get_stats() if camera_engine is not None else {"cameras": 0, "streams": []},
+        "camera_links": [s.camera_link.get_stats() for s in devices.sessions() if s.camera_link is not None],
+        "camera_ctrl": camera_ctrl.get_stats() if camera_ctrl is not None else {"running": False, "devices": []},
+        "imu": {**imu_service.get_stats(),
+                "devices": [{"id": s.id, **s.imu.get_stats()} for s in devices.sessions() if s.imu is not None]},
+    })
+
+@app.route("/camera", methods=["GET", "POST"])
+@app.route("/d/<device_id>/camera", methods=["GET", "POST"])
+def camera_control(device_id=None) -> FlaskResponse:
+    """
+    相机控制 (WebSocket 推流设备经推流连接，MJPEG 固件经 /control 端点)。
+    GET 返回连接状态与最近一次下发的设置；POST JSON `{framesize, quality, fps}` (任选) 下发到设备，
+    取值按固件范围约束 (framesize: VGA|SVGA|XGA, quality: 5~40, fps: 0 或 5~60)。无法下发时返回 503。
+    启用相机闭环码控 (CAMERA_CTRL=1) 时，手动设置会在下一个控制周期被码控的设置覆盖。
+    """
+    link = device_session(device_id).camera_link
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        if link.transport is None:
+            return jsonify({"error": "camera not connected"}), 503
+        try:
+            if "framesize" in body:
+                link.set_framesize(str(body["framesize"]))
+            if "quality" in body:
+                link.set_quality(int(body["quality"]))
+            if "fps" in body:
+                link.set_fps(int(body["fps"]))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(link.get_stats())
+
+@app.get("/snapshot")
+@app.get("/d/<device_id>/snapshot")
+def snapshot(device_id=None) -> Response:
+    """
+    高清快照 (SXGA JPEG)：经控制通道请求 WebSocket 推流设备拍摄一张并等待返回。
+    设备未连接或超时 (CAMERA_SNAPSHOT_TIMEOUT) 返回 503。
+    """
+    jpg = device_session(device_id).camera_link.snapshot()
+    if jpg is None:
+        return jsonify({"error": "snapshot unavailable"}), 503
+    resp = Response(jpg, mimetype="image/jpeg")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 @app.route("/video")
-def video() -> Response:
+@app.route("/d/<device_id>/video")
+def video(device_id=None) -> Response:
     """
     MJPEG 视频流接口。
     前端通过 <img src="/video"> 直接加载。
+    所有客户端共享广播器构建好的 multipart 数据；慢客户端丢弃旧帧，只接收最新一帧。
     如果在没有相机帧的情况下，发送一个包含“等待连接”文字的占位图。
-    """
-    def gen():
-        print("DEBUG: Video generator started")
-        # 预先生成一个黑色占位图
-        import cv2
-        import numpy as np
-        placeholder = np.zeros((320, 320, 3), dtype=np.uint8)
-        cv2.putText(placeholder, "WAITING FOR CAMERA...", (20, 160), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        _, placeholder_jpg = cv2.imencode(".jpg", placeholder)
-        placeholder_bytes = placeholder_jpg.tobytes()
 
-        while True:
-            with state.frame_condition:
-                # 等待新的一帧，超时 0.5 秒防止死锁或无响应
-                notified = state.frame_condition.wait(timeout=0.5)
-                frame = state.latest_frame_jpg
-
-            if frame:
-                # print("DEBUG: Yielding frame", len(frame))
-                yield (b"--frame\r\n"
-                       b"Content-Type: image/jpeg\r\n"
-                       b"Content-Length: " + str(len(frame)).encode() + b"\r\n\r\n" +
-                       frame + b"\r\n")
-            else:
-                # 只有在超时或依然没有帧时发送占位图
-                print("DEBUG: Yielding placeholder")
-                yield (b"--frame\r\n"
-                       b"Content-Type: image/jpeg\r\n"
-                       b"Content-Length: " + str(len(placeholder_bytes)).encode() + b"\r\n\r\n" +
-                       placeholder_bytes + b"\r\n")
-    return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    - `?profile=low|mid|high` 选择分辨率/质量档位
+    - `?profile=raw` 原样直通相机 JPEG (不标注、不重新编码)，分段头 X-Frame-Seq 携带帧序号
+    - `?kbps=<n>` 根据客户端上报的可用带宽自动选择档位
+    """
+    session = device_session(device_id)
+    profile = resolve_profile(request.args.get("profile"), request.args.get("kbps", type=float))
+    return Response(session.video_hub.stream(profile), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 if __name__ == "__main__":
     print(f"Starting Assistive Vision Server on port {config.SERVER_PORT}")
@@ -221,7 +459,32 @@ if __name__ == "__main__":
     import logging
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
-    # 在后台线程启动核心处理循环
-    threading.Thread(target=processing_loop, daemon=True).start()
-    # 启动 Flask Web 服务
-    app.run(host="0.0.0.0", port=config.SERVER_PORT, threaded=True)
+    if config.INFER_WORKERS > 0:
+        # 推理移到独立进程，Web、音频线程不再与 YOLO 前后处理争抢 GIL (默认设备)
+        infer_pool = InferencePool(config.INFER_WORKERS)
+        infer_pool.wait_ready()
+        scheduler.unregister(devices.default.id)
+    scheduler.start()
+    if camera_push is not None:
+        camera_push.start()
+    if camera_ctrl is not None:
+        camera_ctrl.start()
+    try:
+        imu_service.start()
+    except OSError as e:
+        print(f"[IMU] Failed to bind UDP port {imu_service.port}: {e}")
+
+    # 在后台线程启动各设备的核心处理循环
+    loops_started = True
+    for session in devices.sessions():
+        threading.Thread(target=processing_loop, args=(session,), daemon=True).start()
+
+    if config.SERVER_BACKEND == "async" and AIOHTTP_AVAILABLE:
+        # HUD 端点由事件循环服务，观看者再多线程数也不变
+        server_backend = "async"
+        run_async_server(app, devices, port=config.SERVER_PORT)
+    else:
+        if config.SERVER_BACKEND == "async":
+            print("[Server] aiohttp not installed, falling back to Flask threaded server")
+        # 启动 Flask Web 服务 (每个连接一个线程)
+        app.run(host="0.0.0.0", port=config.SERVER_PORT, threaded=True)
@@ -0,0 +1,60 @@
+from typing import Dict, Any, Optional, Tuple
+from . import config
+
+
+class AlertFilter:
+    """
+    警报稳定性滤波与冷却控制 (Stability Filter / Hysteresis + Cooldown)。
+
+    这些状态只由处理循环读写，因此从 AppState 中拆出，由处理循环独占持有，
+    不再需要与 HTTP 线程共享，也就不存在未加锁读写的竞争。
+    """
+
+    def __init__(self):
+        self.prev_max_area_ratio: Dict[str, float] = {}  # 上一帧各目标的面积占比，用于计算增长率
+
+        # 迟滞计数
+        self.on_count = 0
+        self.off_count = 0
+
+        # 稳定警报
+        self.level = 0
+        self.text = ""
+        self.target: Optional[Dict[str, Any]] = None
+
+        # 冷却时间戳
+        self.last_alert_time = {1: 0.0, 2: 0.0, 3: 0.0}
+        self.last_emit_ts = 0.0
+
+    def update(self, level: int, text: str, target: Optional[Dict[str, Any]]) -> Tuple[int, str, Optional[Dict[str, Any]]]:
+        """
+        输入本帧的原始风险，返回去抖动后的稳定警报 (level, text, target)。
+        避免警报在边缘频繁闪烁。
+        """
+        if level > 0:
+            self.on_count += 1
+            self.off_count = 0
+            if self.on_count >= config.ALERT_CONSECUTIVE_ON:
+                self.level, self.text, self.target = level, text, target
+        else:
+            self.off_count += 1
+            self.on_count = 0
+            if self.off_count >= config.ALERT_CONSECUTIVE_OFF:
+                self.level, self.text, self.target = 0, "", None
+        return self.level, self.text, self.target
+
+    @property
+    def just_triggered(self) -> bool:
+        """本帧是否刚刚进入稳定警报"""
+        return self.on_count == config.ALERT_CONSECUTIVE_ON
+
+    def ready(self, level: int, now: float) -> bool:
+        """检查该等级的冷却时间 (CD) 与全局重复间隔是否都已满足"""
+        cd = config.ALERT_COOLDOWN.get(level, 1.0)
+        repeat_min = config.ALERT_REPEAT_MIN.get(level, 1.0)
+        return (now - self.last_alert_time.get(level, 0.0)) >= cd and (now - self.last_emit_ts) >= repeat_min
+
+    def mark_emitted(self, level: int, now: float) -> None:
+        """记录一次语音警报的发出时间"""
+        self.last_alert_time[level] = now
+        self.last_emit_ts = now
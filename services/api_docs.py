@@ -65,6 +65,7 @@ search_model = api.model('Search', {
 })
 
 detect_model = api.model('Detect', {
+    'version': fields.Integer(description='状态版本号 (用于 ETag 与长轮询 since 参数)', example=42),
     'boxes': fields.List(fields.Nested(box_model), description='检测到的边界框列表'),
     'shape': fields.List(fields.Integer, description='画面尺寸 [高, 宽]', example=[480, 640]),
     'fps': fields.Float(description='当前帧率', example=20.5),
@@ -77,6 +78,214 @@ detect_model = api.model('Detect', {
     'search': fields.Nested(search_model, description='寻物模式状态')
 })
 
+speculation_model = api.model('Speculation', {
+    'utterances': fields.Integer(description='处理的语句数'),
+    'started': fields.Integer(description='启动的 VLM 请求总数'),
+    'early': fields.Integer(description='录音结束即启动的请求数'),
+    'upgraded': fields.Integer(description='由部分识别文本触发启动的请求数'),
+    'late': fields.Integer(description='识别完成后才启动的请求数'),
+    'used': fields.Integer(description='结果被播报的请求数'),
+    'wasted': fields.Integer(description='已发出但结果被丢弃的请求数'),
+    'cancelled': fields.Integer(description='发出前即被取消的请求数'),
+    'vision_prior': fields.Float(description='视觉意图先验 (EMA)'),
+    'waste_ratio': fields.Float(description='浪费比例 wasted / (used + wasted)'),
+})
+
+vision_cache_model = api.model('VisionCache', {
+    'entries': fields.Integer(description='当前缓存条数'),
+    'hits': fields.Integer(description='命中次数'),
+    'misses': fields.Integer(description='未命中次数'),
+    'hit_rate': fields.Float(description='命中率'),
+})
+
+tts_cache_model = api.model('TTSCache', {
+    'memory_hits': fields.Integer(description='内存命中次数'),
+    'disk_hits': fields.Integer(description='磁盘命中次数'),
+    'misses': fields.Integer(description='未命中次数'),
+    'writes': fields.Integer(description='写入次数'),
+    'memory_items': fields.Integer(description='内存 LRU 当前条数'),
+})
+
+payload_cache_model = api.model('PayloadCache', {
+    'serializations': fields.Integer(description='序列化次数 (每个状态版本一次)'),
+    'hits': fields.Integer(description='直接复用已序列化结果的次数'),
+    'serializer': fields.String(description='JSON 序列化器 (orjson / json)', example='orjson'),
+})
+
+server_model = api.model('Server', {
+    'backend': fields.String(description='Web 服务器 (async: aiohttp 事件循环 / flask: 每连接一个线程)', example='async'),
+    'threads': fields.Integer(description='进程当前线程数'),
+})
+
+inference_worker_model = api.model('InferenceWorker', {
+    'id': fields.Integer(description='推理进程编号'),
+    'pid': fields.Integer(description='进程 PID'),
+    'ready': fields.Boolean(description='模型是否已加载'),
+    'done': fields.Integer(description='已完成帧数'),
+})
+
+inference_model = api.model('Inference', {
+    'workers': fields.List(fields.Nested(inference_worker_model), description='推理进程 (未启用进程池时为空)'),
+    'submitted': fields.Integer(description='提交帧数'),
+    'completed': fields.Integer(description='按帧序取回的结果数'),
+    'dropped': fields.Integer(description='超时或进程退出而丢弃的帧数'),
+    'restarts': fields.Integer(description='推理进程重启次数'),
+    'in_flight': fields.Integer(description='正在推理的帧数'),
+})
+
+batch_stream_model = api.model('BatchStream', {
+    'id': fields.String(description='设备/流标识', example='default'),
+    'fps_target': fields.Float(description='推理帧率目标'),
+    'delivered': fields.Integer(description='已分发的结果数'),
+    'overwritten': fields.Integer(description='未被取走即被新结果覆盖的次数'),
+    'queue_ms': fields.Float(description='帧在收集窗口中的平均排队时间 (ms)'),
+    'motion_skipped': fields.Integer(description='因快速转头 (画面模糊) 跳过的帧数'),
+})
+
+batch_model = api.model('Batch', {
+    'batches': fields.Integer(description='批量前向次数'),
+    'frames': fields.Integer(description='推理帧数'),
+    'avg_batch': fields.Float(description='平均批大小'),
+    'ms_per_frame': fields.Float(description='每帧分摊的推理耗时 (ms)'),
+    'streams': fields.List(fields.Nested(batch_stream_model), description='各路统计'),
+})
+
+camera_stream_model = api.model('CameraStream', {
+    'id': fields.String(description='设备 ID', example='default'),
+    'source': fields.String(description='来源类型 (mjpeg / ws / push)'),
+    'connected': fields.Boolean(description='相机连接是否在线'),
+    'received': fields.Integer(description='收到的 JPEG 帧数'),
+    'decoded': fields.Integer(description='解码并发布的帧数'),
+    'dropped': fields.Integer(description='来不及解码被新帧覆盖的帧数'),
+    'fps': fields.Float(description='发布帧率'),
+    'decode_ms': fields.Float(description='平均解码耗时 (ms)'),
+    'last_error': fields.String(description='最近一次断开原因'),
+})
+
+camera_model = api.model('Camera', {
+    'cameras': fields.Integer(description='接入引擎中的相机数 (0 表示每台相机一个线程)'),
+    'decode_workers': fields.Integer(description='JPEG 解码线程数'),
+    'streams': fields.List(fields.Nested(camera_stream_model), description='各相机统计'),
+})
+
+camera_link_model = api.model('CameraLink', {
+    'id': fields.String(description='设备 ID', example='default'),
+    'connected': fields.Boolean(description='WebSocket 推流连接是否在线'),
+    'transport': fields.String(description='命令下发方式 ws (推流连接) / http (MJPEG 固件 /control) / 空 (无法下发)'),
+    'remote': fields.String(description='设备连接来源地址'),
+    'framesize': fields.String(description='最近一次下发的分辨率 (VGA / SVGA / XGA，空为固件默认)'),
+    'quality': fields.Integer(description='最近一次下发的 JPEG 质量 (5~40，越小越清晰)'),
+    'fps': fields.Integer(description='最近一次下发的发送帧率 (0 为不限)'),
+    'commands': fields.Integer(description='已下发命令数'),
+    'http_errors': fields.Integer(description='/control 请求失败次数'),
+    'snapshots': fields.Integer(description='成功的高清快照数'),
+    'snapshot_failures': fields.Integer(description='失败或超时的高清快照数'),
+    'last_snapshot_ms': fields.Float(description='最近一次高清快照耗时 (ms)'),
+})
+
+camera_ctrl_device_model = api.model('CameraCtrlDevice', {
+    'id': fields.String(description='设备 ID', example='default'),
+    'transport': fields.String(description='命令下发方式 (ws / http)'),
+    'framesize': fields.String(description='码控选择的分辨率'),
+    'quality': fields.Integer(description='码控选择的 JPEG 质量 (越小越清晰)'),
+    'fps': fields.Integer(description='码控选择的发送帧率'),
+    'arrival_fps': fields.Float(description='本周期到达帧率'),
+    'kbps': fields.Float(description='本周期到达码率'),
+    'drop_ratio': fields.Float(description='到达帧中未及解码即被覆盖的比例'),
+    'infer_ms': fields.Float(description='最近一次推理耗时 (ms)'),
+    'age_ms': fields.Float(description='最近一次检测所用帧的帧龄 (ms)'),
+    'reason': fields.String(description='本周期决策依据 (ok / congested / link / alert Lx)'),
+})
+
+camera_ctrl_model = api.model('CameraCtrl', {
+    'running': fields.Boolean(description='码控线程是否运行'),
+    'interval': fields.Float(description='控制周期 (秒)'),
+    'devices': fields.List(fields.Nested(camera_ctrl_device_model), description='各设备当前设置与测量值'),
+})
+
+camera_settings_model = api.model('CameraSettings', {
+    'framesize': fields.String(description='分辨率 VGA / SVGA / XGA', example='SVGA'),
+    'quality': fields.Integer(description='JPEG 质量 5~40 (越小越清晰)', example=12),
+    'fps': fields.Integer(description='发送帧率，0 为不限，其余约束到 5~60', example=15),
+})
+
+device_model = api.model('Device', {
+    'id': fields.String(description='设备 ID (HUD 端点前缀 /d/<id>/)', example='default'),
+    'ip': fields.String(description='设备地址'),
+    'frame_seq': fields.Integer(description='最新相机帧序号'),
+    'last_update_s': fields.Float(description='距处理循环上次发布的时间 (秒)'),
+    'alert_level': fields.Integer(description='当前警报等级'),
+    'voice_status': fields.String(description='语音状态'),
+    'viewers': fields.Integer(description='视频流观看者数'),
+    'camera_push': fields.Boolean(description='设备是否正通过 WebSocket 推流'),
+    'motion': fields.String(description='佩戴者运动状态 (unknown / stationary / walking / turning)'),
+})
+
+devices_model = api.model('Devices', {
+    'default': fields.String(description='默认设备 ID (不带前缀的 HUD 端点对应该设备)'),
+    'devices': fields.List(fields.Nested(device_model), description='设备会话列表'),
+})
+
+hq_snapshot_model = api.model('HQSnapshot', {
+    'requested': fields.Integer(description='随视觉请求发起的高清快照数'),
+    'used': fields.Integer(description='按时拿到并交给 VLM 的快照数'),
+    'fallback': fields.Integer(description='超时或失败、退回实时帧的次数'),
+    'skipped': fields.Integer(description='因警报等级较高未拍摄的次数'),
+})
+
+imu_device_model = api.model('ImuDevice', {
+    'id': fields.String(description='设备 ID', example='default'),
+    'state': fields.String(description='运动状态 (unknown / stationary / walking / turning)'),
+    'rotation_dps': fields.Float(description='近 0.2 秒平均角速度 (°/s)'),
+    'accel_std': fields.Float(description='近 1 秒加速度模长的标准差 (m/s²)'),
+    'temp_c': fields.Float(description='IMU 温度 (°C)'),
+    'samples': fields.Integer(description='累计收到的样本数'),
+})
+
+imu_model = api.model('Imu', {
+    'running': fields.Boolean(description='UDP 接收线程是否运行'),
+    'port': fields.Integer(description='UDP 端口'),
+    'packets': fields.Integer(description='已写入会话的 IMU 包数'),
+    'bad_packets': fields.Integer(description='格式错误的包数'),
+    'unrouted': fields.Integer(description='找不到设备会话的包数'),
+    'devices': fields.List(fields.Nested(imu_device_model), description='各设备运动状态'),
+})
+
+frame_select_model = api.model('FrameSelect', {
+    'frames': fields.Integer(description='保留的最近帧数'),
+    'sharpness': fields.List(fields.Float, description='各帧清晰度 (拉普拉斯方差，按时间顺序)'),
+    'requests': fields.Integer(description='视觉问答取帧次数'),
+    'replaced': fields.Integer(description='选中比最新帧更清晰的旧帧的次数'),
+    'gain_avg': fields.Float(description='替换时清晰度提升倍数的平均值'),
+})
+
+search_refine_model = api.model('SearchRefine', {
+    'target': fields.String(description='当前寻物目标 (COCO 类名)'),
+    'runs': fields.Raw(description='各方式的精搜次数 {candidate, track, scan}'),
+    'skipped': fields.Integer(description='全图已检测到足够大的目标、未精搜的次数'),
+    'found': fields.Integer(description='精搜检测到目标的次数'),
+    'rescued': fields.Integer(description='全图未检测到、精搜检测到的次数'),
+    'infer_ms': fields.Float(description='精搜平均推理耗时 (ms)'),
+})
+
+metrics_model = api.model('Metrics', {
+    'speculation': fields.Nested(speculation_model, description='投机视觉请求统计'),
+    'hq_snapshot': fields.Nested(hq_snapshot_model, description='视觉问答高清快照统计'),
+    'frame_select': fields.Nested(frame_select_model, description='最佳帧选择统计'),
+    'search_refine': fields.Nested(search_refine_model, description='寻物精搜 (ROI 二次推理) 统计'),
+    'vision_cache': fields.Nested(vision_cache_model, description='VLM 描述缓存统计'),
+    'tts_cache': fields.Nested(tts_cache_model, description='TTS 短语缓存统计'),
+    'payload_cache': fields.Nested(payload_cache_model, description='HUD 数据预序列化缓存统计'),
+    'server': fields.Nested(server_model, description='Web 服务器与线程数'),
+    'inference': fields.Nested(inference_model, description='推理进程池统计'),
+    'batch': fields.Nested(batch_model, description='多路批量推理调度统计'),
+    'devices': fields.List(fields.Nested(device_model), description='设备会话列表'),
+    'camera': fields.Nested(camera_model, description='相机接入引擎统计'),
+    'camera_links': fields.List(fields.Nested(camera_link_model), description='各设备相机控制通道'),
+    'camera_ctrl': fields.Nested(camera_ctrl_model, description='相机闭环码控'),
+    'imu': fields.Nested(imu_model, description='IMU 接收与运动状态'),
+})
+
 
 # ========================
 # API 端点
@@ -93,24 +302,126 @@ class HealthResource(Resource):
         return {'ok': True}
 
 
+@ns.route('/devices')
+class DevicesResource(Resource):
+    @ns.doc('list_devices')
+    @ns.marshal_with(devices_model)
+    def get(self):
+        """设备会话列表
+        
+        一个服务进程可服务多副眼镜，每台设备的 HUD 端点位于 `/d/<设备ID>/` 前缀下
+        (`/d/<id>/detect`、`/d/<id>/events`、`/d/<id>/overlay`、`/d/<id>/video`、设备页面 `/d/<id>/`)；
+        不带前缀的端点对应默认设备。
+        """
+        # 注意：这里只是定义文档，实际路由在 main.py 中
+        return {}
+
+
 @ns.route('/detect')
 class DetectResource(Resource):
-    @ns.doc('get_detection')
+    @ns.doc('get_detection', params={
+        'since': '上次收到的状态版本号；版本号未变化时返回 304',
+        'wait': '长轮询等待时间 (毫秒)，与 since 搭配使用，状态变化时立即返回',
+    }, responses={304: '状态未变化 (If-None-Match 命中或长轮询超时)'})
     @ns.marshal_with(detect_model)
     def get(self):
         """获取检测数据
         
         返回当前的视觉检测结果、系统指标和警报状态。
-        前端应周期性轮询此接口 (建议间隔 250ms)。
+        响应携带 `ETag`，支持 `If-None-Match` 条件请求；
+        前端使用 `?since=<version>&wait=<ms>` 长轮询，状态变化时立即收到更新。
         """
         # 注意：这里只是定义文档，实际路由在 main.py 中
         # 返回空对象用于 Swagger 文档生成
         return {}
 
 
+@ns.route('/events')
+class EventsResource(Resource):
+    @ns.doc('hud_events')
+    @ns.produces(['text/event-stream'])
+    def get(self):
+        """HUD 推送 (Server-Sent Events)
+        
+        连接后先推送 `event: snapshot` (完整数据，字段同 /detect)，
+        之后每当状态变化推送 `event: delta` (只包含变化字段，始终带 version 与 ts)。
+        
+        **注意**: 此端点返回持续的流式响应，不适合在 Swagger UI 中测试。
+        """
+        return {'message': 'SSE stream - 请使用 EventSource 订阅'}
+
+
+@ns.route('/overlay')
+class OverlayResource(Resource):
+    @ns.doc('overlay_events')
+    @ns.produces(['text/event-stream'])
+    def get(self):
+        """叠加数据推送 (Server-Sent Events)
+        
+        每次推理完成推送一条 `event: overlay`：
+        `{"seq": 帧序号, "w": 宽, "h": 高, "b": [[x1, y1, x2, y2, label, conf], ...],
+        "lv": 警报等级, "at": 警报目标框, "st": 寻物目标框, "fps": ..., "inf": ..., "dl": ...}`。
+        与 `/video?profile=raw` 的 `X-Frame-Seq` 分段头按帧序号对齐。
+        """
+        return {'message': 'SSE stream - 请使用 EventSource 订阅'}
+
+
+@ns.route('/metrics')
+class MetricsResource(Resource):
+    @ns.doc('get_metrics')
+    @ns.marshal_with(metrics_model)
+    def get(self):
+        """运行指标
+        
+        返回投机视觉请求的启动、使用与浪费统计，以及 VLM 描述缓存与 TTS 短语缓存命中率。
+        """
+        # 注意：这里只是定义文档，实际路由在 main.py 中
+        return {}
+
+
+@ns.route('/camera')
+class CameraResource(Resource):
+    @ns.doc('camera_status')
+    @ns.marshal_with(camera_link_model)
+    def get(self):
+        """相机控制通道状态
+        
+        WebSocket 推流设备 (ws://<服务器>:8081/ws/camera) 的连接状态与最近一次下发的设置；
+        MJPEG 固件的设备经 `http://<设备IP>/control` 下发。
+        """
+        # 注意：这里只是定义文档，实际路由在 main.py 中
+        return {}
+
+    @ns.doc('camera_control', responses={400: '参数无效', 503: '设备未通过 WebSocket 连接'})
+    @ns.expect(camera_settings_model)
+    @ns.marshal_with(camera_link_model)
+    def post(self):
+        """下发相机设置
+        
+        经推流连接向设备发送 `SET:FRAMESIZE` / `SET:QUALITY` / `SET:FPS` (MJPEG 固件为 `/control?var=&val=`)，字段任选。
+        启用相机闭环码控时，手动设置会在下一个控制周期被覆盖。
+        """
+        return {}
+
+
+@ns.route('/snapshot')
+class SnapshotResource(Resource):
+    @ns.doc('camera_snapshot', responses={503: '设备未连接或快照超时'})
+    @ns.produces(['image/jpeg'])
+    def get(self):
+        """高清快照
+        
+        请求设备拍摄一张 SXGA (1280x1024) JPEG 并返回 (`SNAP:HQ`)，不影响视频流的分辨率设置。
+        """
+        return {}
+
+
 @ns.route('/video')
 class VideoResource(Resource):
-    @ns.doc('video_stream')
+    @ns.doc('video_stream', params={
+        'profile': '视频档位 low / mid / high (分辨率与 JPEG 质量)，raw 为直通相机原始 JPEG',
+        'kbps': '客户端可用带宽，未指定 profile 时据此选择档位',
+    })
     @ns.produces(['multipart/x-mixed-replace'])
     def get(self):
         """MJPEG 视频流
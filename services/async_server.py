@@ -0,0 +1,287 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote_to_bytes
+
+from . import config
+from .video_broadcaster import resolve_profile
+
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# WSGI 响应中由 aiohttp 自行计算的逐跳头
+_HOP_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+
+class VersionWaiter:
+    """
+    在事件循环中等待状态版本号变化 (AppState.wait_for_version 的异步版本)。
+    发布者线程只通过 call_soon_threadsafe 投递一次唤醒，所有等待中的协程共享同一个 Event，
+    无论多少客户端在长轮询或订阅推送，都不额外占用线程。
+    """
+
+    def __init__(self, state, loop: asyncio.AbstractEventLoop):
+        self.state = state
+        self._loop = loop
+        self._event = asyncio.Event()
+        self._scheduled = False
+        state.add_version_listener(self._on_version)
+
+    def _on_version(self, version: int) -> None:
+        """发布者线程中调用：合并同一轮事件循环内的多次发布，只投递一次唤醒"""
+        if self._scheduled:
+            return
+        self._scheduled = True
+        try:
+            self._loop.call_soon_threadsafe(self._notify)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    def _notify(self) -> None:
+        self._scheduled = False
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, since: int, timeout: float) -> int:
+        """
+        等待直到版本号不等于 since 或超时。
+
+        Returns:
+            当前版本号 (超时时可能仍等于 since)
+        """
+        deadline = self._loop.time() + timeout
+        while self.state.version == since:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            event = self._event
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.state.version
+
+
+def _etag_matches(header: Optional[str], version: int) -> bool:
+    """If-None-Match 是否包含当前版本号"""
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == str(version):
+            return True
+    return False
+
+
+def _int_arg(request, name: str, default: Optional[int] = None) -> Optional[int]:
+    try:
+        return int(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _float_arg(request, name: str) -> Optional[float]:
+    try:
+        return float(request.query[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class AsyncHUDServer:
+    """
+    异步 Web 服务器：HUD 端点 (/detect、/events、/overlay、/video) 由单个事件循环线程以协程服务，
+    观看者数量增加不会增加线程数；其余路由 (首页、静态资源、/metrics、API 文档) 交给原 Flask 应用，
+    在固定大小的线程池中执行。与 main.py 中的 Flask 路由共用同一套服务与缓存，接口行为一致。
+
+    每台设备的 HUD 端点位于 /d/<设备ID>/ 前缀下，不带前缀的端点对应默认设备。
+    """
+
+    def __init__(self, flask_app, devices, wsgi_workers: int = config.ASYNC_WSGI_WORKERS):
+        """
+        Args:
+            flask_app: 处理其余路由的 Flask (WSGI) 应用
+            devices: DeviceRegistry 实例 (各会话提供 state / payloads / video_hub)
+            wsgi_workers: 执行 Flask 路由的线程数
+        """
+        self.flask_app = flask_app
+        self.devices = devices
+        self.executor = ThreadPoolExecutor(max_workers=wsgi_workers, thread_name_prefix="wsgi")
+        # 设备 ID -> 版本等待器 (会话可能在运行中新建，首次请求时创建)
+        self._waiters: Dict[str, VersionWaiter] = {}
+
+    def build_app(self) -> "web.Application":
+        app = web.Application()
+        app.on_cleanup.append(self._on_cleanup)
+        for prefix in ("", "/d/{device}"):
+            app.router.add_get(prefix + "/detect", self.detect)
+            app.router.add_get(prefix + "/events", self.events)
+            app.router.add_get(prefix + "/overlay", self.overlay)
+            app.router.add_get(prefix + "/video", self.video)
+        app.router.add_route("*", "/{tail:.*}", self.wsgi)
+        return app
+
+    async def _on_cleanup(self, app) -> None:
+        self.executor.shutdown(wait=False)
+
+    def _session(self, request) -> Tuple[Any, VersionWaiter]:
+        """按 URL 中的设备 ID 取会话及其版本等待器；未知设备返回 404"""
+        session = self.devices.get(request.match_info.get("device"))
+        if session is None:
+            raise web.HTTPNotFound(text="unknown device")
+        waiter = self._waiters.get(session.id)
+        if waiter is None:
+            waiter = self._waiters[session.id] = VersionWaiter(session.state, asyncio.get_running_loop())
+        return session, waiter
+
+    # =========================
+    # HUD 端点
+    # =========================
+    async def detect(self, request) -> "web.Response":
+        """与 Flask 版 /detect 相同：ETag / 304 与 ?since=&wait= 长轮询"""
+        session, waiter = self._session(request)
+        since = _int_arg(request, "since")
+        wait_ms = _int_arg(request, "wait", 0)
+        if since is not None and wait_ms > 0:
+            await waiter.wait(since, min(wait_ms, config.DETECT_LONG_POLL_MAX_MS) / 1000.0)
+
+        version, body = session.payloads.current()
+        headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+        if (since is not None and version == since) or _etag_matches(request.headers.get("If-None-Match"), version):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+    async def _sse_response(self, request) -> "web.StreamResponse":
+        resp = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await resp.prepare(request)
+        return resp
+
+    async def events(self, request) -> "web.StreamResponse":
+        """与 Flask 版 /events 相同：先推送快照，之后推送增量"""
+        session, waiter = self._session(request)
+        resp = await self._sse_response(request)
+        try:
+            version, msg = session.payloads.snapshot_event()
+            await resp.write(msg)
+            while True:
+                if await waiter.wait(version, config.PUSH_KEEPALIVE_INTERVAL) == version:
+                    await resp.write(b": keepalive\n\n")
+                    continue
+                version, msg = session.payloads.delta_event(version)
+                if msg:
+                    await resp.write(msg)
+                await asyncio.sleep(config.PUSH_MIN_INTERVAL)
+        except ConnectionResetError:
+            pass  # 客户端已断开
+        return resp
+
+    async def overlay(self, request) -> "web.StreamResponse":
+        """与 Flask 版 /overlay 相同：每个检测帧推送一条叠加数据"""
+        session, waiter = self._session(request)
+        resp = await self._sse_response(request)
+        try:
+            version, last_seq = -1, None
+            while True:
+                new = await waiter.wait(version, config.PUSH_KEEPALIVE_INTERVAL)
+                if new == version:
+                    await resp.write(b": keepalive\n\n")
+                    continue
+                version = new
+                seq, msg = session.payloads.overlay_event()
+                if seq != last_seq:
+                    last_seq = seq
+                    await resp.write(msg)
+        except ConnectionResetError:
+            pass  # 客户端已断开
+        return resp
+
+    async def video(self, request) -> "web.StreamResponse":
+        """与 Flask 版 /video 相同：共享广播器的 multipart 数据，慢客户端丢弃旧帧"""
+        session, _ = self._session(request)
+        profile = resolve_profile(request.query.get("profile"), _float_arg(request, "kbps"))
+        resp = web.StreamResponse(headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame"})
+        await resp.prepare(request)
+        stream = session.video_hub.astream(profile)
+        try:
+            async for chunk in stream:
+                await resp.write(chunk)
+        except ConnectionResetError:
+            pass  # 客户端已断开
+        finally:
+            await stream.aclose()
+        return resp
+
+    # =========================
+    # 其余路由：转交 Flask
+    # =========================
+    async def wsgi(self, request) -> "web.Response":
+        body = await request.read()
+        environ = self._environ(request, body)
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self._call_wsgi, environ)
+        return web.Response(status=status, headers=headers, body=content)
+
+    def _environ(self, request, body: bytes) -> dict:
+        host, _, port = (request.host or "").partition(":")
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            # WSGI 要求 PATH_INFO 为按 latin-1 解码的原始字节
+            "PATH_INFO": unquote_to_bytes(request.rel_url.raw_path).decode("latin-1"),
+            "QUERY_STRING": request.rel_url.raw_query_string,
+            "SERVER_NAME": host or "localhost",
+            "SERVER_PORT": port or str(config.SERVER_PORT),
+            "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+            "REMOTE_ADDR": request.remote or "",
+            "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": request.scheme,
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            key = "HTTP_" + name.upper().replace("-", "_")
+            if key in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+                continue
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _call_wsgi(self, environ: dict):
+        """在线程池中执行 Flask 应用，返回 (状态码, 响应头, 响应体)"""
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured["status"] = int(status.split(" ", 1)[0])
+            captured["headers"] = [(k, v) for k, v in headers if k.lower() not in _HOP_HEADERS]
+
+        result = self.flask_app(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return captured["status"], captured["headers"], content
+
+
+def run_async_server(flask_app, devices, host: str = "0.0.0.0", port: int = config.SERVER_PORT) -> None:
+    """启动异步服务器 (阻塞，直到进程退出)"""
+    server = AsyncHUDServer(flask_app, devices)
+    print(f"[Server] aiohttp on {host}:{port} (HUD endpoints async, "
+          f"{config.ASYNC_WSGI_WORKERS} WSGI workers for the rest)")
+    web.run_app(server.build_app(), host=host, port=port, print=None, access_log=None)
@@ -13,8 +13,16 @@ class AudioService:
     音频服务类：负责管理音频发送队列，并通过 TCP 协议将 WAV 数据流推送到 ESP32。
     使用单一消费者线程 (_worker) 串行处理音频发送，避免冲突。
     """
-    def __init__(self, state: AppState):
+    def __init__(self, state: AppState, host: str = config.ESP32_IP, port: int = config.TTS_TCP_PORT):
+        """
+        Args:
+            state: 所属设备的状态
+            host: 设备 (ESP32) 地址
+            port: 设备接收音频的 TCP 端口
+        """
         self.state = state
+        self.host = host
+        self.port = port
         self.queue = queue.Queue(maxsize=3) # 增加队列深度以缓冲对话
         self.thread = threading.Thread(target=self._worker, daemon=True)
         self.thread.start()
@@ -31,10 +39,19 @@ class AudioService:
                 pass
         self.queue.put_nowait(("FILE", config.AUDIO_MAP[level]))
 
-    def play_pcm_bytes(self, pcm_data: bytes, sample_rate=16000):
+    def play_pcm_bytes(self, pcm_data: bytes, sample_rate=16000, wait: bool = False):
         """
         播放一段原始 PCM 数据 (用于 TTS 回复)
+
+        Args:
+            wait: 为 True 时队列满则阻塞等待而不是丢弃旧任务 (逐句播报不能丢句)
         """
+        if wait:
+            try:
+                self.queue.put(("RAW", pcm_data, sample_rate), timeout=30.0)
+            except queue.Full:
+                print("[Audio] 播放队列阻塞超时，丢弃该段语音")
+            return
         if self.queue.full():
             try:
                 self.queue.get_nowait()
@@ -96,7 +113,7 @@ class AudioService:
         for attempt in range(max_attempts):
             try:
                 # 建立 TCP 连接 (2秒超时)
-                with socket.create_connection((config.ESP32_IP, config.TTS_TCP_PORT), timeout=2.0) as s:
+                with socket.create_connection((self.host, self.port), timeout=2.0) as s:
                     s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                     s.sendall(header)
                     chunk = 4096 
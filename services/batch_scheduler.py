@@ -0,0 +1,244 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import config
+
+# 推理结果：(帧快照, 检测框列表, 推理耗时 ms)
+Result = Tuple[Any, List[Dict[str, Any]], float]
+
+
+class InferenceStream:
+    """
+    调度器中的一路设备：按 FPS 目标从 source 取最新帧，结果放入一格邮箱 (只保留最新结果)。
+    由调度器创建，设备自己的处理循环通过 get() 取结果。
+    """
+
+    def __init__(self, stream_id: str, source: Callable[[], Any], fps: float, max_queue_ms: float,
+                 pace: Optional[Callable[[float], Optional[float]]] = None):
+        """
+        Args:
+            stream_id: 设备/流标识
+            source: 返回最新帧快照 (FrameSnapshot) 的可调用对象
+            fps: 推理帧率目标
+            max_queue_ms: 帧在收集窗口中的最长排队时间 (毫秒)
+            pace: 可选，按佩戴者运动状态调整推理间隔 (ImuTrack.infer_interval)：
+                  参数为基准间隔 (秒)，返回本次使用的间隔；返回 None 表示暂不推理 (快速转头画面模糊)
+        """
+        self.id = stream_id
+        self.source = source
+        self.base_interval = 1.0 / fps if fps > 0 else 0.0
+        self.interval = self.base_interval
+        self.pace = pace
+        self.max_queue = max_queue_ms / 1000.0
+        self.next_due = 0.0
+        self.last_seq = 0
+
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._slot: Optional[Result] = None
+
+        # 统计
+        self.delivered = 0
+        self.overwritten = 0       # 处理循环来不及取走就被新结果覆盖的次数
+        self.queue_ms_avg = 0.0    # 帧就绪到开始推理的平均排队时间
+        self.motion_skipped = 0    # 因快速转头跳过的帧数
+        self._skipped_seq = 0
+
+    def pending(self, now: float):
+        """到期且有新帧时返回最新帧快照，否则返回 None"""
+        if now < self.next_due:
+            return None
+        snap = self.source()
+        if snap is None or snap.raw is None or snap.seq == self.last_seq:
+            return None
+        if self.pace is not None:
+            interval = self.pace(self.base_interval)
+            if interval is None:
+                if snap.seq != self._skipped_seq:
+                    self._skipped_seq = snap.seq
+                    self.motion_skipped += 1
+                return None
+            self.interval = interval
+        return snap
+
+    def put(self, result: Result) -> None:
+        with self._lock:
+            if self._slot is not None:
+                self.overwritten += 1
+            self._slot = result
+        self._event.set()
+
+    def get(self, timeout: float) -> Optional[Result]:
+        """取出最新结果；超时返回 None"""
+        if not self._event.wait(timeout):
+            return None
+        with self._lock:
+            result, self._slot = self._slot, None
+            self._event.clear()
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "fps_target": round(1.0 / self.interval, 1) if self.interval > 0 else None,
+            "delivered": self.delivered,
+            "overwritten": self.overwritten,
+            "queue_ms": round(self.queue_ms_avg, 2),
+            "motion_skipped": self.motion_skipped,
+        }
+
+
+class BatchScheduler:
+    """
+    多路批量推理调度器：一个调度线程在短时间窗口内收集各路到期的最新帧，
+    合并为一次批量前向 (VisionService.predict_batch)，再把结果分发回各路。
+
+    - 首个到期帧出现后最多再等 window 毫秒凑批，但不超过参与各路的最长排队时间；
+      只等待在窗口内才到期的路；窗口内不可能到期 (FPS 目标未到) 或已到期却没有新帧
+      (相机离线、帧率低于目标) 的路不会被等待，单路在线时不引入额外延迟
+    - 每路按各自的 FPS 目标取帧，同一帧不会重复推理
+    - 设备越多，每次前向分摊到每路的开销越低
+    """
+
+    def __init__(self, vision, window_ms: float = config.BATCH_WINDOW_MS,
+                 max_batch: int = config.BATCH_MAX_SIZE):
+        """
+        Args:
+            vision: 具有 predict_batch(frames) -> (boxes_list, infer_ms) 的视觉服务
+            window_ms: 收集窗口 (毫秒)
+            max_batch: 单次前向的最大帧数
+        """
+        self.vision = vision
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._streams: Dict[str, InferenceStream] = {}
+        self._running = False
+        self.thread: Optional[threading.Thread] = None
+
+        # 统计
+        self._batches = 0
+        self._frames = 0
+        self._busy_ms = 0.0
+
+    # =========================
+    # 设备注册
+    # =========================
+    def register(self, stream_id: str, source: Callable[[], Any],
+                 fps: float = config.STREAM_FPS_TARGET,
+                 max_queue_ms: float = config.STREAM_MAX_QUEUE_MS,
+                 pace: Optional[Callable[[float], Optional[float]]] = None) -> InferenceStream:
+        """注册一路设备，返回其结果流 (pace 见 InferenceStream)"""
+        stream = InferenceStream(stream_id, source, fps, max_queue_ms, pace)
+        with self._lock:
+            self._streams[stream_id] = stream
+        print(f"[Batch] Stream '{stream_id}' registered ({len(self._streams)} total)")
+        return stream
+
+    def unregister(self, stream_id: str) -> None:
+        with self._lock:
+            self._streams.pop(stream_id, None)
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    # =========================
+    # 调度
+    # =========================
+    def _loop(self) -> None:
+        while self._running:
+            batch = self.collect()
+            if not batch:
+                time.sleep(0.003)
+                continue
+            self.run_batch(batch)
+
+    def collect(self) -> List[Tuple[InferenceStream, Any, float]]:
+        """
+        收集本批要推理的帧。
+
+        Returns:
+            [(流, 帧快照, 就绪时间), ...]；没有到期的帧时为空
+        """
+        with self._lock:
+            streams = list(self._streams.values())
+        now = time.time()
+        ready: Dict[str, Tuple[InferenceStream, Any, float]] = {}
+        for s in streams:
+            snap = s.pending(now)
+            if snap is not None:
+                ready[s.id] = (s, snap, now)
+        if not ready:
+            return []
+
+        deadline = now + min([self.window] + [s.max_queue for s, _, _ in ready.values()])
+        while len(ready) < min(len(streams), self.max_batch):
+            now = time.time()
+            if now >= deadline:
+                break
+            waiting = False
+            for s in streams:
+                if s.id in ready:
+                    continue
+                snap = s.pending(now)
+                if snap is not None:
+                    ready[s.id] = (s, snap, now)
+                    deadline = min(deadline, now + s.max_queue)
+                elif now < s.next_due <= deadline:
+                    # 窗口内才到期的路值得等待；已到期却没有新帧的路 (相机离线或较慢) 不等
+                    waiting = True
+            if not waiting:
+                break
+            time.sleep(0.001)
+
+        # 凑批期间可能有更新的帧，取各路最新的一帧
+        batch = []
+        for s, snap, ready_ts in list(ready.values())[:self.max_batch]:
+            latest = s.source()
+            if latest is not None and latest.raw is not None and latest.seq != s.last_seq:
+                snap = latest
+            batch.append((s, snap, ready_ts))
+        return batch
+
+    def run_batch(self, batch: List[Tuple[InferenceStream, Any, float]]) -> None:
+        """执行一次批量前向并把结果分发回各路"""
+        start = time.time()
+        for s, snap, ready_ts in batch:
+            s.last_seq = snap.seq
+            s.next_due = start + s.interval
+            queue_ms = (start - ready_ts) * 1000.0
+            alpha = 0.1 if s.delivered > 0 else 1.0
+            s.queue_ms_avg += alpha * (queue_ms - s.queue_ms_avg)
+        try:
+            boxes_list, infer_ms = self.vision.predict_batch([snap.raw for _, snap, _ in batch])
+        except Exception as e:
+            print(f"[Batch] Inference error: {e}")
+            return
+        for (s, snap, _), boxes in zip(batch, boxes_list):
+            s.delivered += 1
+            s.put((snap, boxes, infer_ms))
+        self._batches += 1
+        self._frames += len(batch)
+        self._busy_ms += infer_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """批次数、平均批大小、每帧分摊推理耗时与各路统计"""
+        with self._lock:
+            streams = list(self._streams.values())
+        return {
+            "batches": self._batches,
+            "frames": self._frames,
+            "avg_batch": round(self._frames / self._batches, 2) if self._batches else 0.0,
+            "ms_per_frame": round(self._busy_ms / self._frames, 2) if self._frames else 0.0,
+            "streams": [s.get_stats() for s in streams],
+        }
@@ -0,0 +1,205 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+from .camera_ingest import FrameSlot
+from .camera_link import FPS_RANGE, FRAME_SIZES
+
+
+@dataclass(frozen=True)
+class CameraMeasure:
+    """一台设备在一个控制周期内的测量值"""
+    arrival_fps: float = 0.0   # 到达帧率
+    kbps: float = 0.0          # 到达码率
+    drop_ratio: float = 0.0    # 到达的帧中未及解码即被覆盖的比例
+    decode_ms: float = 0.0     # 平均解码耗时
+    infer_ms: float = 0.0      # 最近一次检测的推理耗时 (批量推理时为整批耗时)
+    age_ms: float = 0.0        # 最近一次检测所用帧的帧龄 (到达→结果发布)
+
+
+def _profile(level: int) -> Tuple[str, int]:
+    """警报等级对应的 (分辨率, 帧率上限)"""
+    levels = [lv for lv in config.CAMERA_CTRL_PROFILES if lv <= level]
+    return config.CAMERA_CTRL_PROFILES[max(levels) if levels else min(config.CAMERA_CTRL_PROFILES)]
+
+
+class CameraTuner:
+    """
+    一台设备的码控决策 (只做计算，不下发命令)：
+
+    1. 帧率：处理链路每帧耗时取推理耗时、解码耗时与推理间隔中的最大者，
+       发送帧率 = 可消费帧率 × 余量，且不超过当前警报等级的帧率上限
+    2. 拥塞 (帧龄过大或解码丢帧过多) 或链路受限 (到达帧率明显低于下发帧率)：
+       先调高 JPEG 质量数值减少每帧字节数，已到上限再降一级分辨率；拥塞时帧率再打七折
+    3. 持续无拥塞 CAMERA_CTRL_RECOVER_S 秒后逐周期恢复画质，画质恢复后再按警报等级升回分辨率
+    4. 警报等级升高时立即切换到该等级的分辨率 (以分辨率换帧率)
+    """
+
+    def __init__(self):
+        self.framesize = "VGA"                     # 两种固件的默认分辨率
+        self.quality = config.CAMERA_CTRL_QUALITY_START
+        self.fps = 0                               # 0: 尚未下发
+        self.reason = "init"
+        self._calm_since: Optional[float] = None
+        self._settle_until = 0.0    # 分辨率切换后相机重新配置，期间的测量值不参与判断
+        self._upgrade_after = 0.0   # 因拥塞降分辨率后，较长时间内不再升分辨率，避免来回切换
+
+    def update(self, m: CameraMeasure, level: int, now: float) -> Tuple[str, int, int]:
+        """
+        根据本周期测量值与警报等级计算新的设置。
+
+        Returns:
+            (分辨率, JPEG 质量, 发送帧率)
+        """
+        best, worst = config.CAMERA_CTRL_QUALITY
+        want_size, fps_cap = _profile(level)
+
+        # 1. 处理链路可消费的帧率
+        frame_ms = max(m.infer_ms, m.decode_ms, config.INFER_INTERVAL * 1000.0)
+        fps = min(float(fps_cap), 1000.0 / frame_ms * config.CAMERA_CTRL_HEADROOM)
+
+        # 2. 拥塞与链路受限
+        settling = now < self._settle_until
+        congested = not settling and (m.age_ms > config.CAMERA_CTRL_MAX_AGE_MS
+                                      or m.drop_ratio > config.CAMERA_CTRL_MAX_DROP)
+        link_bound = (not settling and self.fps > 0
+                      and m.arrival_fps < config.CAMERA_CTRL_LINK_RATIO * self.fps)
+        if congested or link_bound:
+            self._calm_since = now
+            if self.quality < worst:
+                self.quality = min(worst, self.quality + config.CAMERA_CTRL_QUALITY_STEP)
+            elif FRAME_SIZES.index(self.framesize) > 0:
+                self._set_size(FRAME_SIZES[FRAME_SIZES.index(self.framesize) - 1], now)
+                self._upgrade_after = now + config.CAMERA_CTRL_RECOVER_S * 10
+            if congested:
+                fps *= 0.7
+            self.reason = "congested" if congested else "link"
+        else:
+            if self._calm_since is None:
+                self._calm_since = now
+            if now - self._calm_since >= config.CAMERA_CTRL_RECOVER_S and self.quality > best:
+                self.quality -= 1
+            self.reason = "ok"
+
+        # 3. 按警报等级选择分辨率：降级立即生效，升级等画质恢复且过了恢复期
+        want, have = FRAME_SIZES.index(want_size), FRAME_SIZES.index(self.framesize)
+        if want < have:
+            self._set_size(want_size, now)
+            self.reason = f"alert L{level}"
+        elif (want > have and self.reason == "ok" and now >= self._upgrade_after
+              and now - self._calm_since >= config.CAMERA_CTRL_RECOVER_S
+              and self.quality <= config.CAMERA_CTRL_QUALITY_START):
+            self._set_size(FRAME_SIZES[have + 1], now)
+            self._calm_since = now   # 升级后重新观察一个恢复期
+
+        self.fps = int(round(max(FPS_RANGE[0], min(FPS_RANGE[1], fps))))
+        return self.framesize, self.quality, self.fps
+
+    def _set_size(self, framesize: str, now: float) -> None:
+        self.framesize = framesize
+        self._settle_until = now + 2 * config.CAMERA_CTRL_INTERVAL
+
+
+class CameraRateController:
+    """
+    相机闭环码控：一个控制线程每个周期为各设备测量到达帧率、码率、解码丢帧、推理耗时与帧龄，
+    由 CameraTuner 计算发送帧率、JPEG 质量与分辨率，只在设置变化时经会话的 CameraLink 下发
+    (WebSocket 推流设备为 SET:* 命令，MJPEG 固件为 /control 请求)。
+    没有可用控制通道或本周期没有收到帧的设备不做调整。
+    """
+
+    def __init__(self, devices, interval: float = config.CAMERA_CTRL_INTERVAL):
+        """
+        Args:
+            devices: DeviceRegistry (会话的 camera 为接入引擎的 FrameSlot，camera_link 为控制通道)
+            interval: 控制周期 (秒)
+        """
+        self.devices = devices
+        self.interval = interval
+        self._tuners: Dict[str, CameraTuner] = {}
+        self._prev: Dict[str, Tuple[float, int, int, int]] = {}  # 设备 ID -> (时间, 收到帧数, 字节数, 丢帧数)
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True, name="camera-ctrl")
+        self.thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1.0)
+
+    def _loop(self) -> None:
+        while self._running:
+            time.sleep(self.interval)
+            self.step(time.time())
+
+    # =========================
+    # 控制周期
+    # =========================
+    def measure(self, session, now: float) -> Optional[CameraMeasure]:
+        """与上一周期的计数相减得到本周期的测量值；首个周期或会话不是接入引擎的帧槽时返回 None"""
+        slot = session.camera
+        if not isinstance(slot, FrameSlot):
+            return None
+        cur = (now, slot.received, slot.bytes_received, slot.dropped)
+        prev = self._prev.get(session.id)
+        self._prev[session.id] = cur
+        if prev is None or now <= prev[0]:
+            return None
+        dt = now - prev[0]
+        received = cur[1] - prev[1]
+        det = session.state.detection
+        fresh = det.ts > 0 and now - det.ts < 2 * self.interval  # 处理循环停顿时不使用旧的检测结果
+        return CameraMeasure(
+            arrival_fps=received / dt,
+            kbps=(cur[2] - prev[2]) * 8 / 1000.0 / dt,
+            drop_ratio=(cur[3] - prev[3]) / received if received > 0 else 0.0,
+            decode_ms=slot.decode_ms_avg,
+            infer_ms=det.infer_ms if fresh else 0.0,
+            age_ms=det.delay_ms if fresh else 0.0,
+        )
+
+    def step(self, now: float) -> None:
+        for session in self.devices.sessions():
+            measure = self.measure(session, now)
+            link = session.camera_link
+            if measure is None or link is None or link.transport is None or measure.arrival_fps <= 0:
+                continue
+            tuner = self._tuners.setdefault(session.id, CameraTuner())
+            framesize, quality, fps = tuner.update(measure, session.state.alert.level, now)
+            self.apply(link, framesize, quality, fps)
+            self._stats[session.id] = {
+                "id": session.id,
+                "transport": link.transport,
+                "framesize": framesize,
+                "quality": quality,
+                "fps": fps,
+                "arrival_fps": round(measure.arrival_fps, 1),
+                "kbps": round(measure.kbps, 1),
+                "drop_ratio": round(measure.drop_ratio, 3),
+                "infer_ms": round(measure.infer_ms, 1),
+                "age_ms": round(measure.age_ms, 1),
+                "reason": tuner.reason,
+            }
+
+    @staticmethod
+    def apply(link, framesize: str, quality: int, fps: int) -> None:
+        """只下发与上次不同的设置"""
+        if link.framesize != framesize:
+            link.set_framesize(framesize)
+        if link.quality != quality:
+            link.set_quality(quality)
+        if link.fps != fps:
+            link.set_fps(fps)
+
+    def get_stats(self) -> Dict[str, Any]:
+        devices: List[Dict[str, Any]] = list(self._stats.values())
+        return {"running": self._running, "interval": self.interval, "devices": devices}
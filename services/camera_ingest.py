@@ -0,0 +1,358 @@
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from . import config
+from .state import AppState
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+_CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+_SOI = b"\xff\xd8"
+_EOI = b"\xff\xd9"
+
+
+class MJPEGDemuxer:
+    """
+    增量 MJPEG 分帧：每次只处理新到的字节，不重复扫描已检查过的数据。
+
+    - 分段头带 Content-Length 时 (ESP32 固件与本服务的 /video 都带) 按长度直接切出 JPEG，
+      不扫描 JPEG 内容
+    - 分段头没有 Content-Length 时退回按 JPEG 起止标记 (FFD8 / FFD9) 分帧，
+      并记住上次扫描到的位置
+    """
+
+    def __init__(self, max_frame: int = config.CAMERA_MAX_FRAME_BYTES):
+        self.max_frame = max_frame
+        self._buf = bytearray()
+        self._scan = 0                  # 下一次查找的起始位置
+        self._need: Optional[int] = None  # 按长度模式：当前帧的字节数
+        self._by_marker = False         # 是否已退回按标记分帧
+        self._start = -1                # 按标记模式：当前帧起始位置
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """送入新数据，返回其中已完整的 JPEG 帧"""
+        self._buf += data
+        frames: List[bytes] = []
+        while True:
+            frame = self._next_by_marker() if self._by_marker else self._next_by_length()
+            if frame is None:
+                break
+            frames.append(frame)
+        if len(self._buf) > self.max_frame * 2:
+            # 流已损坏 (找不到帧边界)：丢弃缓冲重新同步
+            self._reset()
+        return frames
+
+    def _reset(self) -> None:
+        self._buf.clear()
+        self._scan = 0
+        self._need = None
+        self._start = -1
+
+    def _next_by_length(self) -> Optional[bytes]:
+        buf = self._buf
+        if self._need is None:
+            end = buf.find(b"\r\n\r\n", self._scan)
+            if end < 0:
+                self._scan = max(0, len(buf) - 3)
+                return None
+            match = _CONTENT_LENGTH.search(buf, 0, end)
+            if match is None:
+                # 没有长度头：之后一律按标记分帧
+                self._by_marker = True
+                self._scan = 0
+                return self._next_by_marker()
+            self._need = int(match.group(1))
+            del buf[:end + 4]
+            self._scan = 0
+        if len(buf) < self._need:
+            return None
+        frame = bytes(buf[:self._need])
+        del buf[:self._need]
+        self._need = None
+        return frame
+
+    def _next_by_marker(self) -> Optional[bytes]:
+        buf = self._buf
+        if self._start < 0:
+            start = buf.find(_SOI, self._scan)
+            if start < 0:
+                # 保留最后 1 字节，防止标记被截断在两次数据之间
+                keep = buf[-1:]
+                buf.clear()
+                buf += keep
+                self._scan = 0
+                return None
+            self._start = start
+            self._scan = start + 2
+        end = buf.find(_EOI, self._scan)
+        if end < 0:
+            self._scan = max(self._start + 2, len(buf) - 1)
+            return None
+        frame = bytes(buf[self._start:end + 2])
+        del buf[:end + 2]
+        self._start = -1
+        self._scan = 0
+        return frame
+
+
+class FrameSlot:
+    """
+    一台设备的最新帧槽：事件循环只把 JPEG 放入槽位 (不解码)，
+    解码线程池每台设备最多同时解码一帧，且只解码槽中最新的一帧，来不及解码的旧帧直接丢弃。
+    解码后写入设备的 AppState，并通过 on_jpeg 直通给观看者。
+    """
+
+    def __init__(self, device_id: str, state: AppState, source: str,
+                 on_jpeg: Optional[Callable[[bytes, int], None]] = None):
+        """
+        Args:
+            device_id: 设备 ID
+            state: 设备的状态 (解码后的帧写入 state.frame)
+            source: 来源类型 (mjpeg / ws)
+            on_jpeg: 可选回调 (原始 JPEG, 帧序号)
+        """
+        self.id = device_id
+        self.state = state
+        self.source = source
+        self._on_jpeg = on_jpeg
+        self._lock = threading.Lock()
+        self._pending: Optional[tuple] = None
+        self._busy = False
+        self.pushing = 0          # 活动的推流连接数；大于 0 时暂停该设备的 MJPEG 拉流
+
+        # 统计
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self.received = 0
+        self.bytes_received = 0
+        self.decoded = 0
+        self.dropped = 0          # 未来得及解码就被新帧覆盖
+        self.decode_ms_avg = 0.0
+        self.fps = 0.0
+        self._last_decoded_ts = 0.0
+
+    def put(self, jpg: bytes, ts: float) -> bool:
+        """
+        放入一帧 JPEG (事件循环或任意线程调用)。
+
+        Returns:
+            是否需要调度一次解码 (槽位之前空闲)
+        """
+        with self._lock:
+            self.received += 1
+            self.bytes_received += len(jpg)
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (jpg, ts)
+            if self._busy:
+                return False
+            self._busy = True
+            return True
+
+    def drain(self) -> None:
+        """在解码线程中执行：循环解码槽中最新的一帧，直到槽位为空"""
+        while True:
+            with self._lock:
+                item, self._pending = self._pending, None
+                if item is None:
+                    self._busy = False
+                    return
+            jpg, ts = item
+            t0 = time.perf_counter()
+            frame = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+            seq = self.state.update_frame(frame, ts, jpg)
+            if self._on_jpeg:
+                self._on_jpeg(jpg, seq)
+
+            decode_ms = (time.perf_counter() - t0) * 1000.0
+            alpha = 0.1 if self.decoded > 0 else 1.0
+            self.decode_ms_avg += alpha * (decode_ms - self.decode_ms_avg)
+            if self._last_decoded_ts > 0 and ts > self._last_decoded_ts:
+                self.fps += alpha * (1.0 / (ts - self._last_decoded_ts) - self.fps)
+            self._last_decoded_ts = ts
+            self.decoded += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "source": self.source,
+            "connected": self.connected,
+            "received": self.received,
+            "decoded": self.decoded,
+            "dropped": self.dropped,
+            "fps": round(self.fps, 1),
+            "decode_ms": round(self.decode_ms_avg, 2),
+            "last_error": self.last_error,
+        }
+
+
+class CameraIngestEngine:
+    """
+    相机接入引擎：所有设备的相机连接由一个事件循环线程持有，替代每台相机一个线程的 CameraService。
+
+    - MJPEG 拉流 (ESP32 :81/stream) 以协程读取，读到多少处理多少，增量分帧
+    - 推流来源 (如 WebSocket 推送 JPEG) 通过 push() / ingest_ws() 写入同一套帧槽
+    - JPEG 解码 (cv2.imdecode 释放 GIL) 在固定大小的线程池中进行，每台设备只解码最新一帧
+    - 设备越多，线程数不变
+    """
+
+    def __init__(self, decode_workers: int = config.CAMERA_DECODE_WORKERS):
+        """
+        Args:
+            decode_workers: JPEG 解码线程数 (所有设备共用)
+        """
+        self.decode_workers = decode_workers
+        self._decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="jpeg-decode")
+        self._lock = threading.Lock()
+        self._slots: Dict[str, FrameSlot] = {}
+        self._pulls: Dict[str, Any] = {}   # 设备 ID -> 拉流任务 (concurrent.futures.Future)
+        self._http: Optional["aiohttp.ClientSession"] = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="camera-ingest")
+        self.thread.start()
+
+    # =========================
+    # 设备登记
+    # =========================
+    def attach(self, device_id: str, state: AppState, source: str = "push",
+               on_jpeg: Optional[Callable[[bytes, int], None]] = None) -> FrameSlot:
+        """为设备创建帧槽 (推流来源使用)；已存在时返回原帧槽"""
+        with self._lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                slot = self._slots[device_id] = FrameSlot(device_id, state, source, on_jpeg)
+        return slot
+
+    def add_mjpeg(self, device_id: str, url: str, state: AppState,
+                  on_jpeg: Optional[Callable[[bytes, int], None]] = None) -> FrameSlot:
+        """登记一路 MJPEG 拉流，在事件循环中保持连接 (断开后退避重连)"""
+        slot = self.attach(device_id, state, "mjpeg", on_jpeg)
+        future = asyncio.run_coroutine_threadsafe(self._pull_mjpeg(slot, url), self.loop)
+        with self._lock:
+            self._pulls[device_id] = future
+        print(f"[Ingest] MJPEG stream '{device_id}': {url} ({len(self._slots)} cameras on one loop)")
+        return slot
+
+    def remove(self, device_id: str) -> None:
+        with self._lock:
+            future = self._pulls.pop(device_id, None)
+            self._slots.pop(device_id, None)
+        if future is not None:
+            future.cancel()
+
+    def close(self) -> None:
+        with self._lock:
+            futures = list(self._pulls.values())
+            self._pulls.clear()
+        for future in futures:
+            future.cancel()
+        if self._http is not None:
+            asyncio.run_coroutine_threadsafe(self._http.close(), self.loop).result(timeout=2.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2.0)
+        self._decoder.shutdown(wait=False)
+
+    # =========================
+    # 帧写入
+    # =========================
+    def push(self, slot: FrameSlot, jpg: bytes, ts: Optional[float] = None) -> None:
+        """写入一帧 JPEG，槽位空闲时调度解码"""
+        if slot.put(jpg, time.time() if ts is None else ts):
+            self._decoder.submit(slot.drain)
+
+    async def ingest_ws(self, slot: FrameSlot, ws,
+                        on_text: Optional[Callable[[str], None]] = None,
+                        divert: Optional[Callable[[bytes], bool]] = None) -> None:
+        """
+        消费一个 WebSocket 连接推送的帧 (aiohttp 服务端或客户端 WebSocket 均可)，直到连接关闭。
+        二进制消息即一帧完整 JPEG，无需分帧；文本消息交给 on_text。
+        divert 返回 True 的二进制消息 (如高清快照) 不作为视频帧写入。
+        连接期间该设备的 MJPEG 拉流暂停。
+        """
+        slot.connected = True
+        slot.pushing += 1
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    if divert is None or not divert(msg.data):
+                        self.push(slot, msg.data)
+                elif msg.type == aiohttp.WSMsgType.TEXT and on_text is not None:
+                    on_text(msg.data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    slot.last_error = str(ws.exception())
+                    break
+        finally:
+            slot.pushing -= 1
+            slot.connected = slot.pushing > 0
+
+    async def _pull_mjpeg(self, slot: FrameSlot, url: str) -> None:
+        """MJPEG 拉流协程：读到多少处理多少，断开后按 CAPTURE_BACKOFF_* 退避重连，设备推流期间暂停"""
+        if self._http is None:
+            # 不限制连接数：每台相机一条长连接
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=3.0, sock_read=10.0)
+        backoff = config.CAPTURE_BACKOFF_BASE
+        fails = 0
+        while True:
+            if slot.pushing > 0:
+                # 设备正通过 WebSocket 推流 (固件不再提供 :81/stream)
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                async with self._http.get(url, timeout=timeout) as resp:
+                    if resp.status != 200:
+                        raise ConnectionError(f"HTTP {resp.status}")
+                    if fails > 0:
+                        print(f"[Ingest] '{slot.id}' MJPEG 流连接成功 (之前失败 {fails} 次)")
+                    fails = 0
+                    backoff = config.CAPTURE_BACKOFF_BASE
+                    slot.connected = True
+                    demux = MJPEGDemuxer()
+                    async for chunk in resp.content.iter_any():
+                        if slot.pushing > 0:
+                            break
+                        now = time.time()
+                        for jpg in demux.feed(chunk):
+                            self.push(slot, jpg, now)
+                    slot.last_error = None if slot.pushing > 0 else "连接关闭"
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                slot.last_error = "连接超时"
+            except Exception as e:
+                slot.last_error = str(e) or type(e).__name__
+            finally:
+                slot.connected = slot.pushing > 0
+
+            if slot.pushing > 0:
+                continue
+            fails += 1
+            if fails % config.CAPTURE_FAIL_LOG_EVERY == 1:
+                print(f"[Ingest] '{slot.id}' MJPEG 流断开 ({fails}次): {slot.last_error}")
+            await asyncio.sleep(backoff)
+            backoff = min(config.CAPTURE_BACKOFF_MAX, backoff * 1.5)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各设备的接收、解码、丢帧统计"""
+        with self._lock:
+            slots = list(self._slots.values())
+        return {
+            "cameras": len(slots),
+            "decode_workers": self.decode_workers,
+            "streams": [s.get_stats() for s in slots],
+        }
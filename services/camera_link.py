@@ -0,0 +1,301 @@
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional
+
+from . import config
+
+try:
+    import aiohttp
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 固件 (example/compile.ino) 接受的取值范围
+FRAME_SIZES = ("VGA", "SVGA", "XGA")
+QUALITY_RANGE = (5, 40)   # JPEG 质量，数值越小越清晰
+FPS_RANGE = (5, 60)       # 发送节流，0 表示不限
+# MJPEG 固件 /control?var=&val= 的变量名 (与 esp32-camera CameraWebServer 示例一致，fps 为本项目固件扩展)
+_HTTP_VARS = {"SET:FRAMESIZE": "framesize", "SET:QUALITY": "quality", "SET:FPS": "fps"}
+# esp32-camera 的 framesize_t 枚举值
+_FRAMESIZE_IDS = {"VGA": 8, "SVGA": 9, "XGA": 10}
+
+
+class CameraLink:
+    """
+    一台设备的相机控制通道：WebSocket 推流设备经推流所用的连接下发文本命令；
+    未经 WebSocket 连接且配置了 http_base 时，SET 命令改为请求 MJPEG 固件的 /control 端点。
+
+    - SET:FRAMESIZE / SET:QUALITY / SET:FPS 按固件的取值范围先行约束，并记录最近一次下发的值
+    - SNAP:HQ 高清快照：固件回复 "SNAP:BEGIN"、一帧 SXGA JPEG、"SNAP:END"。
+      固件的发送任务可能在两个标记之间插入普通帧，取其中最大的一帧作为快照
+    - 固件拍完快照会把画质恢复为编译时默认值，结束后重新下发最近一次设置的画质
+
+    send / set_* 可在任意线程调用；snapshot 阻塞等待，不能在事件循环线程中调用。
+    """
+
+    def __init__(self, device_id: str, http_base: Optional[str] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Args:
+            device_id: 设备 ID
+            http_base: MJPEG 固件控制端点的地址 (如 http://<设备IP>)，为空时只支持 WebSocket
+            loop: 发送 HTTP 控制请求的事件循环 (CameraIngestEngine.loop)
+        """
+        self.id = device_id
+        self.http_base = http_base
+        self._http_loop = loop
+        self._ws: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.remote: Optional[str] = None
+
+        # 最近一次下发的设置 (None 表示沿用固件默认值)
+        self.framesize: Optional[str] = None
+        self.quality: Optional[int] = None
+        self.fps: Optional[int] = None
+
+        self._snap_lock = threading.Lock()       # 同一时间只有一个快照请求
+        self._state_lock = threading.Lock()
+        self._snap_future: Optional[Future] = None
+        self._snap_parts: Optional[List[bytes]] = None  # SNAP:BEGIN 之后收到的二进制消息
+
+        # 统计
+        self.commands = 0
+        self.http_errors = 0
+        self.snapshots = 0
+        self.snapshot_failures = 0
+        self.last_snapshot_ms = 0.0
+
+    # =========================
+    # 连接绑定 (事件循环线程)
+    # =========================
+    @property
+    def connected(self) -> bool:
+        """是否有 WebSocket 推流连接"""
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def transport(self) -> Optional[str]:
+        """当前命令下发方式：ws / http / None (无法下发)"""
+        if self.connected:
+            return "ws"
+        if self.http_base and self._http_loop is not None and AIOHTTP_AVAILABLE:
+            return "http"
+        return None
+
+    def bind(self, ws, loop: asyncio.AbstractEventLoop, remote: Optional[str] = None) -> None:
+        """设备连入：后续命令经此连接下发；重新下发之前设置过的参数 (设备重启后恢复)"""
+        self._ws, self._loop, self.remote = ws, loop, remote
+        with self._state_lock:
+            self._snap_parts = None
+        if self.framesize is not None:
+            self.send(f"SET:FRAMESIZE={self.framesize}")
+        if self.quality is not None:
+            self.send(f"SET:QUALITY={self.quality}")
+        if self.fps is not None:
+            self.send(f"SET:FPS={self.fps}")
+
+    def unbind(self, ws) -> None:
+        """连接断开 (同一设备可能已换用新连接，只解绑自己的)"""
+        if self._ws is ws:
+            self._ws = None
+        with self._state_lock:
+            self._snap_parts = None
+            if self._snap_future is not None and not self._snap_future.done():
+                self._snap_future.set_result(None)
+
+    # =========================
+    # 控制命令
+    # =========================
+    def send(self, command: str) -> bool:
+        """下发一条命令 (不等待发送完成)；无法下发 (未连接或 HTTP 端点不支持该命令) 时返回 False"""
+        transport = self.transport
+        if transport == "ws":
+            coro, loop = self._ws.send_str(command), self._loop
+        elif transport == "http":
+            key, _, value = command.partition("=")
+            var = _HTTP_VARS.get(key)
+            if var is None:
+                return False  # SNAP:HQ 只能经 WebSocket
+            if var == "framesize":
+                value = str(_FRAMESIZE_IDS[value])
+            coro, loop = self._http_control(var, value), self._http_loop
+        else:
+            return False
+        try:
+            asyncio.run_coroutine_threadsafe(coro, loop)
+        except RuntimeError:
+            coro.close()
+            return False  # 事件循环已关闭
+        self.commands += 1
+        return True
+
+    async def _http_control(self, var: str, value: str) -> None:
+        url = f"{self.http_base}/control"
+        try:
+            timeout = aiohttp.ClientTimeout(total=2.0)
+            async with aiohttp.ClientSession(timeout=timeout) as http:
+                async with http.get(url, params={"var": var, "val": value}) as resp:
+                    if resp.status != 200:
+                        raise ConnectionError(f"HTTP {resp.status}")
+        except Exception as e:
+            self.http_errors += 1
+            if self.http_errors % config.CAPTURE_FAIL_LOG_EVERY == 1:
+                print(f"[CameraLink] '{self.id}' /control {var}={value} 失败: {e or type(e).__name__}")
+
+    def set_framesize(self, name: str) -> bool:
+        name = name.upper()
+        if name not in FRAME_SIZES:
+            raise ValueError(f"framesize must be one of {FRAME_SIZES}")
+        self.framesize = name
+        return self.send(f"SET:FRAMESIZE={name}")
+
+    def set_quality(self, quality: int) -> bool:
+        self.quality = max(QUALITY_RANGE[0], min(QUALITY_RANGE[1], int(quality)))
+        return self.send(f"SET:QUALITY={self.quality}")
+
+    def set_fps(self, fps: int) -> bool:
+        fps = int(fps)
+        self.fps = 0 if fps <= 0 else max(FPS_RANGE[0], min(FPS_RANGE[1], fps))
+        return self.send(f"SET:FPS={self.fps}")
+
+    def snapshot(self, timeout: float = config.CAMERA_SNAPSHOT_TIMEOUT) -> Optional[bytes]:
+        """
+        请求一张高清快照并等待 (阻塞)。
+
+        Returns:
+            JPEG 字节；设备未连接、拍摄失败或超时返回 None
+        """
+        with self._snap_lock:
+            future: Future = Future()
+            with self._state_lock:
+                self._snap_future = future
+            t0 = time.perf_counter()
+            try:
+                if not self.send("SNAP:HQ"):
+                    return None
+                try:
+                    jpg = future.result(timeout=timeout)
+                except FutureTimeout:
+                    jpg = None
+            finally:
+                with self._state_lock:
+                    self._snap_future = None
+            if jpg is None:
+                self.snapshot_failures += 1
+                print(f"[CameraLink] '{self.id}' 高清快照失败 ({timeout:.1f}s 内未收到)")
+                return None
+            self.snapshots += 1
+            self.last_snapshot_ms = (time.perf_counter() - t0) * 1000.0
+            return jpg
+
+    # =========================
+    # 设备消息 (事件循环线程，由 CameraIngestEngine.ingest_ws 调用)
+    # =========================
+    def on_text(self, text: str) -> None:
+        text = text.strip()
+        if text == "SNAP:BEGIN":
+            with self._state_lock:
+                self._snap_parts = []
+        elif text == "SNAP:END":
+            with self._state_lock:
+                parts, self._snap_parts = self._snap_parts, None
+                future = self._snap_future
+            jpg = max(parts, key=len) if parts else None
+            if future is not None and not future.done():
+                future.set_result(jpg)
+            if self.quality is not None:
+                self.send(f"SET:QUALITY={self.quality}")
+
+    def divert(self, data: bytes) -> bool:
+        """SNAP:BEGIN 与 SNAP:END 之间的二进制消息属于快照，不作为视频帧写入"""
+        with self._state_lock:
+            if self._snap_parts is None:
+                return False
+            self._snap_parts.append(data)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "connected": self.connected,
+            "transport": self.transport,
+            "remote": self.remote,
+            "framesize": self.framesize,
+            "quality": self.quality,
+            "fps": self.fps,
+            "commands": self.commands,
+            "http_errors": self.http_errors,
+            "snapshots": self.snapshots,
+            "snapshot_failures": self.snapshot_failures,
+            "last_snapshot_ms": round(self.last_snapshot_ms, 1),
+        }
+
+
+class CameraPushServer:
+    """
+    WebSocket 推流接入 (兼容 example/compile.ino)：设备连接 ws://<服务器>:CAMERA_WS_PORT/ws/camera，
+    每条二进制消息是一帧 JPEG。服务运行在 CameraIngestEngine 的事件循环中，
+    帧写入该设备的帧槽 (与 MJPEG 拉流共用解码线程池与 AppState)，控制命令经会话的 CameraLink 下发。
+    """
+
+    def __init__(self, engine, devices, host: str = "0.0.0.0", port: int = config.CAMERA_WS_PORT):
+        """
+        Args:
+            engine: CameraIngestEngine
+            devices: DeviceRegistry (按 ?device= 或来源 IP 选择会话)
+        """
+        self.engine = engine
+        self.devices = devices
+        self.host = host
+        self.port = port
+        self._runner: Optional["web.AppRunner"] = None
+
+    def build_app(self) -> "web.Application":
+        app = web.Application()
+        app.router.add_get(config.CAMERA_WS_PATH, self.camera_ws)
+        return app
+
+    def start(self) -> None:
+        """在接入引擎的事件循环中开始监听"""
+        asyncio.run_coroutine_threadsafe(self._start(), self.engine.loop).result(timeout=5.0)
+        print(f"[CameraLink] WebSocket camera ingest on {self.host}:{self.port}{config.CAMERA_WS_PATH}")
+
+    async def _start(self) -> None:
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]  # port=0 时为实际分配的端口
+
+    def close(self) -> None:
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.engine.loop).result(timeout=2.0)
+            self._runner = None
+
+    async def camera_ws(self, request: "web.Request") -> "web.StreamResponse":
+        device_id = request.query.get("device")
+        if device_id is not None and not re.fullmatch(r"[A-Za-z0-9_-]+", device_id):
+            raise web.HTTPBadRequest(text="invalid device id")
+        remote = request.remote or ""
+        session = self.devices.resolve(device_id, remote, fallback_default=config.CAMERA_WS_DEFAULT_FALLBACK)
+        if session is None:
+            print(f"[CameraLink] Rejected camera from {remote} (device={device_id!r}): no matching session")
+            raise web.HTTPNotFound(text="no device session")
+        if session.camera_link is None:
+            session.camera_link = CameraLink(session.id)
+        link = session.camera_link
+
+        ws = web.WebSocketResponse(max_msg_size=config.CAMERA_MAX_FRAME_BYTES)
+        await ws.prepare(request)
+        slot = self.engine.attach(session.id, session.state, "ws", session.video_hub.publish_raw)
+        link.bind(ws, asyncio.get_running_loop(), remote)
+        print(f"[CameraLink] '{session.id}' connected from {remote}")
+        try:
+            await self.engine.ingest_ws(slot, ws, on_text=link.on_text, divert=link.divert)
+        finally:
+            link.unbind(ws)
+            print(f"[CameraLink] '{session.id}' disconnected ({slot.received} frames)")
+        return ws
@@ -3,7 +3,7 @@ import threading
 import requests
 import numpy as np
 import cv2
-from typing import Optional
+from typing import Optional, Callable
 from . import config
 from .state import AppState
 
@@ -12,13 +12,22 @@ class CameraService:
     相机服务类：通过 MJPEG 流持续获取视频帧。
     相比 HTTP 轮询，MJPEG 流显著降低延迟并提高帧率。
     """
-    def __init__(self, state: AppState):
+    def __init__(self, state: AppState, on_jpeg: Optional[Callable[[bytes, int], None]] = None,
+                 host: str = config.ESP32_IP, url: Optional[str] = None):
+        """
+        Args:
+            state: 所属设备的状态
+            on_jpeg: 可选回调 (原始 JPEG, 帧序号)，用于将相机画面原样直通给观看者
+            host: 设备 (ESP32) 地址
+            url: MJPEG 流地址，默认为 http://<host>:81/stream
+        """
         self.state = state
+        self._on_jpeg = on_jpeg
         self._fail_count = 0
         self._last_error = None
         self._running = True
         # 构建 MJPEG 流 URL (ESP32 固件的流端口是 81)
-        self._stream_url = f"http://{config.ESP32_IP}:81/stream"
+        self._stream_url = url or f"http://{host}:81/stream"
         self.thread = threading.Thread(target=self._stream_loop, daemon=True)
         self.thread.start()
 
@@ -105,7 +114,9 @@ class CameraService:
                 # 解码并更新状态
                 frame = self._decode_frame(jpg_data)
                 if frame is not None:
-                    self.state.update_frame(frame, time.time())
+                    seq = self.state.update_frame(frame, time.time(), jpg_data)
+                    if self._on_jpeg:
+                        self._on_jpeg(jpg_data, seq)
                     frame_count += 1
 
                     # 每 100 帧打印一次性能日志
@@ -23,6 +23,33 @@ ESP32_CAPTURE_URL = f"http://{ESP32_IP}/capture"
 TTS_TCP_PORT = int(os.getenv("TTS_TCP_PORT", 23456))
 # 本地 Flask 服务器端口
 SERVER_PORT = int(os.getenv("SERVER_PORT", 5000))
+# 麦克风音频接收 TCP 端口 (所有设备共用，连接按握手路由到设备会话)
+MIC_TCP_PORT = int(os.getenv("MIC_TCP_PORT", 23457))
+
+# =========================
+# 多设备会话 (Device Sessions)
+# =========================
+# 一个服务进程可服务多副眼镜：每台设备有独立的状态、相机、扬声器、麦克风与语音链路，
+# 共用视觉模型、缓存与线程池。格式 "id=ip,id=ip"，例如 "alice=192.168.1.21,bob=192.168.1.22"；
+# 为空时只有一台 ID 为 DEFAULT_DEVICE_ID、地址为 ESP32_IP 的设备。第一台设备为默认设备，
+# 不带设备前缀的 HUD 端点 (/detect、/video 等) 对应默认设备
+DEFAULT_DEVICE_ID = os.getenv("DEFAULT_DEVICE_ID", "default")
+DEVICES = {
+    k.strip(): v.strip()
+    for k, _, v in (item.partition("=") for item in os.getenv("DEVICES", "").split(","))
+    if k.strip() and v.strip()
+} or {DEFAULT_DEVICE_ID: ESP32_IP}
+# 麦克风连接握手：设备连接后先发送一行 "DEV:<设备ID>\n" 再开始推送 PCM。
+# 旧固件不发送握手，按连接来源 IP 匹配设备，匹配不到时归入默认设备
+MIC_HANDSHAKE_MAGIC = b"DEV:"
+MIC_HANDSHAKE_TIMEOUT = 0.5   # 等待握手前缀的时间 (秒)，旧固件连接后立即推送音频，不会等满
+MIC_HANDSHAKE_MAX_LEN = 64    # 握手行最大长度 (字节)
+# 自动登记：握手 (或 /ws/camera?device=) 中出现未登记的设备 ID 时，以连接来源 IP 创建会话。
+# 设备 ID 不经认证，每个会话都会启动相机拉流、扬声器、语音助手与处理循环，因此默认关闭；
+# 开启时只接受白名单中的 ID (为空时接受任意 ID)，且会话总数不超过上限
+DEVICE_AUTO_REGISTER = os.getenv("DEVICE_AUTO_REGISTER", "0") == "1"
+DEVICE_AUTO_REGISTER_IDS = {x.strip() for x in os.getenv("DEVICE_AUTO_REGISTER_IDS", "").split(",") if x.strip()}
+DEVICE_MAX_SESSIONS = int(os.getenv("DEVICE_MAX_SESSIONS", 8))
 
 # =========================
 # YOLO 模型配置
@@ -40,6 +67,25 @@ INFER_INTERVAL = 0.05   # 推理的最小间隔 (秒) -> 目标 20 FPS
 CAPTURE_BACKOFF_BASE = 0.03 # 抓取失败后的基础退避时间
 CAPTURE_BACKOFF_MAX = 0.5   # 最大退避时间
 CAPTURE_FAIL_LOG_EVERY = 30 # 每失败多少次打印一次日志
+
+# =========================
+# 相机接入 (Camera Ingest)
+# =========================
+# async: 所有设备的相机连接 (MJPEG 拉流、WebSocket 推流) 由一个事件循环线程持有，
+#        JPEG 解码在小线程池中进行，设备再多线程数也不变
+# thread: 每台相机一个线程 (CameraService)；未安装 aiohttp 时自动退回
+CAMERA_INGEST = os.getenv("CAMERA_INGEST", "async")
+CAMERA_DECODE_WORKERS = 2                 # JPEG 解码线程数 (所有设备共用)
+CAMERA_MAX_FRAME_BYTES = 2 * 1024 * 1024  # 单帧最大字节数，缓冲超出两倍仍无帧边界时视为流损坏并重新同步
+# WebSocket 推流 (example/compile.ino)：设备连接 ws://<服务器>:CAMERA_WS_PORT/ws/camera 推送 JPEG 二进制帧，
+# 服务器经同一连接下发 SET:FRAMESIZE / SET:QUALITY / SET:FPS / SNAP:HQ 控制命令。
+# 设备以 ?device=<设备ID> 指明身份，未指明时按来源 IP 匹配；推流期间暂停该设备的 MJPEG 拉流
+CAMERA_WS_PORT = int(os.getenv("CAMERA_WS_PORT", 8081))
+CAMERA_WS_PATH = "/ws/camera"
+# 推流画面进入避障与警报流程，连接还会成为下发控制命令的 CameraLink，因此只接受已登记的设备 ID、
+# 允许自动登记的 ID 或来源 IP 完全匹配的连接，其余返回 404；设为 1 时恢复旧行为 (匹配不到归入默认设备)
+CAMERA_WS_DEFAULT_FALLBACK = os.getenv("CAMERA_WS_DEFAULT_FALLBACK", "0") == "1"
+CAMERA_SNAPSHOT_TIMEOUT = 3.0  # 等待高清快照 (SNAP:HQ) 的超时 (秒)，固件切换分辨率约需 0.5 秒
 JPEG_QUALITY = 65       # HUD 推流的 JPEG 质量 (降低以加速编码)
 
 # =========================
@@ -135,3 +181,191 @@ GEIGER_AREA_NEAR = 0.10      # 近距离阈值
 BEEP_FREQ = 1000             # 哔哔声频率 (Hz)
 BEEP_DURATION_MS = 50        # 哔哔声时长 (ms)
 BEEP_SAMPLE_RATE = 16000     # 采样率
+
+# 寻物精搜 (ROI 二次推理)：全图 IMG_SIZE 推理之后，从原始分辨率帧中裁出目标附近的区域，
+# 只检测目标类别再推理一次，提高远处小物体 (手机、遥控器) 的召回
+SEARCH_REFINE_ENABLED = True
+SEARCH_REFINE_CROP = 0.5          # 裁剪区域 (正方形) 的边长占帧短边的比例
+SEARCH_REFINE_IMG_SIZE = IMG_SIZE # 裁剪区域的推理尺寸 (640x480 帧的 240 像素区域放大约 2.7 倍于全图推理)
+SEARCH_REFINE_CONF = 0.25         # 只检测目标类别，置信度阈值可低于 CONF_THRESHOLD
+SEARCH_REFINE_TRACK_S = 2.0       # 目标最近一次出现的位置在这段时间内作为裁剪中心
+
+# =========================
+# 本地场景摘要 (Local Scene Summary)
+# =========================
+# "前面有什么" 类问题优先用 YOLO 检测结果本地回答，满足条件时不再等待云端 VLM
+LOCAL_SCENE_ENABLED = True
+LOCAL_SCENE_MAX_AGE = 1.0        # 检测结果最大允许时延 (秒)，超过则视为过期
+LOCAL_SCENE_MIN_CONF = 0.5       # 参与回答的目标平均置信度下限
+LOCAL_SCENE_MAX_LABELS = 4       # 类别过多说明场景复杂，交给 VLM
+# 问题中出现这些词说明需要细节理解 (文字/颜色等)，YOLO 无法回答，直接走 VLM
+LOCAL_SCENE_ESCALATE_KEYWORDS = ["读", "识别", "文字", "字", "颜色", "描述", "什么样", "牌子", "写"]
+
+# =========================
+# 语音指令关键词 (Voice Keywords)
+# =========================
+# 包含这些词的语句需要视觉结果
+VISION_KEYWORDS = ["看", "描述", "前面", "什么", "读", "识别", "在哪"]
+# 寻物类指令 (不需要 VLM)
+SEARCH_COMMAND_KEYWORDS = ["找", "在哪"]
+# 退出寻物模式的指令
+SEARCH_STOP_KEYWORDS = ["停止", "找到了", "取消", "不找了", "结束", "关闭"]
+
+# =========================
+# 高清快照 (HQ Snapshot)
+# =========================
+# (部分) 识别文本判定为视觉问题时向设备请求一张 SXGA 快照 (SNAP:HQ，仅 WebSocket 推流固件支持)，
+# 与 ASR、投机 VLM 任务并行拍摄，以 detail=high 交给 VLM；被丢弃的投机请求不拍。
+# 超时或设备不支持时退回实时帧。视频流的分辨率与码率不变
+VISION_HQ_ENABLED = True
+VISION_HQ_TIMEOUT = 2.0      # 视觉任务等待快照的最长时间 (秒)，超时即用实时帧
+VISION_HQ_MAX_ALERT = 1      # 警报等级高于此值时不拍快照 (拍摄期间固件暂停推流约 0.5 秒)
+# 问题中出现这些词时用读字 Prompt (问题在视觉请求发出前才确定，投机请求同样适用)
+VISION_READ_KEYWORDS = ["读", "念", "写的", "写着", "文字", "字"]
+VISION_READ_PROMPT = "读出画面中的文字，按从上到下、从左到右的顺序只输出文字本身，看不清的部分说看不清。不要描述画面。100字以内。"
+
+# =========================
+# 投机视觉请求 (Speculative Vision)
+# =========================
+# 根据近期语句中视觉问题的比例 (EMA) 决定是否在识别完成前就启动 VLM
+SPECULATION_PRIOR_INIT = 0.5     # 视觉意图先验初值
+SPECULATION_PRIOR_ALPHA = 0.2    # 先验 EMA 平滑系数
+SPECULATION_START_PRIOR = 0.6    # 先验高于此值时，录音一结束就启动 VLM
+
+# =========================
+# VLM 描述缓存 (Vision Description Cache)
+# =========================
+# 以画面感知哈希 (dHash) + Prompt 为键缓存 VLM 描述，原地重复提问时直接命中
+VISION_CACHE_ENABLED = True
+VISION_CACHE_MAX_ENTRIES = 32    # 最大缓存条数 (LRU 淘汰)
+VISION_CACHE_TTL = 30.0          # 缓存有效期 (秒)
+VISION_CACHE_HAMMING = 6         # 64 位 dHash 的汉明距离阈值，越小越严格
+VISION_CACHE_USE_DETECTIONS = True  # 同时要求检测到的类别集合一致
+
+# =========================
+# TTS 配置与短语缓存 (TTS & Phrase Cache)
+# =========================
+TTS_QWEN_VOICE = "Cherry"              # Qwen-TTS-Realtime 音色
+TTS_EDGE_VOICE = "zh-CN-YunxiNeural"   # Edge-TTS 音色
+TTS_SAMPLE_RATE = 16000                # 合成输出采样率 (16bit mono PCM)
+TTS_FORMAT = f"pcm_{TTS_SAMPLE_RATE}_mono_s16"
+TTS_CACHE_DIR = BASE_DIR.parent / "tts_cache"  # 磁盘缓存目录 (可直接发送的 PCM)
+TTS_CACHE_MEMORY_ITEMS = 64            # 内存 LRU 条数
+TTS_CACHE_DISK_BYTES = 64 * 1024 * 1024  # 磁盘缓存上限 (字节)，超出时按最近使用时间 (mtime) 淘汰
+TTS_PREWARM = True                     # 启动时预合成固定提示语
+
+# 固定提示语 (可缓存)；search_start / search_unknown 为模板
+VOICE_PROMPTS = {
+    "search_start": "开始寻找{item}，请慢慢移动摄像头",
+    "search_unknown": "抱歉，我不认识{item}，请尝试换个说法",
+    "search_stop": "寻物模式已关闭",
+    "vision_unclear": "抱歉，我无法看清画面",
+    "vision_timeout": "视觉服务响应超时",
+    "no_frame": "抱歉，没有获取到画面",
+}
+
+# =========================
+# 流式回复与逐句播报 (Streaming Reply)
+# =========================
+STREAM_REPLY_ENABLED = True      # VLM 回复流式返回，按句合成播报
+STREAM_FIRST_TIMEOUT = 10.0      # 等待首句的超时 (秒)
+STREAM_IDLE_TIMEOUT = 10.0       # 两次增量之间的最大间隔 (秒)
+SENTENCE_MIN_CHARS = 4           # 过短的句子与下一句合并，避免 TTS 断断续续
+
+# =========================
+# HUD 长轮询 (/detect)
+# =========================
+# 服务端允许的最长等待时间 (毫秒)，超过则截断
+DETECT_LONG_POLL_MAX_MS = 25000
+
+# =========================
+# HUD 推送 (/events, Server-Sent Events)
+# =========================
+PUSH_MIN_INTERVAL = 0.05        # 单个客户端两次推送的最小间隔 (秒)，合并高频发布
+PUSH_KEEPALIVE_INTERVAL = 15.0  # 无变化时的保活间隔 (秒)
+
+# =========================
+# 视频流多档位 (/video?profile=low|mid|high)
+# =========================
+# max_width: 输出最大宽度 (None 表示原始分辨率)；quality: JPEG 质量；
+# kbps: 约 10 FPS 时的估算码率，用于根据客户端上报带宽 (?kbps=) 选择档位
+VIDEO_PROFILES = {
+    "low": {"max_width": 320, "quality": 40, "kbps": 150},
+    "mid": {"max_width": 480, "quality": 55, "kbps": 400},
+    "high": {"max_width": None, "quality": JPEG_QUALITY, "kbps": 1000},
+}
+VIDEO_DEFAULT_PROFILE = "high"  # 未指定档位时使用 (与原单一编码一致)
+
+# =========================
+# Web 服务器 (Server Backend)
+# =========================
+# async: aiohttp 事件循环服务 HUD 端点 (/detect、/events、/overlay、/video)，
+#        观看者再多线程数也不变；其余路由交给 Flask 在固定大小的线程池中执行
+# flask: Werkzeug 开发服务器 (每个连接一个线程)；未安装 aiohttp 时自动退回
+SERVER_BACKEND = os.getenv("SERVER_BACKEND", "async")
+ASYNC_WSGI_WORKERS = 4  # 执行 Flask 路由的线程池大小
+
+# =========================
+# 推理进程池 (Inference Worker Pool)
+# =========================
+# 0: 在处理循环线程内推理 (默认)；>=1: 独立推理进程数，每个进程持有一份模型，
+#    从共享内存帧环读取帧，多个进程交替处理相邻帧 (适合多核 CPU)
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", 0))
+INFER_MAX_FRAME_SHAPE = (1200, 1600)  # 共享内存槽位可容纳的最大帧 (高, 宽)，更大的帧在本进程推理
+INFER_RESULT_TIMEOUT = 2.0            # 单帧结果超时 (秒)，超时的帧被丢弃并重启对应进程
+INFER_WORKER_START_TIMEOUT = 60.0     # 等待推理进程启动并连回的超时 (秒)
+INFER_WORKER_RESPAWN_DELAY = 5.0      # 替换进程启动失败后，再次启动前的等待时间 (秒)
+
+# =========================
+# 多路批量推理调度 (Batch Scheduler)
+# =========================
+# 调度器在时间窗口内收集各路设备的最新待推理帧，合并为一次批量前向
+BATCH_WINDOW_MS = 8.0            # 收集窗口 (毫秒)：首帧就绪后最多再等这么久凑批
+BATCH_MAX_SIZE = 8               # 单次批量前向的最大帧数
+STREAM_FPS_TARGET = 1.0 / INFER_INTERVAL  # 每路默认推理帧率目标
+STREAM_MAX_QUEUE_MS = 25.0       # 每路帧在收集窗口中的最长排队时间 (毫秒)
+
+# =========================
+# 相机闭环码控 (Camera Rate Controller)
+# =========================
+# 按推理耗时、解码耗时、到达帧率/码率与帧龄，经设备控制通道 (WebSocket 命令或 MJPEG 固件的 /control)
+# 调整相机的发送帧率、JPEG 质量与分辨率，让相机只发送处理链路消费得了的帧
+CAMERA_CTRL_ENABLED = os.getenv("CAMERA_CTRL", "1") == "1"
+CAMERA_CTRL_INTERVAL = 1.0       # 控制周期 (秒)
+# 各警报等级的 (分辨率, 帧率上限)：安全时以帧率换分辨率 (看清细节)，有风险时以分辨率换帧率 (反应更快)
+CAMERA_CTRL_PROFILES = {0: ("SVGA", 10), 1: ("VGA", 15), 2: ("VGA", 20), 3: ("VGA", 25)}
+CAMERA_CTRL_HEADROOM = 1.25      # 发送帧率 = 处理链路可消费的帧率 × 余量 (留出网络抖动的余地)
+CAMERA_CTRL_MAX_AGE_MS = 300.0   # 帧龄 (到达→检测结果发布) 超过此值视为拥塞
+CAMERA_CTRL_MAX_DROP = 0.3       # 到达的帧中未及解码即被覆盖的比例超过此值视为拥塞
+CAMERA_CTRL_LINK_RATIO = 0.6     # 到达帧率低于下发帧率的此比例时视为链路受限 (减少每帧字节数)
+CAMERA_CTRL_QUALITY = (10, 30)   # 控制器使用的 JPEG 质量范围 (最清晰, 最模糊)；数值越小越清晰
+CAMERA_CTRL_QUALITY_START = 12   # 初始 JPEG 质量
+CAMERA_CTRL_QUALITY_STEP = 4     # 拥塞时每个周期调高质量数值的步长 (恢复时每周期减 1)
+CAMERA_CTRL_RECOVER_S = 3.0      # 持续无拥塞多久之后才提高画质或分辨率
+
+# =========================
+# IMU 与运动感知调度 (IMU / Motion-Aware Scheduling)
+# =========================
+# 固件 (example/compile.ino) 以 50 Hz 经 UDP 发送 JSON：{"ts", "temp_c", "accel": {x,y,z} (m/s²), "gyro": {x,y,z} (°/s)}
+IMU_UDP_PORT = int(os.getenv("IMU_UDP_PORT", 12345))
+IMU_RATE_HZ = 50                 # 固件发送频率，用于确定环形缓冲的容量
+IMU_BUFFER_SECONDS = 10.0        # 每台设备保留的 IMU 历史 (秒)
+IMU_WINDOW_S = 1.0               # 判断步行的加速度窗口 (秒)
+IMU_ROTATION_WINDOW_S = 0.2      # 判断转头的角速度窗口 (秒)
+IMU_ESTIMATE_EVERY = 5           # 每收到多少个样本重新估计一次运动状态
+IMU_STALE_S = 1.0                # 超过此时间没有 IMU 数据时不再按运动状态调度
+IMU_WALK_ACCEL_STD = 0.35        # 加速度模长的标准差 (m/s²) 超过此值视为步行
+IMU_TURN_DPS = 45.0              # 平均角速度 (°/s) 超过此值视为转头
+IMU_BLUR_DPS = 120.0             # 平均角速度超过此值时画面运动模糊，跳过推理
+# 各运动状态下的推理帧率系数 (相对 STREAM_FPS_TARGET)：静止时场景变化慢，降低推理频率省电降温
+MOTION_FPS_SCALE = {"stationary": 0.25, "turning": 0.5, "walking": 1.0}
+
+# =========================
+# 最佳帧选择 (Best Frame Selector)
+# =========================
+# 每台设备保留最近几帧及其清晰度 (缩小后灰度图的拉普拉斯方差，帧到达时计算一次)，
+# 视觉问答与全能模式取新鲜度窗口内最清晰的一帧，避免把走路中运动模糊的帧交给 VLM
+FRAME_RING_SIZE = 8              # 保留的最近帧数
+FRAME_SHARPNESS_WIDTH = 160      # 计算清晰度前把帧缩小到的宽度 (像素)
+FRAME_BEST_MAX_AGE_S = 0.6       # 新鲜度窗口 (秒)：只在这段时间内的帧中挑选
+FRAME_BEST_MIN_GAIN = 1.2        # 旧帧的清晰度至少是最新帧的这么多倍才替换最新帧
@@ -0,0 +1,157 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from . import config
+from .state import AppState
+from .telemetry import PayloadCache
+from .video_broadcaster import MJPEGBroadcaster
+
+
+class DeviceSession:
+    """
+    一副眼镜 (一台 ESP32) 的会话：独立的状态、HUD 数据缓存与视频广播器，
+    以及由创建钩子挂载的相机、扬声器、语音助手与推理流。
+    视觉模型、批量调度器、VLM/TTS 缓存与线程池在所有会话之间共用。
+    """
+
+    def __init__(self, device_id: str, ip: str):
+        """
+        Args:
+            device_id: 设备 ID (用于 URL 前缀 /d/<device_id>/ 与麦克风握手)
+            ip: 设备地址 (相机流、TTS 推送目标)
+        """
+        self.id = device_id
+        self.ip = ip
+        self.state = AppState()
+        self.payloads = PayloadCache(self.state)
+        self.video_hub = MJPEGBroadcaster()
+
+        # 由 DeviceRegistry 的创建钩子挂载 (见 main.py)
+        self.audio: Any = None
+        self.camera: Any = None
+        self.voice: Any = None
+        self.stream: Any = None      # 批量调度器中的推理流
+        self.renderer: Any = None    # 本会话处理循环的 HUD 渲染器
+        self.refiner: Any = None     # 本会话处理循环的寻物精搜 (SearchRefiner)
+        self.camera_link: Any = None  # WebSocket 推流设备的相机控制通道 (CameraLink)
+        self.imu: Any = None          # IMU 数据与运动状态 (ImuTrack)
+
+    def on_recording_complete(self, wav_path: Path) -> None:
+        """麦克风录音完成：交给本设备的语音助手"""
+        if self.voice is not None:
+            self.voice.on_recording_complete(wav_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "id": self.id,
+            "ip": self.ip,
+            "frame_seq": state.frame.seq,
+            "last_update_s": round(time.time() - state.latest_ts, 1) if state.latest_ts > 0 else None,
+            "alert_level": state.alert.level,
+            "voice_status": state.voice.status,
+            "viewers": self.video_hub.get_stats()["clients"],
+            "camera_push": self.camera_link is not None and self.camera_link.connected,
+            "motion": self.imu.current().state if self.imu is not None else None,
+        }
+
+
+class DeviceRegistry:
+    """
+    设备会话注册表：按设备 ID 或来源 IP 查找会话，为新设备创建会话。
+
+    - 第一台登记的设备为默认设备：不带设备前缀的 HUD 端点与无法识别的麦克风连接都归它
+    - 麦克风连接带握手 ("DEV:<设备ID>") 时按 ID 路由；旧固件没有握手，按来源 IP 匹配
+    - 握手中出现未登记的 ID 且允许自动登记时，以连接来源 IP 新建会话
+      (只接受白名单中的 ID，会话总数不超过上限；DEVICES 中配置的设备不受上限约束)
+    """
+
+    def __init__(self, on_create: Optional[Callable[[DeviceSession], None]] = None,
+                 auto_register: bool = config.DEVICE_AUTO_REGISTER,
+                 allowed_ids: Optional[Set[str]] = None,
+                 max_sessions: int = config.DEVICE_MAX_SESSIONS):
+        """
+        Args:
+            on_create: 新会话创建后调用，用于挂载相机、扬声器、语音助手等设备服务
+            auto_register: 是否为握手中未登记的设备 ID 自动创建会话
+            allowed_ids: 允许自动登记的设备 ID (为空时使用 DEVICE_AUTO_REGISTER_IDS；集合为空表示不限)
+            max_sessions: 自动登记后会话总数的上限
+        """
+        self.on_create = on_create
+        self.auto_register = auto_register
+        self.allowed_ids = config.DEVICE_AUTO_REGISTER_IDS if allowed_ids is None else allowed_ids
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, DeviceSession] = {}
+        self._default: Optional[DeviceSession] = None
+
+    def add(self, device_id: str, ip: str) -> DeviceSession:
+        """登记一台设备并返回其会话；已登记时直接返回已有会话"""
+        with self._lock:
+            session = self._sessions.get(device_id)
+            if session is not None:
+                return session
+            session = DeviceSession(device_id, ip)
+            self._sessions[device_id] = session
+            if self._default is None:
+                self._default = session
+        print(f"[Devices] Session '{device_id}' ({ip}) created ({len(self._sessions)} total)")
+        if self.on_create is not None:
+            self.on_create(session)
+        return session
+
+    @property
+    def default(self) -> Optional[DeviceSession]:
+        return self._default
+
+    def get(self, device_id: Optional[str] = None) -> Optional[DeviceSession]:
+        """按 ID 查找会话；device_id 为空时返回默认设备"""
+        if device_id is None:
+            return self._default
+        with self._lock:
+            return self._sessions.get(device_id)
+
+    def by_ip(self, ip: str) -> Optional[DeviceSession]:
+        with self._lock:
+            for session in self._sessions.values():
+                if session.ip == ip:
+                    return session
+        return None
+
+    def sessions(self) -> List[DeviceSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def can_register(self, device_id: str) -> bool:
+        """未登记的设备 ID 能否自动登记：已开启、在白名单内 (白名单为空时不限) 且未达会话上限"""
+        if not self.auto_register or (self.allowed_ids and device_id not in self.allowed_ids):
+            return False
+        with self._lock:
+            return len(self._sessions) < self.max_sessions
+
+    def resolve(self, device_id: Optional[str], ip: str, fallback_default: bool = True) -> Optional[DeviceSession]:
+        """
+        为一个设备连接选择会话：握手 ID -> (自动登记) -> 来源 IP -> 默认设备。
+        fallback_default 为 False 时不兜底默认设备，都匹配不到返回 None。
+        """
+        if device_id:
+            session = self.get(device_id)
+            if session is not None:
+                return session
+            if self.can_register(device_id):
+                return self.add(device_id, ip)
+            print(f"[Devices] Unknown device '{device_id}' from {ip}, falling back to IP match")
+        session = self.by_ip(ip)
+        return session if session is not None or not fallback_default else self._default
+
+    def route_mic(self, device_id: Optional[str], ip: str) -> Tuple[Optional[str], Optional[Callable[[Path], None]]]:
+        """MicrophoneService 的连接路由：返回 (设备名, 录音完成回调)"""
+        session = self.resolve(device_id, ip)
+        if session is None:
+            return None, None
+        return session.id, session.on_recording_complete
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [s.get_stats() for s in self.sessions()]
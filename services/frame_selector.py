@@ -0,0 +1,77 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from . import config
+
+
+def sharpness(frame: np.ndarray, width: int = config.FRAME_SHARPNESS_WIDTH) -> float:
+    """清晰度：缩小到固定宽度后灰度图的拉普拉斯方差 (越大越清晰；宽度固定，不同分辨率的帧可直接比较)"""
+    h, w = frame.shape[:2]
+    if w > width:
+        # INTER_LINEAR 比 INTER_AREA 快约 8 倍 (640x480: 0.1 ms vs 0.8 ms)，同一场景前后帧的相对比较足够
+        frame = cv2.resize(frame, (width, max(1, h * width // w)), interpolation=cv2.INTER_LINEAR)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    return float(std[0, 0]) ** 2
+
+
+class SharpFrameRing:
+    """
+    最近几帧及其清晰度。
+
+    - push 由相机线程在每帧发布时调用，清晰度只在到达时计算一次
+    - 与 AppState 的快照相同，条目以不可变元组整体替换发布，读者无锁
+    - best 在新鲜度窗口内挑选最清晰的帧；旧帧要明显更清晰 (FRAME_BEST_MIN_GAIN) 才替换最新帧
+    """
+
+    def __init__(self, size: int = config.FRAME_RING_SIZE):
+        self.size = size
+        self._entries: Tuple[Tuple[Any, float], ...] = ()  # ((FrameSnapshot, 清晰度), ...) 按时间顺序
+
+        # 统计
+        self.requests = 0
+        self.replaced = 0        # 选中了比最新帧更清晰的旧帧的次数
+        self.gain_avg = 0.0      # 被替换时清晰度提升倍数的平均值
+
+    def push(self, snap) -> float:
+        """登记一帧 (FrameSnapshot)，返回其清晰度"""
+        score = sharpness(snap.raw)
+        self._entries = (self._entries + ((snap, score),))[-self.size:]
+        return score
+
+    def best(self, max_age: float = config.FRAME_BEST_MAX_AGE_S, now: Optional[float] = None):
+        """
+        新鲜度窗口内最清晰的帧。
+
+        Returns:
+            FrameSnapshot；没有帧时返回 None。窗口内没有明显更清晰的帧 (或最新帧也已过期) 时返回最新帧
+        """
+        entries = self._entries
+        if not entries:
+            return None
+        now = time.time() if now is None else now
+        self.requests += 1
+        latest, latest_score = entries[-1]
+        best, best_score = latest, latest_score
+        for snap, score in entries[:-1]:
+            if now - snap.ts <= max_age and score > best_score:
+                best, best_score = snap, score
+        if best is latest or best_score < latest_score * config.FRAME_BEST_MIN_GAIN:
+            return latest
+        self.replaced += 1
+        gain = best_score / latest_score if latest_score > 0 else config.FRAME_BEST_MIN_GAIN
+        self.gain_avg += (gain - self.gain_avg) / self.replaced
+        return best
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self._entries
+        return {
+            "frames": len(entries),
+            "sharpness": [round(score, 1) for _, score in entries],
+            "requests": self.requests,
+            "replaced": self.replaced,
+            "gain_avg": round(self.gain_avg, 2),
+        }
@@ -0,0 +1,205 @@
+import json
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from . import config
+
+# 环形缓冲的列：服务器接收时间、设备时间 (秒)、温度、加速度 xyz (m/s²)、角速度 xyz (°/s)
+_COLUMNS = 9
+
+
+@dataclass(frozen=True)
+class MotionState:
+    """佩戴者的运动状态 (由最近的 IMU 窗口估计)"""
+    state: str = "unknown"       # unknown / stationary / walking / turning
+    rotation_dps: float = 0.0    # 近 IMU_ROTATION_WINDOW_S 秒的平均角速度模长
+    accel_std: float = 0.0       # 近 IMU_WINDOW_S 秒加速度模长的标准差
+    ts: float = 0.0              # 估计时间 (服务器时间)
+
+
+def estimate_motion(window: np.ndarray, now: float) -> MotionState:
+    """
+    由 IMU 窗口 (ImuTrack.window 返回的 N×9 数组) 估计运动状态：
+    转头看短窗口的平均角速度，步行看长窗口内加速度模长的起伏 (步伐冲击)。
+    """
+    if len(window) < 2:
+        return MotionState(ts=now)
+    recent = window[window[:, 0] >= now - config.IMU_ROTATION_WINDOW_S]
+    if len(recent) == 0:
+        recent = window[-1:]
+    rotation = float(np.linalg.norm(recent[:, 6:9], axis=1).mean())
+    accel_std = float(np.linalg.norm(window[:, 3:6], axis=1).std())
+    if rotation >= config.IMU_TURN_DPS:
+        state = "turning"
+    elif accel_std >= config.IMU_WALK_ACCEL_STD:
+        state = "walking"
+    else:
+        state = "stationary"
+    return MotionState(state, rotation, accel_std, now)
+
+
+class ImuTrack:
+    """
+    一台设备的 IMU 数据：固定容量的环形缓冲 (最近 IMU_BUFFER_SECONDS 秒)，
+    每收到 IMU_ESTIMATE_EVERY 个样本重新估计一次运动状态。
+    add 在 UDP 接收线程调用，motion / infer_interval 可在任意线程读取。
+    """
+
+    def __init__(self, device_id: str, capacity: int = int(config.IMU_RATE_HZ * config.IMU_BUFFER_SECONDS)):
+        self.id = device_id
+        self._buf = np.zeros((capacity, _COLUMNS), dtype=np.float64)
+        self._count = 0   # 累计写入的样本数 (写入位置 = count % capacity)
+        self._lock = threading.Lock()
+        self.motion = MotionState()
+        self.temp_c = 0.0
+
+    @property
+    def samples(self) -> int:
+        return self._count
+
+    def add(self, host_ts: float, dev_ts: float, temp_c: float, accel, gyro) -> None:
+        """写入一个样本 (accel / gyro 为 xyz 三元组)"""
+        with self._lock:
+            self._buf[self._count % len(self._buf)] = (host_ts, dev_ts, temp_c, *accel, *gyro)
+            self._count += 1
+            estimate = self._count % config.IMU_ESTIMATE_EVERY == 0
+        self.temp_c = temp_c
+        if estimate:
+            self.motion = estimate_motion(self.window(config.IMU_WINDOW_S, host_ts), host_ts)
+
+    def window(self, seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """返回最近 seconds 秒的样本 (按时间顺序的副本)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            n = min(self._count, len(self._buf))
+            end = self._count % len(self._buf)
+            data = np.roll(self._buf, -end, axis=0)[len(self._buf) - n:] if n else self._buf[:0].copy()
+        return data[data[:, 0] >= now - seconds]
+
+    def current(self, now: Optional[float] = None) -> MotionState:
+        """当前运动状态；超过 IMU_STALE_S 没有新估计时为 unknown"""
+        now = time.time() if now is None else now
+        motion = self.motion
+        if motion.ts <= 0 or now - motion.ts > config.IMU_STALE_S:
+            return MotionState(ts=motion.ts)
+        return motion
+
+    def infer_interval(self, base: float) -> Optional[float]:
+        """
+        按运动状态调整推理间隔 (批量调度器的 pace 回调)：
+        静止时拉长间隔，步行保持基准频率；快速转头时画面运动模糊，返回 None 跳过本帧。
+        没有 IMU 数据 (或数据过期) 时保持基准间隔。
+        """
+        motion = self.current()
+        if motion.state == "unknown":
+            return base
+        if motion.rotation_dps >= config.IMU_BLUR_DPS:
+            return None
+        scale = config.MOTION_FPS_SCALE.get(motion.state, 1.0)
+        return base / scale if scale > 0 else base
+
+    def get_stats(self) -> Dict[str, Any]:
+        motion = self.current()
+        return {
+            "state": motion.state,
+            "rotation_dps": round(motion.rotation_dps, 1),
+            "accel_std": round(motion.accel_std, 3),
+            "temp_c": round(self.temp_c, 1),
+            "samples": self._count,
+        }
+
+
+class ImuService:
+    """
+    IMU 接收服务：监听 UDP 端口接收 ESP32 的 IMU 包 (一包一个 JSON 样本)，写入对应设备会话的 ImuTrack。
+    包中带 "dev" 字段时按设备 ID 路由，否则按来源 IP 匹配。
+    UDP 包无法认证，只查找已有的会话，从不创建会话；找不到会话的包直接丢弃。
+    """
+
+    def __init__(self, devices, host: str = "0.0.0.0", port: int = config.IMU_UDP_PORT):
+        """
+        Args:
+            devices: DeviceRegistry (会话的 imu 为 ImuTrack)
+        """
+        self.devices = devices
+        self.host = host
+        self.port = port
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+
+        # 统计
+        self.packets = 0
+        self.bad_packets = 0
+        self.unrouted = 0
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]  # port=0 时为实际分配的端口
+        self.running = True
+        self.thread = threading.Thread(target=self._recv_loop, daemon=True, name="imu-udp")
+        self.thread.start()
+        print(f"[IMU] Listening for IMU packets on UDP {self.host}:{self.port}")
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _recv_loop(self) -> None:
+        while self.running:
+            try:
+                data, addr = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle(data, addr[0], time.time())
+
+    def handle(self, data: bytes, ip: str, now: float) -> bool:
+        """解析一个 IMU 包并写入设备会话；格式错误或找不到会话时返回 False"""
+        try:
+            payload = json.loads(data)
+            accel, gyro = payload["accel"], payload["gyro"]
+            sample = (float(payload.get("ts", 0)) / 1000.0, float(payload.get("temp_c", 0.0)),
+                      (float(accel["x"]), float(accel["y"]), float(accel["z"])),
+                      (float(gyro["x"]), float(gyro["y"]), float(gyro["z"])))
+        except (ValueError, KeyError, TypeError):
+            self.bad_packets += 1
+            if self.bad_packets % config.CAPTURE_FAIL_LOG_EVERY == 1:
+                print(f"[IMU] Bad packet from {ip} ({len(data)} bytes)")
+            return False
+        device_id = payload.get("dev")
+        if device_id is not None and not (isinstance(device_id, str) and re.fullmatch(r"[A-Za-z0-9_-]+", device_id)):
+            self.bad_packets += 1
+            return False
+        session = self.devices.get(device_id) if device_id else self.devices.by_ip(ip)
+        if session is None or session.imu is None:
+            self.unrouted += 1
+            return False
+        session.imu.add(now, *sample)
+        self.packets += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "port": self.port,
+            "packets": self.packets,
+            "bad_packets": self.bad_packets,
+            "unrouted": self.unrouted,
+        }
@@ -0,0 +1,433 @@
+import argparse
+import importlib
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from collections import OrderedDict, deque
+from multiprocessing import connection, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from . import config
+
+# 默认预测器：每个推理进程持有一个 VisionService (即一份 YOLO 模型)
+DEFAULT_PREDICTOR = "services.vision_service:VisionService"
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    """附加到父进程创建的共享内存 (不登记到本进程的 resource_tracker，避免退出时被误删)"""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class FrameRing:
+    """
+    共享内存帧环：固定数量的槽位，每个槽位可容纳一帧最大尺寸的 BGR 图像。
+    父进程把帧拷入空闲槽位，推理进程按 (槽位, 高, 宽) 直接在共享内存上构建 ndarray 视图，
+    帧数据不经过 pickle 与管道。
+    """
+
+    def __init__(self, slots: int, max_shape: Tuple[int, int]):
+        """
+        Args:
+            slots: 槽位数
+            max_shape: 单帧最大 (高, 宽)
+        """
+        self.slot_bytes = int(max_shape[0]) * int(max_shape[1]) * 3
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        self._free = deque(range(slots))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def free_slots(self) -> int:
+        return len(self._free)
+
+    def fits(self, frame: np.ndarray) -> bool:
+        return frame.dtype == np.uint8 and frame.ndim == 3 and frame.shape[2] == 3 \
+            and frame.nbytes <= self.slot_bytes
+
+    def write(self, frame: np.ndarray) -> Optional[int]:
+        """把帧拷入一个空闲槽位，返回槽位号；没有空闲槽位或帧过大时返回 None"""
+        if not self._free or not self.fits(frame):
+            return None
+        slot = self._free.popleft()
+        self.view(self.shm, slot, self.slot_bytes, frame.shape[:2])[...] = frame
+        return slot
+
+    def release(self, slot: int) -> None:
+        self._free.append(slot)
+
+    @staticmethod
+    def view(shm: shared_memory.SharedMemory, slot: int, slot_bytes: int, shape: Tuple[int, int]) -> np.ndarray:
+        """槽位上的 (高, 宽, 3) uint8 视图 (零拷贝)"""
+        h, w = shape
+        return np.ndarray((h, w, 3), dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+class _Worker:
+    """父进程中对一个推理进程的记录 (conn 为 None 表示进程已启动、尚未连回)"""
+
+    def __init__(self, worker_id: int, proc: Optional[subprocess.Popen],
+                 conn: Optional[connection.Connection] = None):
+        self.id = worker_id
+        self.proc = proc
+        self.conn = conn
+        self.launched = time.time()
+        self.ready = False
+        self.ticket: Optional[int] = None  # 正在处理的帧票号 (每个进程同时只处理一帧)
+        self.done = 0
+
+
+class InferencePool:
+    """
+    进程外推理池：一个或多个推理进程各持有一份模型，从共享内存帧环读取帧。
+    每个进程同时只处理一帧，多个进程交替处理相邻帧；结果按提交顺序 (即帧序) 返回。
+    进程退出或卡死时异步重启：替换进程在后台加载模型，连回后由 get() 顺带接受，期间其余进程照常工作。
+
+    推理进程通过 `python -m services.inference_pool` 独立启动 (而不是 multiprocessing spawn)，
+    避免子进程重新导入 main.py 并再次创建相机、麦克风等服务。
+
+    submit() / get() 只应由同一个线程 (处理循环) 调用。
+    """
+
+    def __init__(self, workers: int = config.INFER_WORKERS,
+                 max_shape: Tuple[int, int] = config.INFER_MAX_FRAME_SHAPE,
+                 predictor: str = DEFAULT_PREDICTOR,
+                 result_timeout: float = config.INFER_RESULT_TIMEOUT):
+        """
+        Args:
+            workers: 推理进程数
+            max_shape: 共享内存槽位可容纳的最大帧 (高, 宽)
+            predictor: "模块:可调用对象"，在推理进程中调用得到具有 predict(frame) 方法的对象
+            result_timeout: 单帧结果超时 (秒)，超时的帧被丢弃，避免阻塞后续帧
+        """
+        self.result_timeout = result_timeout
+        # 每个进程同时处理一帧，再多一个槽位给刚完成、尚未取走结果的帧
+        self.ring = FrameRing(workers + 1, max_shape)
+        self._authkey = secrets.token_bytes(16)
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self._predictor = predictor
+        self._workers: List[_Worker] = []
+        self._next_ticket = 0
+        # 票号 -> (调用方标签, 槽位, 提交时间)，按提交顺序排列
+        self._pending: "OrderedDict[int, Tuple[Any, int, float]]" = OrderedDict()
+        self._done: Dict[int, Tuple[List[Dict[str, Any]], float]] = {}
+        self._stats = {"submitted": 0, "completed": 0, "dropped": 0, "restarts": 0, "start_failures": 0}
+        # 先同时启动所有进程再逐个接受连接，进程的导入与模型加载并行进行
+        procs = [self._launch() for _ in range(workers)]
+        self._workers = self._connect(procs)
+
+    def _launch(self) -> subprocess.Popen:
+        address = "127.0.0.1:%d" % self._server.getsockname()[1]
+        env = dict(os.environ, INFER_POOL_AUTHKEY=self._authkey.hex())
+        return subprocess.Popen(
+            [sys.executable, "-m", "services.inference_pool", "--address", address,
+             "--shm", self.ring.name, "--slot-bytes", str(self.ring.slot_bytes),
+             "--predictor", self._predictor],
+            cwd=_PROJECT_ROOT, env=env,
+        )
+
+    def _connect(self, procs: List[subprocess.Popen], first_id: int = 0) -> List[_Worker]:
+        """
+        启动时等待推理进程连回并完成 authkey 握手；进程连接后先发送自己的 pid 用于对应。
+        有进程提前退出或超时则报错。
+        """
+        by_pid = {p.pid: p for p in procs}
+        workers = []
+        deadline = time.time() + config.INFER_WORKER_START_TIMEOUT
+        self._server.settimeout(0.5)
+        while len(workers) < len(procs):
+            try:
+                sock, _ = self._server.accept()
+            except socket.timeout:
+                dead = [p for p in procs if p.poll() is not None]
+                if dead or time.time() > deadline:
+                    for p in procs:
+                        p.kill()
+                    raise RuntimeError("inference worker failed to start")
+                continue
+            conn, pid = self._handshake(sock)
+            proc = by_pid[pid]
+            worker = _Worker(first_id + len(workers), proc, conn)
+            print(f"[Inference] Worker #{worker.id} connected (pid={proc.pid})")
+            workers.append(worker)
+        return workers
+
+    def _handshake(self, sock: socket.socket) -> Tuple[connection.Connection, int]:
+        """authkey 双向认证，返回 (连接, 进程 pid)"""
+        sock.setblocking(True)
+        conn = connection.Connection(sock.detach())
+        try:
+            connection.deliver_challenge(conn, self._authkey)
+            connection.answer_challenge(conn, self._authkey)
+            return conn, conn.recv()
+        except Exception:
+            conn.close()
+            raise
+
+    # =========================
+    # 状态
+    # =========================
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """帧能否放入共享内存槽位 (过大的帧需由调用方在本进程推理)"""
+        return self.ring.fits(frame)
+
+    def wait_ready(self, timeout: float = 120.0) -> bool:
+        """等待所有推理进程加载完模型"""
+        deadline = time.time() + timeout
+        while not all(w.ready for w in self._workers):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._receive(min(remaining, 0.5))
+        return True
+
+    # =========================
+    # 提交与取回
+    # =========================
+    def submit(self, frame: np.ndarray, tag: Any = None) -> bool:
+        """
+        把一帧交给空闲的推理进程。
+
+        Args:
+            frame: BGR 图像
+            tag: 调用方标签 (如帧快照)，留在本进程，随结果原样返回
+
+        Returns:
+            是否已提交 (没有空闲进程或帧过大时返回 False)
+        """
+        worker = next((w for w in self._workers if w.ready and w.ticket is None), None)
+        if worker is None:
+            return False
+        slot = self.ring.write(frame)
+        if slot is None:
+            return False
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        try:
+            worker.conn.send((ticket, slot, frame.shape[0], frame.shape[1]))
+        except OSError:
+            self.ring.release(slot)
+            self._restart(worker)
+            return False
+        worker.ticket = ticket
+        self._pending[ticket] = (tag, slot, time.time())
+        self._stats["submitted"] += 1
+        return True
+
+    def get(self, timeout: float = 0.0) -> Optional[Tuple[Any, List[Dict[str, Any]], float]]:
+        """
+        按提交顺序取回下一帧的结果。
+
+        Returns:
+            (标签, 检测框列表, 推理耗时 ms)；最早提交的帧尚未完成时返回 None
+        """
+        if not self._pending:
+            self._receive(timeout)  # 处理就绪通知
+            return None
+        head = next(iter(self._pending))
+        if head not in self._done:
+            self._receive(timeout)
+        if head not in self._done:
+            tag, slot, submit_ts = self._pending[head]
+            if time.time() - submit_ts > self.result_timeout:
+                # 结果超时：丢弃该帧，避免阻塞后续帧；迟到的结果会被忽略
+                print(f"[Inference] Frame ticket {head} timed out, dropped")
+                self._pending.pop(head)
+                self.ring.release(slot)
+                self._stats["dropped"] += 1
+                for w in self._workers:
+                    if w.ticket == head:
+                        self._restart(w)
+            return None
+        tag, slot, _ = self._pending.pop(head)
+        boxes, infer_ms = self._done.pop(head)
+        self.ring.release(slot)
+        self._stats["completed"] += 1
+        return tag, boxes, infer_ms
+
+    def _receive(self, timeout: float) -> None:
+        """接收推理进程发回的消息 (就绪通知或推理结果)，并接受重启中的进程的连接"""
+        self._check_launching()
+        conns = {w.conn: w for w in self._workers if w.conn is not None}
+        waitables: List[Any] = list(conns)
+        if any(w.conn is None for w in self._workers):
+            waitables.append(self._server)
+        if not waitables:
+            time.sleep(timeout)
+            return
+        for conn in connection.wait(waitables, timeout):
+            if conn is self._server:
+                self._accept()
+                continue
+            worker = conns[conn]
+            try:
+                msg = conn.recv()
+            except Exception:  # 连接断开或消息损坏：按进程丢失处理
+                self._restart(worker)
+                continue
+            if msg == "ready":
+                worker.ready = True
+                continue
+            ticket, boxes, infer_ms = msg
+            if worker.ticket == ticket:
+                worker.ticket = None
+                worker.done += 1
+            if ticket in self._pending:
+                self._done[ticket] = (boxes, infer_ms)
+
+    def _restart(self, worker: _Worker) -> None:
+        """推理进程退出或卡死：丢弃其正在处理的帧，启动替换进程 (不等待其连回)"""
+        print(f"[Inference] Worker #{worker.id} lost, restarting")
+        if worker.ticket is not None and worker.ticket in self._pending:
+            _, slot, _ = self._pending.pop(worker.ticket)
+            self.ring.release(slot)
+            self._stats["dropped"] += 1
+        self._stats["restarts"] += 1
+        self._respawn(worker)
+
+    def _respawn(self, worker: _Worker) -> None:
+        """结束旧进程并启动替换进程；替换进程由 _accept 接受连接，启动失败由 _check_launching 再次重启"""
+        if worker.conn is not None:
+            worker.conn.close()
+        if worker.proc is not None and worker.proc.poll() is None:
+            worker.proc.kill()
+            worker.proc.wait()
+        try:
+            proc = self._launch()
+        except OSError as e:
+            print(f"[Inference] Failed to launch worker #{worker.id}: {e}")
+            proc = None
+        self._workers[self._workers.index(worker)] = _Worker(worker.id, proc)
+
+    def _check_launching(self) -> None:
+        """启动中的进程提前退出或超时未连回时，等待 INFER_WORKER_RESPAWN_DELAY 后再次启动"""
+        now = time.time()
+        for worker in list(self._workers):
+            if worker.conn is not None:
+                continue
+            failed = worker.proc is None or worker.proc.poll() is not None \
+                or now - worker.launched > config.INFER_WORKER_START_TIMEOUT
+            if failed and now - worker.launched >= config.INFER_WORKER_RESPAWN_DELAY:
+                print(f"[Inference] Worker #{worker.id} failed to start, retrying")
+                self._stats["start_failures"] += 1
+                self._respawn(worker)
+
+    def _accept(self) -> None:
+        """接受一个重启中的进程的连接 (在处理循环线程中调用，不阻塞等待)"""
+        self._server.settimeout(0.0)
+        try:
+            sock, _ = self._server.accept()
+        except OSError:
+            return
+        try:
+            conn, pid = self._handshake(sock)
+        except Exception as e:
+            print(f"[Inference] Rejected worker connection: {e}")
+            return
+        worker = next((w for w in self._workers
+                       if w.conn is None and w.proc is not None and w.proc.pid == pid), None)
+        if worker is None:
+            conn.close()
+            return
+        worker.conn = conn
+        print(f"[Inference] Worker #{worker.id} reconnected (pid={pid})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["workers"] = [{"id": w.id, "pid": w.proc.pid if w.proc is not None else None,
+                             "ready": w.ready, "done": w.done}
+                            for w in self._workers]
+        stats["in_flight"] = self.in_flight
+        return stats
+
+    def close(self) -> None:
+        for w in self._workers:
+            try:
+                if w.conn is not None:
+                    w.conn.send(None)
+            except OSError:
+                pass
+        for w in self._workers:
+            if w.proc is not None:
+                if w.conn is None:
+                    w.proc.kill()  # 仍在启动中
+                try:
+                    w.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    w.proc.kill()
+            if w.conn is not None:
+                w.conn.close()
+        self._server.close()
+        self.ring.close()
+
+
+# =========================
+# 推理进程入口
+# =========================
+def run_worker(address: str, authkey: bytes, shm_name: str, slot_bytes: int, predictor: str) -> None:
+    """推理进程主循环：接收 (票号, 槽位, 高, 宽)，在共享内存视图上推理并回传检测框"""
+    host, port = address.rsplit(":", 1)
+    conn = connection.Client((host, int(port)), authkey=authkey)
+    conn.send(os.getpid())
+    shm = _attach_shm(shm_name)
+    module, attr = predictor.split(":")
+    model = getattr(importlib.import_module(module), attr)()
+    conn.send("ready")
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            ticket, slot, h, w = task
+            frame = FrameRing.view(shm, slot, slot_bytes, (h, w))
+            try:
+                boxes, _, infer_ms = model.predict(frame)
+            except Exception as e:
+                print(f"[Inference] Predict error: {e}")
+                boxes, infer_ms = [], 0.0
+            del frame
+            conn.send((ticket, boxes, infer_ms))
+    finally:
+        conn.close()
+        try:
+            shm.close()
+        except BufferError:
+            pass  # 模型内部仍引用最后一帧的视图，进程退出时自动释放
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference pool worker")
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--shm", required=True)
+    parser.add_argument("--slot-bytes", type=int, required=True)
+    parser.add_argument("--predictor", default=DEFAULT_PREDICTOR)
+    args = parser.parse_args()
+    run_worker(args.address, bytes.fromhex(os.environ["INFER_POOL_AUTHKEY"]), args.shm,
+               args.slot_bytes, args.predictor)
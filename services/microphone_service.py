@@ -3,22 +3,29 @@ import threading
 import time
 import wave
 import os
+import re
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Callable, List
+from typing import Optional, Callable, List, Tuple
+
+# 连接路由：(握手中的设备 ID 或 None, 来源 IP) -> (设备名, 录音完成回调)
+MicRouter = Callable[[Optional[str], str], Tuple[Optional[str], Optional[Callable[[Path], None]]]]
 
 class MicrophoneService:
     """
     麦克风服务：监听 TCP 端口接收来自 ESP32 的音频数据。
+    每个连接一个线程，多台设备可同时推流；连接开头的握手行 "DEV:<设备ID>" 决定录音交给哪个设备会话
+    (旧固件不发送握手，由路由按来源 IP 匹配)。
     支持两种模式：
     - 传统模式：本地 VAD + 保存 WAV 文件
-    - Omni 模式：直接推送 PCM 到 OmniService（Omni 内置 VAD）
+    - Omni 模式：直接推送 PCM 到 OmniService（Omni 内置 VAD，仅支持单设备）
     """
     def __init__(self, callback: Optional[Callable[[Path], None]] = None, port: int = 23457, save_dir: str = "recordings"):
         self.port = port
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(exist_ok=True)
         self.callback = callback  # 传统模式：录音完成后的回调
+        self.router: Optional[MicRouter] = None  # 多设备：按握手/来源 IP 选择回调
         self.omni_service = None  # Omni 模式：直接推送音频
         self.running = True
         
@@ -30,6 +37,10 @@ class MicrophoneService:
     def set_callback(self, callback: Callable[[Path], None]) -> None:
         """设置传统模式回调"""
         self.callback = callback
+
+    def set_router(self, router: MicRouter) -> None:
+        """设置多设备路由：每个连接按握手中的设备 ID 或来源 IP 选择录音回调"""
+        self.router = router
     
     def set_omni_service(self, omni_service) -> None:
         """设置 Omni 模式：直接推送音频"""
@@ -43,22 +54,68 @@ class MicrophoneService:
         
         try:
             server.bind(("0.0.0.0", self.port))
-            server.listen(1)
+            server.listen(8)
             print(f"Microphone Service listening on port {self.port}")
             
             while self.running:
                 client, addr = server.accept()
-                # 根据模式选择处理方式
-                if self.omni_service:
-                    self._handle_omni_stream(client)
-                else:
-                    self._handle_client_stream(client)
+                threading.Thread(target=self._handle_connection, args=(client, addr), daemon=True).start()
                 
         except Exception as e:
             print(f"Microphone Service Error: {e}")
         finally:
             server.close()
 
+    def _handle_connection(self, client, addr) -> None:
+        """读取可选握手，路由到设备会话后按模式处理音频流"""
+        device_id = self._read_handshake(client)
+        name, callback = None, self.callback
+        if self.router is not None:
+            name, callback = self.router(device_id, addr[0])
+        if device_id or name:
+            print(f"[MIC] Connection from {addr[0]} -> device '{name}' (handshake: {device_id})")
+
+        # 根据模式选择处理方式
+        if self.omni_service:
+            self._handle_omni_stream(client)
+        else:
+            self._handle_client_stream(client, callback, name)
+
+    def _read_handshake(self, client) -> Optional[str]:
+        """
+        读取连接开头的握手行 "DEV:<设备ID>\n"。
+        先窥视 (MSG_PEEK) 开头几个字节：不是握手前缀时不消费任何数据，旧固件的 PCM 原样保留。
+
+        Returns:
+            设备 ID；没有握手或 ID 不合法时为 None
+        """
+        from . import config
+
+        magic = config.MIC_HANDSHAKE_MAGIC
+        deadline = time.time() + config.MIC_HANDSHAKE_TIMEOUT
+        client.settimeout(config.MIC_HANDSHAKE_TIMEOUT)
+        try:
+            head = b""
+            while len(head) < len(magic):
+                head = client.recv(len(magic), socket.MSG_PEEK)
+                if not head or not magic.startswith(head) or time.time() >= deadline:
+                    return None
+                if len(head) < len(magic):
+                    time.sleep(0.01)  # 前缀只到了一部分
+            line = b""
+            while len(line) < config.MIC_HANDSHAKE_MAX_LEN:
+                ch = client.recv(1)
+                if not ch or ch == b"\n":
+                    break
+                line += ch
+            device_id = line[len(magic):].decode("ascii", "replace").strip()
+            # 设备 ID 会进入录音文件名与 URL，只接受字母数字、下划线与连字符
+            return device_id if re.fullmatch(r"[A-Za-z0-9_-]+", device_id) else None
+        except (socket.timeout, OSError):
+            return None
+        finally:
+            client.settimeout(None)
+
     def _handle_omni_stream(self, client) -> None:
         """
         Omni 模式：直接将音频推送到 OmniService
@@ -86,9 +143,14 @@ class MicrophoneService:
             client.close()
             print("[MIC] Client disconnected")
 
-    def _handle_client_stream(self, client) -> None:
+    def _handle_client_stream(self, client, callback: Optional[Callable[[Path], None]] = None,
+                              name: Optional[str] = None) -> None:
         """
         传统模式：本地 VAD + 保存 WAV 文件
+
+        Args:
+            callback: 录音完成回调 (所属设备会话)
+            name: 设备名，写入录音文件名
         """
         import audioop
         from . import config
@@ -139,7 +201,7 @@ class MicrophoneService:
                         if silence_start is None:
                             silence_start = time.time()
                         elif (time.time() - silence_start) > SILENCE_LIMIT:
-                            self._save_and_notify(frames, CHANNELS, WIDTH, RATE)
+                            self._save_and_notify(frames, CHANNELS, WIDTH, RATE, callback, name)
                             frames = []
                             is_speaking = False
                             silence_start = None
@@ -152,11 +214,13 @@ class MicrophoneService:
         finally:
             client.close()
             if frames and len(frames) > RATE * 0.5:
-                self._save_and_notify(frames, CHANNELS, WIDTH, RATE)
+                self._save_and_notify(frames, CHANNELS, WIDTH, RATE, callback, name)
 
-    def _save_and_notify(self, frames: List[bytes], channels: int, width: int, rate: int) -> None:
+    def _save_and_notify(self, frames: List[bytes], channels: int, width: int, rate: int,
+                         callback: Optional[Callable[[Path], None]] = None, name: Optional[str] = None) -> None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = self.save_dir / f"cmd_{timestamp}.wav"
+        prefix = f"cmd_{name}_" if name else "cmd_"
+        filename = self.save_dir / f"{prefix}{timestamp}.wav"
         
         try:
             with wave.open(str(filename), 'wb') as wf:
@@ -166,8 +230,8 @@ class MicrophoneService:
                 wf.writeframes(b''.join(frames))
             
             print(f"Voice Command Saved: {filename.name}")
-            if self.callback:
-                self.callback(filename)
+            if callback:
+                callback(filename)
         except Exception as e:
             print(f"Save Error: {e}")
 
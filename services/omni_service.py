@@ -117,13 +117,13 @@ class OmniService:
     
     def append_image(self):
         """
-        附加当前摄像头画面到对话
+        附加摄像头画面到对话 (最近一小段时间内最清晰的一帧)
         使用 append_video 方法发送单帧图像
         """
         if not self.connected or not self.conversation:
             return
         
-        frame, _ = self.state.get_frame()
+        frame, _ = self.state.get_best_frame()
         if frame is None:
             print("OmniService: No frame available")
             return
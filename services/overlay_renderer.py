@@ -0,0 +1,106 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+from . import config
+
+try:
+    from ultralytics.utils.plotting import colors as _ultralytics_colors
+except ImportError:
+    _ultralytics_colors = None
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_HUD_GREEN = (0, 255, 0)
+_HUD_RED = (0, 0, 255)
+_SEARCH_COLOR = (255, 0, 255)
+_LABEL_TEXT_COLOR = (255, 255, 255)
+# 标签文本尺寸缓存上限 (标签 + 两位小数置信度，实际取值有限)
+_TEXT_SIZE_CACHE_MAX = 4096
+
+
+class OverlayRenderer:
+    """
+    轻量 HUD 渲染器，替代 ultralytics `Results.plot()` + `draw_hud`：
+    - 复用预分配的输出缓冲区，不再每帧分配新的标注副本
+    - 只绘制关注类别 (ALERT_CLASSES) 的检测框与寻物目标
+    - 标签尺寸 (getTextSize) 按文本缓存，文本直接用 cv2.putText 绘制：不缓存字形位图。
+      OpenCV 的文字带抗锯齿，缓存位图后每帧仍需按不透明度混合，实测比 putText 慢约 7 倍
+      (benchmarks/bench_overlay.py 640x480：每帧 7 段文字 putText 约 0.12 ms，位图混合约 0.9 ms)
+
+    注意：render() 返回的是复用缓冲区，调用方需在下一次 render() 之前用完 (如立即编码)。
+    """
+
+    def __init__(self, class_ids: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            class_ids: 类名 -> 类别编号，用于与 ultralytics 保持一致的框颜色
+        """
+        self.class_ids = class_ids or {}
+        self._text_sizes: Dict[Tuple[str, float, int], Tuple[int, int]] = {}
+        self._buf: Optional[np.ndarray] = None
+
+    def _color(self, label: str) -> Tuple[int, int, int]:
+        cls = self.class_ids.get(label, 0)
+        if _ultralytics_colors is not None:
+            return tuple(int(c) for c in _ultralytics_colors(cls, True))
+        return (56, 56, 255)
+
+    def _text_size(self, text: str, scale: float, thickness: int) -> Tuple[int, int]:
+        key = (text, scale, thickness)
+        size = self._text_sizes.get(key)
+        if size is None:
+            if len(self._text_sizes) >= _TEXT_SIZE_CACHE_MAX:
+                self._text_sizes.clear()
+            size = self._text_sizes[key] = cv2.getTextSize(text, _FONT, scale, thickness)[0]
+        return size
+
+    def _draw_box(self, img: np.ndarray, box: Dict[str, Any], color: Tuple[int, int, int],
+                  lw: int, caption: str) -> None:
+        """绘制检测框与带底色的标签 (样式与 ultralytics 一致)"""
+        p1 = (int(box["x1"]), int(box["y1"]))
+        p2 = (int(box["x2"]), int(box["y2"]))
+        cv2.rectangle(img, p1, p2, color, lw, cv2.LINE_AA)
+
+        scale, tf = lw / 3, max(lw - 1, 1)
+        w, h = self._text_size(caption, scale, tf)
+        outside = p1[1] >= h + 3
+        top = p1[1] - h - 3 if outside else p1[1]
+        bottom = p1[1] if outside else p1[1] + h + 3
+        cv2.rectangle(img, (p1[0], top), (p1[0] + w, bottom), color, -1, cv2.LINE_AA)
+        base_y = p1[1] - 2 if outside else p1[1] + h + 2
+        cv2.putText(img, caption, (p1[0], base_y), _FONT, scale, _LABEL_TEXT_COLOR, tf, cv2.LINE_AA)
+
+    def render(self, frame: np.ndarray, boxes: List[Dict[str, Any]], fps: float, delay: float,
+               level: int, search_box: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        绘制 HUD 画面。
+
+        Args:
+            frame: 原始帧 (不会被修改)
+            boxes: 检测结果
+            fps, delay: HUD 指标
+            level: 稳定警报等级
+            search_box: 寻物目标框 (寻物模式下)
+
+        Returns:
+            绘制后的图像 (复用的预分配缓冲区)
+        """
+        if self._buf is None or self._buf.shape != frame.shape:
+            self._buf = np.empty_like(frame)
+        img = self._buf
+        np.copyto(img, frame)
+
+        # 线宽与 ultralytics 默认一致
+        lw = max(round(sum(frame.shape[:2]) / 2 * 0.003), 2)
+        for b in boxes:
+            if b["label"] in config.ALERT_CLASSES:
+                self._draw_box(img, b, self._color(b["label"]), lw, f"{b['label']} {b['conf']:.2f}")
+        if search_box is not None:
+            self._draw_box(img, search_box, _SEARCH_COLOR, lw + 1, f"{search_box['label']} {search_box['conf']:.2f}")
+
+        cv2.putText(img, f"FPS: {fps:.1f}", (10, 25), _FONT, 0.7, _HUD_GREEN, 2)
+        cv2.putText(img, f"Delay: {delay:.0f} ms", (10, 50), _FONT, 0.7, _HUD_GREEN, 2)
+        cv2.putText(img, f"Count: {len(boxes)}", (10, 75), _FONT, 0.7, _HUD_GREEN, 2)
+        if level > 0:
+            cv2.putText(img, f"ALERT L{level}", (10, 105), _FONT, 0.85, _HUD_RED, 2)
+        return img
@@ -0,0 +1,89 @@
+import queue
+import re
+import time
+from typing import Iterator, List, Optional
+from . import config
+
+# 句子边界：中文句末标点、英文句末标点 (后接空白)、换行
+_BOUNDARY = re.compile(r'[。！？；!?;…]+|[.](?=\s)|\n+')
+
+
+class SentenceSplitter:
+    """
+    增量断句器：不断喂入 LLM 文本增量，按句末标点切出完整句子。
+    过短的句子会与下一句合并，避免 TTS 断断续续。
+    """
+
+    def __init__(self, min_chars: int = config.SENTENCE_MIN_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """喂入文本增量，返回本次新切出的完整句子"""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for m in _BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:m.end()]
+            if len(candidate.strip()) < self.min_chars:
+                continue
+            sentences.append(candidate.strip())
+            start = m.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """取出剩余未以标点结尾的文本"""
+        tail = self._buffer.strip()
+        self._buffer = ""
+        return tail or None
+
+
+class ReplyStream:
+    """
+    流式回复通道：生产者 (VLM 线程) 推送文本增量，消费者 (播报线程) 按句取出。
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._parts: List[str] = []
+
+    def push(self, delta: str) -> None:
+        """推送一段文本增量"""
+        if delta:
+            self._queue.put(delta)
+
+    def close(self) -> None:
+        """生产结束 (成功或失败都必须调用)"""
+        self._queue.put(None)
+
+    @property
+    def text(self) -> str:
+        """已被消费的完整文本"""
+        return "".join(self._parts)
+
+    def sentences(self,
+                  first_timeout: float = config.STREAM_FIRST_TIMEOUT,
+                  idle_timeout: float = config.STREAM_IDLE_TIMEOUT) -> Iterator[str]:
+        """
+        逐句迭代回复。
+
+        Raises:
+            TimeoutError: 首个增量或两次增量之间等待超时
+        """
+        splitter = SentenceSplitter()
+        deadline = time.time() + first_timeout
+        while True:
+            try:
+                delta = self._queue.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                raise TimeoutError("reply stream timed out")
+            if delta is None:
+                tail = splitter.flush()
+                if tail:
+                    yield tail
+                return
+            self._parts.append(delta)
+            for sentence in splitter.feed(delta):
+                yield sentence
+            deadline = time.time() + idle_timeout
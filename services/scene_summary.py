@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Optional
+from . import config
+
+# COCO 类名 -> (中文名, 量词)
+LABEL_ZH = {
+    "person": ("人", "个"), "bicycle": ("自行车", "辆"), "car": ("汽车", "辆"),
+    "motorcycle": ("摩托车", "辆"), "bus": ("公交车", "辆"), "truck": ("卡车", "辆"),
+    "traffic light": ("红绿灯", "个"), "fire hydrant": ("消防栓", "个"),
+    "stop sign": ("停车标志", "个"), "bench": ("长椅", "张"), "dog": ("狗", "只"),
+    "cat": ("猫", "只"), "backpack": ("背包", "个"), "umbrella": ("伞", "把"),
+    "handbag": ("包", "个"), "suitcase": ("箱子", "个"), "bottle": ("瓶子", "个"),
+    "cup": ("杯子", "个"), "chair": ("椅子", "把"), "couch": ("沙发", "张"),
+    "potted plant": ("盆栽", "盆"), "bed": ("床", "张"), "dining table": ("桌子", "张"),
+    "toilet": ("马桶", "个"), "tv": ("电视", "台"), "laptop": ("电脑", "台"),
+    "mouse": ("鼠标", "个"), "remote": ("遥控器", "个"), "keyboard": ("键盘", "个"),
+    "cell phone": ("手机", "部"), "book": ("书", "本"), "clock": ("钟", "个"),
+    "vase": ("花瓶", "个"), "scissors": ("剪刀", "把"), "refrigerator": ("冰箱", "台"),
+    "sink": ("水槽", "个"), "microwave": ("微波炉", "台"), "oven": ("烤箱", "台"),
+}
+
+_CN_NUM = ["零", "一", "两", "三", "四", "五", "六", "七", "八", "九", "十"]
+
+# 方向顺序与中文描述
+_POSITIONS = OrderedDict([("left", "左边"), ("center", "正前方"), ("right", "右边")])
+
+
+class SceneSummarizer:
+    """
+    本地场景摘要：根据 YOLO 检测结果生成中文描述，用于快速回答"前面有什么"。
+    当检测结果不足以回答问题时 (过期、置信度低、场景复杂、需要读字等)，返回 None 交给 VLM。
+    """
+
+    def summarize(self, boxes: List[Dict[str, Any]], w: int, h: int) -> Tuple[str, float]:
+        """
+        将检测结果整理为一句中文描述。
+
+        Args:
+            boxes: 检测到的边界框列表
+            w, h: 图像宽高
+
+        Returns:
+            (text, confidence): 中文描述与参与描述目标的平均置信度
+        """
+        if w <= 0 or h <= 0 or not boxes:
+            return "", 0.0
+
+        # 按类别分组，记录方向、最大面积和是否较近
+        groups: Dict[str, Dict[str, Any]] = {}
+        for b in boxes:
+            x1, y1, x2, y2 = b["x1"], b["y1"], b["x2"], b["y2"]
+            area_ratio = ((x2 - x1) * (y2 - y1)) / (w * h + 1e-6)
+            cx = (x1 + x2) / 2.0
+            if cx < w / 3:
+                pos = "left"
+            elif cx > 2 * w / 3:
+                pos = "right"
+            else:
+                pos = "center"
+
+            g = groups.setdefault(b["label"], {"positions": {}, "max_area": 0.0, "near": False})
+            g["positions"][pos] = g["positions"].get(pos, 0) + 1
+            g["max_area"] = max(g["max_area"], area_ratio)
+            if area_ratio >= config.TH_L2:
+                g["near"] = True
+
+        # 关注类别 (如行人) 优先，其余按面积从大到小
+        order = sorted(groups.items(),
+                       key=lambda kv: (kv[0] not in config.ALERT_CLASSES, -kv[1]["max_area"]))
+
+        parts = []
+        for label, g in order:
+            name, unit = LABEL_ZH.get(label, (label, "个"))
+            total = sum(g["positions"].values())
+            used = [p for p in _POSITIONS if p in g["positions"]]
+            if len(used) == 1:
+                part = f"{_POSITIONS[used[0]]}有{self._num(total)}{unit}{name}"
+            else:
+                detail = "，".join(f"{_POSITIONS[p]}{self._num(g['positions'][p])}{unit}" for p in used)
+                part = f"前方有{self._num(total)}{unit}{name}，{detail}"
+            if g["near"]:
+                part += "，距离较近"
+            parts.append(part)
+
+        confidence = sum(b["conf"] for b in boxes) / len(boxes)
+        return "；".join(parts) + "。", float(confidence)
+
+    def answer(self, question: str, boxes: List[Dict[str, Any]], w: int, h: int, ts: float) -> Optional[str]:
+        """
+        置信度规则：判断本地摘要是否足以回答问题。
+
+        Args:
+            question: 用户问题 (STT 文本)
+            boxes: 当前检测结果
+            w, h: 图像宽高
+            ts: 检测结果的时间戳
+
+        Returns:
+            可直接播报的本地回答；需要升级到 VLM 时返回 None
+        """
+        if not config.LOCAL_SCENE_ENABLED:
+            return None
+        if any(k in question for k in config.LOCAL_SCENE_ESCALATE_KEYWORDS):
+            return None
+        if ts <= 0 or (time.time() - ts) > config.LOCAL_SCENE_MAX_AGE:
+            return None
+        # 没有检测到目标不代表前方真的没有东西，交给 VLM 确认
+        if not boxes:
+            return None
+        if len({b["label"] for b in boxes}) > config.LOCAL_SCENE_MAX_LABELS:
+            return None
+
+        text, confidence = self.summarize(boxes, w, h)
+        if not text or confidence < config.LOCAL_SCENE_MIN_CONF:
+            return None
+        return text
+
+    @staticmethod
+    def _num(n: int) -> str:
+        """阿拉伯数字转中文口语数字 (超过十个统一说"很多")"""
+        return _CN_NUM[n] if 0 <= n <= 10 else "很多"
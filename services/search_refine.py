@@ -0,0 +1,122 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import config
+
+
+def _area_ratio(box: Dict[str, Any], w: int, h: int) -> float:
+    return ((box["x2"] - box["x1"]) * (box["y2"] - box["y1"])) / (w * h + 1e-6)
+
+
+class SearchRefiner:
+    """
+    寻物模式的 ROI 二次推理 (每台设备的处理循环独占一个)。
+
+    全图推理之后，从原始分辨率帧中裁出一块正方形区域，只检测目标类别再推理一次：
+    1. 全图已检测到目标且目标不小 (达到 GEIGER_AREA_MID)：全图结果足够，不再精搜
+    2. 全图检测到较小的目标：以其为中心裁剪 (候选)
+    3. 全图没有检测到：以 SEARCH_REFINE_TRACK_S 秒内最近一次出现的位置为中心 (跟踪)
+    4. 从未出现或已过期：按网格轮流扫描整帧，每帧一块 (扫描)
+
+    裁剪区域在 IMG_SIZE 下推理，相当于只对这一小块提高了输入分辨率，
+    比全局调大 IMG_SIZE 的开销小得多。
+    """
+
+    def __init__(self, vision):
+        """
+        Args:
+            vision: VisionService (predict_region)
+        """
+        self.vision = vision
+        self._target = ""
+        self._last: Optional[Tuple[float, float]] = None  # 目标最近一次出现的中心 (像素)
+        self._last_ts = 0.0
+        self._tile = 0
+
+        # 统计
+        self.runs = {"candidate": 0, "track": 0, "scan": 0}
+        self.skipped = 0     # 全图结果足够，未精搜
+        self.found = 0       # 精搜检测到目标的次数
+        self.rescued = 0     # 全图未检测到、精搜检测到的次数
+        self.infer_ms_avg = 0.0
+
+    def reset(self, target_class: str = "") -> None:
+        self._target = target_class
+        self._last = None
+        self._last_ts = 0.0
+        self._tile = 0
+
+    def roi(self, w: int, h: int, center: Tuple[float, float], side: int) -> Tuple[int, int, int, int]:
+        """以 center 为中心、边长 side 的正方形区域，平移到帧内"""
+        side = min(side, w, h)
+        x1 = int(round(min(max(center[0] - side / 2.0, 0), w - side)))
+        y1 = int(round(min(max(center[1] - side / 2.0, 0), h - side)))
+        return x1, y1, x1 + side, y1 + side
+
+    def next_tile(self, w: int, h: int, side: int) -> Tuple[float, float]:
+        """扫描网格中下一块的中心 (网格刚好覆盖整帧，相邻块可能重叠)"""
+        nx, ny = math.ceil(w / side), math.ceil(h / side)
+        i = self._tile % (nx * ny)
+        self._tile += 1
+        cx = side / 2.0 + (i % nx) * ((w - side) / (nx - 1) if nx > 1 else 0.0)
+        cy = side / 2.0 + (i // nx) * ((h - side) / (ny - 1) if ny > 1 else 0.0)
+        return cx, cy
+
+    def refine(self, frame: np.ndarray, boxes: List[Dict[str, Any]], target_class: str,
+               now: float) -> List[Dict[str, Any]]:
+        """
+        对一帧做精搜。
+
+        Args:
+            frame: 原始分辨率帧
+            boxes: 本帧全图推理的检测框
+            target_class: 寻物目标 (COCO 类名)
+
+        Returns:
+            精搜检测到的目标框 (全帧坐标)；未精搜或未检测到时为空
+        """
+        if target_class != self._target:
+            self.reset(target_class)
+        h, w = frame.shape[:2]
+        found = [b for b in boxes if b["label"] == target_class]
+        best = max(found, key=lambda b: _area_ratio(b, w, h)) if found else None
+        if best is not None:
+            self._remember(best, now)
+            if _area_ratio(best, w, h) >= config.GEIGER_AREA_MID:
+                self.skipped += 1
+                return []
+
+        side = int(min(w, h) * config.SEARCH_REFINE_CROP)
+        if best is not None:
+            mode, center = "candidate", self._last
+        elif self._last is not None and now - self._last_ts <= config.SEARCH_REFINE_TRACK_S:
+            mode, center = "track", self._last
+        else:
+            mode, center = "scan", self.next_tile(w, h, side)
+
+        refined, infer_ms = self.vision.predict_region(frame, self.roi(w, h, center, side), target_class)
+        self.runs[mode] += 1
+        n = sum(self.runs.values())
+        self.infer_ms_avg += (infer_ms - self.infer_ms_avg) / n
+        if refined:
+            self.found += 1
+            if best is None:
+                self.rescued += 1
+            self._remember(max(refined, key=lambda b: _area_ratio(b, w, h)), now)
+        return refined
+
+    def _remember(self, box: Dict[str, Any], now: float) -> None:
+        self._last = ((box["x1"] + box["x2"]) / 2.0, (box["y1"] + box["y2"]) / 2.0)
+        self._last_ts = now
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "target": self._target,
+            "runs": dict(self.runs),
+            "skipped": self.skipped,
+            "found": self.found,
+            "rescued": self.rescued,
+            "infer_ms": round(self.infer_ms_avg, 2),
+        }
@@ -0,0 +1,210 @@
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Optional
+from . import config
+
+
+class SpeculationPolicy:
+    """
+    投机视觉请求策略：根据部分识别文本 (partial transcript) 与视觉意图先验，
+    决定何时启动、取消或升级 VLM 请求，并统计投机调用的使用/浪费情况。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 近期语句中视觉问题的比例 (EMA)
+        self.vision_prior = config.SPECULATION_PRIOR_INIT
+        self._stats = {
+            "utterances": 0,   # 处理的语句数
+            "started": 0,      # 启动的 VLM 请求总数
+            "early": 0,        # 录音结束即启动的请求数
+            "upgraded": 0,     # 由部分识别文本触发启动的请求数
+            "late": 0,         # 识别完成后才启动的请求数 (投机未命中)
+            "used": 0,         # 结果被播报的请求数
+            "wasted": 0,       # 已发出但结果被丢弃的请求数
+            "cancelled": 0,    # 发出前即被取消的请求数 (未消耗配额)
+        }
+
+    @staticmethod
+    def classify(text: str) -> str:
+        """
+        判断文本意图。
+
+        Returns:
+            "command" (寻物/停止等指令), "vision" (需要视觉结果) 或 "unknown"
+        """
+        if not text:
+            return "unknown"
+        if any(k in text for k in config.SEARCH_COMMAND_KEYWORDS + config.SEARCH_STOP_KEYWORDS):
+            return "command"
+        if any(k in text for k in config.VISION_KEYWORDS):
+            return "vision"
+        return "unknown"
+
+    def should_start_early(self, search_active: bool = False) -> bool:
+        """录音结束、还没有任何识别文本时，是否立即启动 VLM"""
+        # 寻物模式下用户多半在下达停止指令，不值得投机
+        if search_active:
+            return False
+        with self._lock:
+            return self.vision_prior >= config.SPECULATION_START_PRIOR
+
+    def decide(self, partial_text: str, started: bool) -> str:
+        """
+        根据部分识别文本决定动作。
+
+        Returns:
+            "start" (升级启动), "cancel" (取消) 或 "keep" (保持现状)
+        """
+        intent = self.classify(partial_text)
+        if intent == "command" and started:
+            return "cancel"
+        if intent == "vision" and not started:
+            return "start"
+        return "keep"
+
+    def record(self, key: str) -> None:
+        """累加一项统计"""
+        with self._lock:
+            self._stats[key] += 1
+
+    def observe(self, final_text: str) -> None:
+        """用最终识别文本更新视觉意图先验"""
+        hit = 1.0 if self.classify(final_text) == "vision" else 0.0
+        with self._lock:
+            self._stats["utterances"] += 1
+            alpha = config.SPECULATION_PRIOR_ALPHA
+            self.vision_prior = (1 - alpha) * self.vision_prior + alpha * hit
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取投机调用统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["vision_prior"] = round(self.vision_prior, 3)
+            issued = stats["used"] + stats["wasted"]
+            stats["waste_ratio"] = round(stats["wasted"] / issued, 3) if issued else 0.0
+            return stats
+
+
+class _Ticket:
+    """一次 VLM 请求的发送凭证：保证 "取消" 与 "发出" 二者只发生其一"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = False
+        self.sent = False
+
+    def begin_send(self) -> bool:
+        """即将发出网络请求时调用，返回 False 表示已被取消"""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.sent = True
+            return True
+
+    def cancel(self) -> bool:
+        """取消请求，返回 True 表示请求尚未发出 (未消耗配额)"""
+        with self._lock:
+            self.cancelled = True
+            return not self.sent
+
+
+class SpeculativeRequest:
+    """
+    单次语音交互中的投机视觉请求。
+    部分识别文本会从 ASR 回调线程到达，因此所有状态变更都在锁内完成。
+    """
+
+    def __init__(self, policy: SpeculationPolicy,
+                 submit: Callable[[Callable[[], bool]], concurrent.futures.Future],
+                 snapshot: Optional[Callable[[], Optional[concurrent.futures.Future]]] = None):
+        """
+        Args:
+            policy: 投机策略
+            submit: 提交 VLM 任务的函数，参数为 begin_send 回调，
+                    任务在发出网络请求前调用它，返回 False 时应放弃请求
+            snapshot: 开始拍摄高清快照的函数 (返回快照 Future 或 None)；
+                      (部分) 识别文本判定为视觉问题时才调用，结果经 self.hq 交给视觉任务
+        """
+        self.policy = policy
+        self._submit = submit
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        self._ticket: Optional[_Ticket] = None
+        self.future: Optional[concurrent.futures.Future] = None
+        self._settled = False
+        self.text = ""   # 最近一次 (部分) 识别文本，视觉任务发出请求前据此选择 Prompt
+        # 高清快照 (JPEG 字节)：确认是视觉问题后由快照结果填充，不是视觉问题时为 None
+        self.hq: Optional[concurrent.futures.Future] = concurrent.futures.Future() if snapshot else None
+        self._hq_decided = False
+
+    @property
+    def started(self) -> bool:
+        return self.future is not None
+
+    def start(self, reason: str) -> None:
+        """启动 VLM 请求 (reason: early / upgraded / late)"""
+        with self._lock:
+            if self.future is not None or self._settled:
+                return
+            self._ticket = _Ticket()
+            self.future = self._submit(self._ticket.begin_send)
+        self.policy.record("started")
+        self.policy.record(reason)
+        print(f"[Speculation] Vision request started ({reason})")
+
+    def on_partial(self, text: str) -> None:
+        """ASR 部分识别结果回调"""
+        self.text = text
+        if self.policy.classify(text) == "vision":
+            self._decide_snapshot(True)
+        action = self.policy.decide(text, self.started)
+        if action == "start":
+            self.start("upgraded")
+        elif action == "cancel":
+            self.discard()
+
+    def _decide_snapshot(self, vision: bool) -> None:
+        """识别文本判定为视觉问题时开始拍摄快照，否则以 None 结束 self.hq (只决定一次)"""
+        with self._lock:
+            if self.hq is None or self._hq_decided:
+                return
+            self._hq_decided = True
+        shot = self._snapshot() if vision else None
+        if shot is None:
+            self.hq.set_result(None)
+            return
+
+        def relay(f: concurrent.futures.Future) -> None:
+            self.hq.set_result(None if f.cancelled() or f.exception() else f.result())
+        shot.add_done_callback(relay)
+
+    def take(self) -> Optional[concurrent.futures.Future]:
+        """取用请求结果 (计为 used)，同时确认是视觉问题"""
+        self._decide_snapshot(True)
+        with self._lock:
+            if self._settled or self.future is None:
+                return None
+            self._settled = True
+        self.policy.record("used")
+        return self.future
+
+    def discard(self) -> None:
+        """放弃请求：尚未发出则取消 (不耗配额)，已发出则计为浪费；未拍的快照不再拍摄"""
+        with self._lock:
+            if self._settled or self.future is None:
+                future = None
+            else:
+                future, ticket = self.future, self._ticket
+                self.future, self._ticket = None, None
+        if future is not None:
+            future.cancel()   # 先取消，再结束 self.hq (等待快照的任务不会因此被提交)
+        self._decide_snapshot(False)
+        if future is None:
+            return
+        if ticket.cancel():
+            self.policy.record("cancelled")
+            print("[Speculation] Vision request cancelled before sending")
+        else:
+            self.policy.record("wasted")
+            print("[Speculation] Vision request wasted")
@@ -1,207 +1,289 @@
 import threading
 import time
 import numpy as np
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, replace
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from .frame_selector import SharpFrameRing
+
+
+# =========================
+# 不可变状态快照 (Immutable Snapshots)
+# =========================
+# 生产者构建新的快照对象后，通过一次引用赋值发布 (CPython 中属性赋值是原子的)。
+# 读者拿到的快照永远是一致的，读取时不需要加锁，也不会阻塞写者。
+
+@dataclass(frozen=True)
+class FrameSnapshot:
+    """相机帧"""
+    raw: Optional[np.ndarray] = None   # 用于推理的原始 NumPy 数组
+    ts: float = 0.0                    # 原始帧的时间戳
+    shape: Tuple[int, int] = (0, 0)    # 帧分辨率 (H, W)
+    jpg: Optional[bytes] = None        # 相机原始 JPEG (用于直通推流)
+    seq: int = 0                       # 帧序号 (每帧加 1)
+
+
+@dataclass(frozen=True)
+class DetectionSnapshot:
+    """推理结果"""
+    boxes: Tuple[Dict[str, Any], ...] = ()  # 检测到的边界框列表
+    infer_ms: float = 0.0                   # 推理耗时 (ms)
+    fps: float = 0.0                        # 推理 FPS
+    delay_ms: float = 0.0                   # 整体延迟 (ms)
+    ts: float = 0.0                         # 检测结果的时间戳
+    frame_seq: int = 0                      # 检测所用帧的序号
+
+    @property
+    def count(self) -> int:
+        return len(self.boxes)
+
+
+@dataclass(frozen=True)
+class AlertSnapshot:
+    """经过去抖动处理后的稳定警报"""
+    level: int = 0                             # 警报等级
+    text: str = ""                             # 警报文本
+    target: Optional[Dict[str, Any]] = None    # 主要风险目标
+    should_notify: bool = False                # 是否应该由 UI 显示强提醒
+
+
+@dataclass(frozen=True)
+class AudioSnapshot:
+    """音频发送健康状态"""
+    last_send_ts: float = 0.0   # 最近一次成功发送时间
+    last_send_ok: bool = False  # 最近一次发送是否成功
+
+
+@dataclass(frozen=True)
+class VoiceSnapshot:
+    """语音助手状态"""
+    status: str = "idle"                     # idle, listening, processing, speaking
+    log: Tuple[Dict[str, Any], ...] = ()     # ({"role": "user", "content": "...", "ts": ...}, ...)
+
+
+@dataclass(frozen=True)
+class SearchSnapshot:
+    """寻物模式状态"""
+    active: bool = False                          # 是否处于寻物模式
+    target_class: str = ""                        # 目标类别 (COCO 类名)
+    target_label: str = ""                        # 用户输入的原始标签
+    target_info: Optional[Dict[str, Any]] = None  # 目标位置信息
+    started_ts: float = 0.0                       # 本次寻物开始时间
+
 
 class AppState:
     """
     应用程序的全局状态管理类。
-    使用线程锁 (threading.Lock) 确保多线程环境下的数据安全。
+
+    状态按领域拆分为不可变快照 (frame / detection / alert / audio / voice / search)，
+    生产者构建新快照后以一次引用赋值发布，读者直接读取属性即可，永远不会阻塞写者。
+    `lock` 只用于多个写者对同一领域做"读-改-写"时的串行化 (如追加语音日志)。
     """
     def __init__(self):
+        # 写者之间的串行化锁 (读者不需要)
         self.lock = threading.Lock()
-        
-        # =========================
-        # 相机与帧数据 (Camera & Frames)
-        # =========================
-        # 使用 Condition 变量实现视频流的事件驱动 (Event-driven Video Streaming)
-        self.frame_condition = threading.Condition(self.lock)
-        
-        self.latest_frame_jpg: Optional[bytes] = None # 用于 Web 推流的 JPEG 数据
-        self.latest_raw_frame: Optional[np.ndarray] = None # 用于推理的原始 NumPy 数组
-        self.latest_raw_ts = 0.0 # 原始帧的时间戳
-        self.latest_ts = 0.0     # 处理完成的时间戳
-        self.latest_shape = (0, 0) # 帧分辨率 (H, W)
-
-        # =========================
-        # 检测结果 (Detection Results)
-        # =========================
-        self.latest_boxes: List[Dict[str, Any]] = [] # 检测到的边界框列表
-        self.latest_count = 0        # 目标数量
-        self.latest_infer_ms = 0.0   # 推理耗时 (ms)
-        self.latest_delay_ms = 0.0   # 整体延迟 (ms)
-        self.latest_fps_infer = 0.0  # 推理 FPS
-
-        # =========================
-        # 警报状态 (Alert State)
-        # =========================
-        self.latest_alert_level = 0  # 当前帧的瞬时警报等级
-        self.latest_alert_text = ""  # 警报文本
-        self.latest_alert_target: Optional[Dict[str, Any]] = None # 主要风险目标
-        self.latest_should_notify = False # 是否应该由 UI 显示强提醒
-        
-        # =========================
-        # 音频发送状态 (Audio Sending)
-        # =========================
-        self.last_send_ts = 0.0 # 最近一次音频发送时间
-        self.last_send_ok = False # 最近一次发送是否成功
-        
-        # =========================
-        # 内部历史状态 (Internal History)
-        # =========================
-        self.prev_max_area_ratio: Dict[str, float] = {} # 上一帧各目标的面积占比，用于计算增长率
-        self.last_alert_time = {1: 0.0, 2: 0.0, 3: 0.0} # 各等级警报上次触发时间 (CoolDown)
-        self.last_alert_emit_ts = 0.0 # 全局最后一次警报发出的时间
-        
-        # =========================
-        # 稳定性滤波器 (Stability Filters)
-        # =========================
-        self.alert_on_count = 0  # 连续触发计数 (防抖动)
-        self.alert_off_count = 0 # 连续未触发计数
-        self.stable_alert_level = 0 # 稳定后的输出警报等级
-        self.stable_alert_text = ""
-        self.stable_alert_target: Optional[Dict[str, Any]] = None
-
-        # =========================
-        # 语音助手状态 (Voice Assistant State)
-        # =========================
-        self.latest_voice_status = "idle" # idle, listening, processing, speaking
-        self.latest_voice_log: List[Dict[str, str]] = [] # [{"role": "user", "content": "..."}]
-
-        # =========================
-        # 寻物模式状态 (Search Mode State)
-        # =========================
-        self.search_mode = False           # 是否处于寻物模式
-        self.search_target_class = ""      # 目标类别 (COCO 类名)
-        self.search_target_label = ""      # 用户输入的原始标签
-        self.search_last_beep_ts = 0.0     # 上次哔哔声时间
-        self.search_target_info: Optional[Dict[str, Any]] = None  # 目标位置信息
-
-    def update_frame(self, frame: np.ndarray, ts: float):
-        """更新最新的相机帧数据"""
-        with self.lock:
-            self.latest_raw_frame = frame
-            self.latest_raw_ts = ts
-            self.latest_shape = frame.shape[:2]
+
+        # 状态版本号：前端可见的状态每发布一次加 1，用于 ETag 与长轮询
+        self.version = 0
+        self.version_condition = threading.Condition()
+        self._version_listeners: List[Callable[[int], None]] = []
+
+        self.frame = FrameSnapshot()
+        self.recent_frames = SharpFrameRing()  # 最近几帧及清晰度 (视觉问答取最清晰的一帧)
+        self.detection = DetectionSnapshot()
+        self.alert = AlertSnapshot()
+        self.audio = AudioSnapshot()
+        self.voice = VoiceSnapshot()
+        self.search = SearchSnapshot()
+
+        self.latest_ts = 0.0  # 处理循环最近一次心跳/发布的时间戳
+
+    def _bump_version(self):
+        """发布新快照后调用：版本号加 1 并唤醒等待中的长轮询请求"""
+        with self.version_condition:
+            self.version += 1
+            version = self.version
+            self.version_condition.notify_all()
+        for listener in self._version_listeners:
+            listener(version)
+
+    def add_version_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        注册版本号变化回调 (在发布者线程中同步调用，必须立即返回)。
+        供异步服务器把版本变化转交给事件循环，而不必为每个等待者占用一个线程。
+        """
+        self._version_listeners.append(listener)
+
+    def wait_for_version(self, since: int, timeout: float) -> int:
+        """
+        长轮询：阻塞直到版本号不等于 since 或超时。
+        (版本号小于 since 说明服务已重启，同样视为有变化)
+
+        Returns:
+            当前版本号 (超时时可能仍等于 since)
+        """
+        with self.version_condition:
+            self.version_condition.wait_for(lambda: self.version != since, timeout=timeout)
+            return self.version
+
+    # =========================
+    # 相机与检测 (单写者：相机线程 / 处理循环)
+    # =========================
+    def update_frame(self, frame: np.ndarray, ts: float, jpg: Optional[bytes] = None) -> int:
+        """
+        更新最新的相机帧数据。
+
+        Returns:
+            新帧的序号
+        """
+        seq = self.frame.seq + 1
+        snap = FrameSnapshot(raw=frame, ts=ts, shape=frame.shape[:2], jpg=jpg, seq=seq)
+        self.frame = snap
+        self.recent_frames.push(snap)
+        return seq
 
     def get_frame(self):
         """获取当前最新的帧及其时间戳"""
-        with self.lock:
-            return self.latest_raw_frame, self.latest_raw_ts
+        snap = self.frame
+        return snap.raw, snap.ts
+
+    def get_best_frame(self):
+        """获取最近一小段时间内最清晰的帧及其时间戳 (交给 VLM 的画面，避开运动模糊的帧)"""
+        snap = self.recent_frames.best()
+        if snap is None:
+            return None, 0.0
+        return snap.raw, snap.ts
 
     def heartbeat(self):
-        """纯心跳更新，用于在无相机帧时告知前端服务仍在线"""
-        with self.lock:
-            self.latest_ts = time.time()
-
-    def update_detection(self, 
-                       boxes: List[Dict[str, Any]], 
-                       infer_ms: float, 
-                       fps: float, 
-                       delay: float, 
-                       jpg: bytes):
-        """更新推理结果和 HUD 画面"""
-        with self.lock:
-            self.latest_ts = time.time()
-            self.latest_boxes = boxes
-            self.latest_count = len(boxes)
-            self.latest_infer_ms = infer_ms
-            self.latest_fps_infer = fps
-            self.latest_delay_ms = delay
-            self.latest_frame_jpg = jpg
-            self.frame_condition.notify_all()
+        """纯心跳更新，用于在无相机帧时告知前端服务仍在线 (不改变版本号，长轮询超时即视为在线)"""
+        self.latest_ts = time.time()
+
+    def update_detection(self,
+                       boxes: List[Dict[str, Any]],
+                       infer_ms: float,
+                       fps: float,
+                       delay: float,
+                       frame_seq: int = 0):
+        """更新推理结果 (frame_seq 为检测所用帧的序号)"""
+        now = time.time()
+        self.detection = DetectionSnapshot(
+            boxes=tuple(boxes), infer_ms=infer_ms, fps=fps,
+            delay_ms=delay, ts=now, frame_seq=frame_seq
+        )
+        self.latest_ts = now
+        self._bump_version()
+
+    def get_detection(self):
+        """获取最新检测结果、帧分辨率 (H, W) 及检测时间戳"""
+        det = self.detection
+        return list(det.boxes), self.frame.shape, det.ts
 
     def update_alert(self, level: int, text: str, target: Optional[Dict[str, Any]], should_notify: bool):
         """更新经过去抖动处理后的稳定警报状态"""
-        with self.lock:
-            self.latest_alert_level = level
-            self.latest_alert_text = text
-            self.latest_alert_target = target
-            self.latest_should_notify = should_notify
+        alert = AlertSnapshot(level=level, text=text, target=target, should_notify=should_notify)
+        if alert == self.alert:
+            return
+        self.alert = alert
+        self._bump_version()
 
     def update_audio_status(self, ok: bool, ts: float):
         """更新音频发送的健康状态"""
-        with self.lock:
-            self.last_send_ok = ok
-            if ok:
-                self.last_send_ts = ts
+        prev = self.audio
+        self.audio = AudioSnapshot(last_send_ts=ts if ok else prev.last_send_ts, last_send_ok=ok)
+        self._bump_version()
 
+    # =========================
+    # 语音助手 (多写者：语音线程 / Omni 回调)
+    # =========================
     def update_voice_state(self, status: Optional[str] = None):
         """更新语音助手状态"""
+        if not status:
+            return
         with self.lock:
-            if status:
-                self.latest_voice_status = status
+            if status == self.voice.status:
+                return
+            self.voice = replace(self.voice, status=status)
+        self._bump_version()
 
     def add_voice_log(self, role: str, content: str):
         """添加一条语音交互记录"""
+        entry = {"role": role, "content": content, "ts": time.time()}
         with self.lock:
             # 只保留最近 10 条记录
-            if len(self.latest_voice_log) >= 10:
-                self.latest_voice_log.pop(0)
-            self.latest_voice_log.append({
-                "role": role,
-                "content": content,
-                "ts": time.time()
-            })
+            self.voice = replace(self.voice, log=(self.voice.log + (entry,))[-10:])
+        self._bump_version()
 
     # =========================
-    # 寻物模式控制方法
+    # 寻物模式控制方法 (多写者：语音线程 / 处理循环)
     # =========================
     def start_search(self, target_class: str, label: str):
         """进入寻物模式"""
         with self.lock:
-            self.search_mode = True
-            self.search_target_class = target_class
-            self.search_target_label = label
-            self.search_last_beep_ts = 0.0
-            self.search_target_info = None
-            print(f"[SearchMode] 开始寻找: {label} -> {target_class}")
+            self.search = SearchSnapshot(active=True, target_class=target_class,
+                                         target_label=label, started_ts=time.time())
+        self._bump_version()
+        print(f"[SearchMode] 开始寻找: {label} -> {target_class}")
 
     def stop_search(self):
         """退出寻物模式"""
         with self.lock:
-            self.search_mode = False
-            self.search_target_class = ""
-            self.search_target_label = ""
-            self.search_target_info = None
-            print("[SearchMode] 寻物模式已关闭")
-
-    def update_search_target(self, info: Optional[Dict[str, Any]]):
-        """更新目标位置信息"""
+            self.search = SearchSnapshot()
+        self._bump_version()
+        print("[SearchMode] 寻物模式已关闭")
+
+    def update_search_target(self, info: Optional[Dict[str, Any]], started_ts: Optional[float] = None):
+        """
+        更新目标位置信息。
+
+        Args:
+            info: 目标位置信息
+            started_ts: 调用方读取到的寻物开始时间；与当前不一致说明寻物已结束或换了目标，忽略本次更新
+        """
         with self.lock:
-            self.search_target_info = info
+            if not self.search.active:
+                return
+            if started_ts is not None and started_ts != self.search.started_ts:
+                return
+            if info == self.search.target_info:
+                return
+            self.search = replace(self.search, target_info=info)
+        self._bump_version()
 
     def get_search_state(self) -> Dict[str, Any]:
         """获取寻物模式状态"""
-        with self.lock:
-            return {
-                "active": self.search_mode,
-                "target_class": self.search_target_class,
-                "target_label": self.search_target_label,
-                "target_info": self.search_target_info
-            }
+        search = self.search
+        return {
+            "active": search.active,
+            "target_class": search.target_class,
+            "target_label": search.target_label,
+            "target_info": search.target_info
+        }
 
     def get_ui_data(self) -> Dict[str, Any]:
         """打包前端 UI 所需的所有状态数据"""
-        with self.lock:
-            return {
-                "ts": self.latest_ts,
-                "shape": {"h": self.latest_shape[0], "w": self.latest_shape[1]},
-                "count": self.latest_count,
-                "infer_ms": self.latest_infer_ms,
-                "fps_infer": self.latest_fps_infer,
-                "delay_ms": self.latest_delay_ms,
-                "alert_level": self.latest_alert_level,
-                "alert_text": self.latest_alert_text,
-                "alert_target": self.latest_alert_target,
-                "should_notify": self.latest_should_notify,
-                "last_send_ts": self.last_send_ts,
-                "last_send_ok": self.last_send_ok,
-                # Voice Data
-                "voice_status": self.latest_voice_status,
-                "voice_log": self.latest_voice_log,
-                # Search Mode Data
-                "search_mode": self.search_mode,
-                "search_target": self.search_target_label,
-                "search_info": self.search_target_info
-            }
+        # 先读版本号再读快照：数据至少与版本号一样新，客户端最多重复收到一次
+        version = self.version
+        frame, det, alert, audio = self.frame, self.detection, self.alert, self.audio
+        voice, search = self.voice, self.search
+        return {
+            "version": version,
+            "ts": self.latest_ts,
+            "shape": {"h": frame.shape[0], "w": frame.shape[1]},
+            "count": det.count,
+            "infer_ms": det.infer_ms,
+            "fps_infer": det.fps,
+            "delay_ms": det.delay_ms,
+            "alert_level": alert.level,
+            "alert_text": alert.text,
+            "alert_target": alert.target,
+            "should_notify": alert.should_notify,
+            "last_send_ts": audio.last_send_ts,
+            "last_send_ok": audio.last_send_ok,
+            # Voice Data
+            "voice_status": voice.status,
+            "voice_log": list(voice.log),
+            # Search Mode Data
+            "search_mode": search.active,
+            "search_target": search.target_label,
+            "search_info": search.target_info
+        }
@@ -0,0 +1,186 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 每条增量消息都携带的字段
+_ALWAYS_KEYS = ("version", "ts")
+
+
+def dumps(data: Dict[str, Any]) -> bytes:
+    """序列化为 UTF-8 JSON 字节串 (安装了 orjson 时使用 orjson)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def ui_delta(prev: Optional[Dict[str, Any]], curr: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    计算两份 UI 数据 (`AppState.get_ui_data()`) 之间的增量。
+
+    Args:
+        prev: 客户端上次收到的完整数据；为 None 时返回完整数据
+        curr: 当前完整数据
+
+    Returns:
+        只包含发生变化字段的字典 (始终包含 version 与 ts)
+    """
+    if prev is None:
+        return dict(curr)
+    delta = {k: v for k, v in curr.items() if k in _ALWAYS_KEYS or prev.get(k) != v}
+    return delta
+
+
+def has_changes(delta: Dict[str, Any]) -> bool:
+    """增量中是否有除 version/ts 以外的实际变化"""
+    return any(k not in _ALWAYS_KEYS for k in delta)
+
+
+def format_sse(event: str, version: int, body: bytes) -> bytes:
+    """将已序列化的 JSON 格式化为一条 Server-Sent Events 消息"""
+    return b"event: " + event.encode() + b"\nid: " + str(version).encode() + b"\ndata: " + body + b"\n\n"
+
+
+def _box(b: Optional[Dict[str, Any]]) -> Optional[list]:
+    """边界框压缩为 [x1, y1, x2, y2] 整数数组"""
+    if not b:
+        return None
+    return [int(b["x1"]), int(b["y1"]), int(b["x2"]), int(b["y2"])]
+
+
+def overlay_payload(state) -> Dict[str, Any]:
+    """
+    构建前端叠加绘制所需的紧凑数据 (按帧序号对齐)。
+
+    字段: seq 帧序号, w/h 画面尺寸, b 检测框 [[x1, y1, x2, y2, label, conf], ...],
+    lv 警报等级, at 警报目标框, st 寻物目标框, fps/inf/dl 指标
+    """
+    det, frame, alert, search = state.detection, state.frame, state.alert, state.search
+    h, w = frame.shape
+    search_box = search.target_info.get("box") if search.active and search.target_info else None
+    return {
+        "seq": det.frame_seq,
+        "w": w,
+        "h": h,
+        "b": [_box(b) + [b["label"], round(b["conf"], 2)] for b in det.boxes],
+        "lv": alert.level,
+        "at": _box(alert.target),
+        "st": _box(search_box),
+        "fps": round(det.fps, 1),
+        "inf": round(det.infer_ms, 1),
+        "dl": round(det.delay_ms, 1),
+    }
+
+
+class PayloadCache:
+    """
+    HUD 数据的预序列化缓存：每个状态版本只调用一次 get_ui_data() 并序列化一次，
+    /detect、长轮询与 /events 推送的所有客户端共享同一份字节串。
+    推送增量按 (起始版本 -> 当前版本) 缓存，落后同样版本数的客户端共用一份。
+    """
+
+    def __init__(self, state, history: int = 8):
+        """
+        Args:
+            state: AppState 实例
+            history: 保留最近多少个版本的完整数据用于计算增量
+        """
+        self.state = state
+        self.history = history
+        self._lock = threading.Lock()
+
+        self._version = -1
+        self._body = b""                    # 当前版本的完整 JSON
+        self._snapshot_event: Optional[bytes] = None
+        self._datas: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # version -> 完整数据
+        self._delta_events: Dict[int, bytes] = {}  # 起始版本 -> 当前版本的增量消息 (b"" 表示无变化)
+
+        self._overlay_seq = -1
+        self._overlay_event = b""
+
+        self._stats = {"serializations": 0, "hits": 0}
+
+    def _refresh(self) -> None:
+        """状态版本号变化时重新生成并序列化 (需在锁内调用)"""
+        if self.state.version == self._version:
+            self._stats["hits"] += 1
+            return
+        data = self.state.get_ui_data()
+        version = data["version"]
+        if version == self._version:
+            self._stats["hits"] += 1
+            return
+        self._version = version
+        self._body = dumps(data)
+        self._snapshot_event = None
+        self._delta_events.clear()
+        self._datas[version] = data
+        while len(self._datas) > self.history:
+            self._datas.popitem(last=False)
+        self._stats["serializations"] += 1
+
+    def current(self) -> Tuple[int, bytes]:
+        """获取当前版本号及完整 JSON 字节串"""
+        with self._lock:
+            self._refresh()
+            return self._version, self._body
+
+    def snapshot_event(self) -> Tuple[int, bytes]:
+        """获取当前版本的完整快照 SSE 消息 (event: snapshot)"""
+        with self._lock:
+            self._refresh()
+            if self._snapshot_event is None:
+                self._snapshot_event = format_sse("snapshot", self._version, self._body)
+            return self._version, self._snapshot_event
+
+    def delta_event(self, since: int) -> Tuple[int, bytes]:
+        """
+        获取从 since 版本到当前版本的 SSE 消息。
+
+        Returns:
+            (当前版本号, 消息字节串)；没有实际变化时为 b""，
+            since 已超出保留历史时返回完整快照消息
+        """
+        with self._lock:
+            self._refresh()
+            if since == self._version:
+                return self._version, b""
+            msg = self._delta_events.get(since)
+            if msg is None:
+                prev = self._datas.get(since)
+                if prev is None:
+                    if self._snapshot_event is None:
+                        self._snapshot_event = format_sse("snapshot", self._version, self._body)
+                    return self._version, self._snapshot_event
+                delta = ui_delta(prev, self._datas[self._version])
+                msg = format_sse("delta", self._version, dumps(delta)) if has_changes(delta) else b""
+                self._delta_events[since] = msg
+                self._stats["serializations"] += 1
+            else:
+                self._stats["hits"] += 1
+            return self._version, msg
+
+    def overlay_event(self) -> Tuple[int, bytes]:
+        """获取最新检测结果的叠加数据 SSE 消息 (event: overlay)，每个检测帧只序列化一次"""
+        with self._lock:
+            seq = self.state.detection.frame_seq
+            if seq != self._overlay_seq:
+                self._overlay_seq = seq
+                self._overlay_event = format_sse("overlay", seq, dumps(overlay_payload(self.state)))
+                self._stats["serializations"] += 1
+            else:
+                self._stats["hits"] += 1
+            return self._overlay_seq, self._overlay_event
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取序列化统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["serializer"] = "orjson" if ORJSON_AVAILABLE else "json"
+        return stats
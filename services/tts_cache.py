@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any
+from . import config
+
+
+class TTSCache:
+    """
+    TTS 短语缓存：以 (文本, 音色, 格式) 的哈希为键，保存可直接发送的 PCM 数据。
+    内存中维护 LRU，磁盘上持久化 (重启后依然有效，云端不可用时也能播放)。
+    磁盘总量超过 max_disk_bytes 时按文件 mtime (读取命中时刷新) 淘汰最久未用的短语。
+    """
+
+    def __init__(self, cache_dir: Path = config.TTS_CACHE_DIR, max_items: int = config.TTS_CACHE_MEMORY_ITEMS,
+                 max_disk_bytes: int = config.TTS_CACHE_DISK_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+        self._disk_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*.pcm"))
+        self._evict_disk()
+
+    @staticmethod
+    def key(text: str, voice: str, fmt: str = config.TTS_FORMAT) -> str:
+        """内容寻址键"""
+        return hashlib.sha1(f"{voice}|{fmt}|{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pcm"
+
+    def get(self, text: str, voice: str, fmt: str = config.TTS_FORMAT) -> Optional[bytes]:
+        """查询缓存，先查内存再查磁盘；未命中返回 None"""
+        k = self.key(text, voice, fmt)
+        with self._lock:
+            pcm = self._memory.get(k)
+            if pcm is not None:
+                self._memory.move_to_end(k)
+                self._stats["memory_hits"] += 1
+                return pcm
+
+        path = self._path(k)
+        try:
+            pcm = path.read_bytes()
+            os.utime(path)  # 刷新最近使用时间 (磁盘 LRU)
+        except OSError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._remember(k, pcm)
+            self._stats["disk_hits"] += 1
+        return pcm
+
+    def contains(self, text: str, voice: str, fmt: str = config.TTS_FORMAT) -> bool:
+        """是否已缓存 (不计入命中统计)"""
+        k = self.key(text, voice, fmt)
+        with self._lock:
+            if k in self._memory:
+                return True
+        return self._path(k).exists()
+
+    def put(self, text: str, voice: str, pcm: bytes, fmt: str = config.TTS_FORMAT) -> None:
+        """写入缓存 (内存 + 磁盘，磁盘写入为原子替换)"""
+        if not pcm:
+            return
+        k = self.key(text, voice, fmt)
+        path = self._path(k)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            old = path.stat().st_size if path.exists() else 0
+            tmp.write_bytes(pcm)
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_bytes += len(pcm) - old
+        except OSError as e:
+            print(f"[TTSCache] 写入磁盘失败: {e}")
+        with self._lock:
+            self._remember(k, pcm)
+            self._stats["writes"] += 1
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """磁盘总量超过上限时，按 mtime 从旧到新删除，直到低于上限"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        files = []
+        for p in self.cache_dir.glob("*.pcm"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort(key=lambda f: f[0])
+        with self._lock:
+            self._disk_bytes = sum(size for _, size, _ in files)
+            for _, size, p in files:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+                self._disk_bytes -= size
+                self._stats["evicted"] += 1
+
+    def _remember(self, k: str, pcm: bytes) -> None:
+        """放入内存 LRU (调用方持有锁)"""
+        self._memory[k] = pcm
+        self._memory.move_to_end(k)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+            return stats
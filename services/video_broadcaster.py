@@ -0,0 +1,312 @@
+import asyncio
+import itertools
+import threading
+import time
+from typing import Dict, Any, AsyncIterator, Iterator, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+from . import config
+
+
+# 直通档位：原样转发相机 JPEG，不做标注与重新编码 (框与 HUD 由前端叠加绘制)
+RAW_PROFILE = "raw"
+
+
+def make_chunk(jpg: bytes, seq: Optional[int] = None) -> bytes:
+    """将 JPEG 包装为一段 multipart/x-mixed-replace 数据 (可附带帧序号头 X-Frame-Seq)"""
+    seq_header = b"X-Frame-Seq: " + str(seq).encode() + b"\r\n" if seq is not None else b""
+    return (b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n" + seq_header +
+            b"Content-Length: " + str(len(jpg)).encode() + b"\r\n\r\n" +
+            jpg + b"\r\n")
+
+
+def resolve_profile(name: Optional[str] = None, kbps: Optional[float] = None) -> str:
+    """
+    根据请求参数选择视频档位。
+
+    Args:
+        name: 客户端指定的档位名 (low / mid / high / raw)，优先使用
+        kbps: 客户端上报的可用带宽，选择估算码率不超过该带宽的最高档位
+
+    Returns:
+        档位名 (未知或缺省时为默认档位)
+    """
+    if name in config.VIDEO_PROFILES or name == RAW_PROFILE:
+        return name
+    if kbps is not None:
+        fitting = [p for p, cfg in config.VIDEO_PROFILES.items() if cfg["kbps"] <= kbps]
+        if fitting:
+            return max(fitting, key=lambda p: config.VIDEO_PROFILES[p]["kbps"])
+        return min(config.VIDEO_PROFILES, key=lambda p: config.VIDEO_PROFILES[p]["kbps"])
+    return config.VIDEO_DEFAULT_PROFILE
+
+
+def encode_variant(img: np.ndarray, profile: str) -> bytes:
+    """按档位缩放 (只缩小不放大) 并编码为 JPEG"""
+    cfg = config.VIDEO_PROFILES[profile]
+    max_width = cfg["max_width"]
+    h, w = img.shape[:2]
+    if max_width and w > max_width:
+        img = cv2.resize(img, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), cfg["quality"]])
+    return buf.tobytes() if ok else b""
+
+
+def _placeholder_chunk() -> bytes:
+    """生成"等待连接"占位图 (只编码一次)"""
+    placeholder = np.zeros((320, 320, 3), dtype=np.uint8)
+    cv2.putText(placeholder, "WAITING FOR CAMERA...", (20, 160),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    _, buf = cv2.imencode(".jpg", placeholder)
+    return make_chunk(buf.tobytes())
+
+
+class _Client:
+    """单个观看者：一格邮箱，只保存最新的一帧"""
+
+    def __init__(self, client_id: int, profile: str):
+        self.id = client_id
+        self.profile = profile
+        self.connected_ts = time.time()
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._slot: Optional[Tuple[bytes, float]] = None  # (chunk, 发布时间)
+
+        # 统计
+        self.sent = 0
+        self.dropped = 0       # 未来得及发送就被新帧覆盖的帧数
+        self.lag_ms = 0.0      # 最近一帧从发布到取出的延迟
+        self.lag_max_ms = 0.0
+
+    def put(self, chunk: bytes, ts: float) -> None:
+        with self._lock:
+            if self._slot is not None:
+                self.dropped += 1
+            self._slot = (chunk, ts)
+        self._wake()
+
+    def _wake(self) -> None:
+        self._event.set()
+
+    def take(self, timeout: float) -> Optional[bytes]:
+        """取出最新帧；超时返回 None"""
+        if not self._event.wait(timeout):
+            return None
+        return self._pop()
+
+    def _pop(self) -> Optional[bytes]:
+        with self._lock:
+            item, self._slot = self._slot, None
+            self._event.clear()
+        if item is None:
+            return None
+        chunk, ts = item
+        self.lag_ms = (time.time() - ts) * 1000.0
+        self.lag_max_ms = max(self.lag_max_ms, self.lag_ms)
+        self.sent += 1
+        return chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "profile": self.profile,
+            "connected_s": round(time.time() - self.connected_ts, 1),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag_ms": round(self.lag_ms, 1),
+            "lag_max_ms": round(self.lag_max_ms, 1),
+        }
+
+
+class _AsyncClient(_Client):
+    """
+    异步服务器中的观看者：邮箱相同，但由事件循环中的协程等待。
+    发布者线程通过 call_soon_threadsafe 唤醒协程，不为每个观看者占用线程。
+    """
+
+    def __init__(self, client_id: int, profile: str, loop: asyncio.AbstractEventLoop):
+        super().__init__(client_id, profile)
+        self._loop = loop
+        self._aevent = asyncio.Event()
+
+    def _wake(self) -> None:
+        self._event.set()
+        try:
+            self._loop.call_soon_threadsafe(self._aevent.set)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    async def atake(self, timeout: float) -> Optional[bytes]:
+        """取出最新帧；超时返回 None"""
+        deadline = self._loop.time() + timeout
+        while True:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._aevent.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            self._aevent.clear()
+            chunk = self._pop()
+            if chunk is not None:
+                return chunk
+            # 上一次取帧时已取走 (唤醒滞后到达)，继续等待
+
+
+class MJPEGBroadcaster:
+    """
+    MJPEG 扇出广播器：每帧每个档位只编码、构建一次 multipart 数据，分发到各观看者的一格邮箱。
+    只有存在订阅者的档位才会被编码；慢客户端直接丢弃旧帧而不会拖慢处理循环或其他客户端；
+    占位图全局只编码一次。
+    """
+
+    def __init__(self, timeout: float = 0.5):
+        """
+        Args:
+            timeout: 客户端等待新帧的超时 (秒)，超时后重发最近一帧或占位图保持连接
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._clients: Dict[int, _Client] = {}
+        self._ids = itertools.count(1)
+        self._latest: Dict[str, bytes] = {}   # 档位 -> 最近一帧 multipart 数据
+        self._placeholder: Optional[bytes] = None
+        self._encodes = {p: 0 for p in config.VIDEO_PROFILES}
+
+        # HUD 渲染统计 (标注 + 绘制 + 编码)
+        self._rendered = 0
+        self._skipped = 0
+        self._render_ms_avg = 0.0     # 渲染耗时的指数滑动平均
+
+    @property
+    def placeholder(self) -> bytes:
+        if self._placeholder is None:
+            self._placeholder = _placeholder_chunk()
+        return self._placeholder
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    @property
+    def wants_frames(self) -> bool:
+        """是否有需要服务端 HUD 画面的观看者；没有时处理循环可跳过 HUD 渲染与编码"""
+        with self._lock:
+            return any(c.profile != RAW_PROFILE for c in self._clients.values())
+
+    def active_profiles(self) -> Set[str]:
+        """当前需要编码的档位 (有订阅者的档位)"""
+        with self._lock:
+            return {c.profile for c in self._clients.values() if c.profile != RAW_PROFILE}
+
+    def record_render(self, ms: float) -> None:
+        """记录一次 HUD 渲染 (标注 + 绘制 + 编码) 的耗时"""
+        self._rendered += 1
+        alpha = 0.1 if self._rendered > 1 else 1.0
+        self._render_ms_avg += alpha * (ms - self._render_ms_avg)
+
+    def record_skip(self) -> None:
+        """记录一次因无人观看而跳过的 HUD 渲染"""
+        self._skipped += 1
+
+    def publish_frame(self, img: np.ndarray) -> Dict[str, bytes]:
+        """
+        编码并发布一帧 HUD 图像：每个有订阅者的档位编码一次。
+
+        Returns:
+            本帧各档位的 JPEG 数据 (没有订阅者的档位不编码)
+        """
+        jpgs = {}
+        for profile in self.active_profiles():
+            jpgs[profile] = encode_variant(img, profile)
+            self._encodes[profile] += 1
+        for profile, jpg in jpgs.items():
+            self.publish(jpg, profile)
+        return jpgs
+
+    def publish(self, jpg: bytes, profile: Optional[str] = None, seq: Optional[int] = None) -> None:
+        """发布一帧已编码的 JPEG 到指定档位"""
+        profile = profile or config.VIDEO_DEFAULT_PROFILE
+        chunk = make_chunk(jpg, seq)
+        now = time.time()
+        with self._lock:
+            self._latest[profile] = chunk
+            clients = [c for c in self._clients.values() if c.profile == profile]
+        for client in clients:
+            client.put(chunk, now)
+
+    def publish_raw(self, jpg: bytes, seq: int) -> None:
+        """直通发布相机原始 JPEG (由相机线程调用，无直通观看者时不做任何事)"""
+        with self._lock:
+            if not any(c.profile == RAW_PROFILE for c in self._clients.values()):
+                return
+        self.publish(jpg, RAW_PROFILE, seq)
+
+    def subscribe(self, profile: Optional[str] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> _Client:
+        """登记一个观看者；传入事件循环时创建由协程等待的异步观看者"""
+        profile = profile or config.VIDEO_DEFAULT_PROFILE
+        if loop is not None:
+            client = _AsyncClient(next(self._ids), profile, loop)
+        else:
+            client = _Client(next(self._ids), profile)
+        with self._lock:
+            self._clients[client.id] = client
+        print(f"[Video] Client #{client.id} connected, profile={client.profile} ({self.client_count} total)")
+        return client
+
+    def unsubscribe(self, client: _Client) -> None:
+        with self._lock:
+            self._clients.pop(client.id, None)
+            # 档位无人订阅后丢弃其最近一帧，避免新订阅者收到过期画面
+            if not any(c.profile == client.profile for c in self._clients.values()):
+                self._latest.pop(client.profile, None)
+        print(f"[Video] Client #{client.id} disconnected, sent={client.sent} dropped={client.dropped}")
+
+    def stream(self, profile: Optional[str] = None) -> Iterator[bytes]:
+        """单个客户端的 multipart 生成器，断开时自动注销"""
+        client = self.subscribe(profile)
+        try:
+            # 先发送最近一帧 (或占位图)，避免新客户端等待下一帧
+            yield self._latest.get(client.profile) or self.placeholder
+            while True:
+                chunk = client.take(self.timeout)
+                if chunk is None:
+                    # 超时：重发最近一帧或占位图，保持连接
+                    chunk = self._latest.get(client.profile) or self.placeholder
+                yield chunk
+        finally:
+            self.unsubscribe(client)
+
+    async def astream(self, profile: Optional[str] = None) -> AsyncIterator[bytes]:
+        """stream() 的异步版本，供异步服务器使用 (所有观看者共用事件循环线程)"""
+        client = self.subscribe(profile, asyncio.get_running_loop())
+        try:
+            yield self._latest.get(client.profile) or self.placeholder
+            while True:
+                chunk = await client.atake(self.timeout)
+                if chunk is None:
+                    chunk = self._latest.get(client.profile) or self.placeholder
+                yield chunk
+        finally:
+            self.unsubscribe(client)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各档位编码次数以及各客户端的发送、丢帧与延迟统计"""
+        with self._lock:
+            clients = list(self._clients.values())
+        return {
+            "clients": len(clients),
+            "encodes": dict(self._encodes),
+            "per_client": [c.get_stats() for c in clients],
+            "render": {
+                "rendered": self._rendered,
+                "skipped": self._skipped,
+                "avg_ms": round(self._render_ms_avg, 2),
+                # 按最近实际渲染耗时估算跳过渲染节省的 CPU 时间
+                "saved_ms": round(self._skipped * self._render_ms_avg, 1),
+            },
+        }
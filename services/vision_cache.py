@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, Tuple
+import cv2
+import numpy as np
+from . import config
+
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> int:
+    """
+    计算图像的差值哈希 (dHash)。
+
+    先缩小到 (hash_size+1) x hash_size 的灰度图，再比较相邻像素亮度，
+    得到 hash_size*hash_size 位的整数。画面轻微抖动/曝光变化时哈希基本不变。
+    """
+    small = cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    diff = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(diff.flatten()).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    """两个哈希值的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class VisionDescriptionCache:
+    """
+    VLM 场景描述缓存。
+    键为 (画面 dHash, Prompt, 可选的检测类别集合)，画面哈希在汉明距离阈值内即视为同一场景。
+    支持 TTL 过期与 LRU 淘汰，线程安全。
+    """
+
+    def __init__(self,
+                 max_entries: int = config.VISION_CACHE_MAX_ENTRIES,
+                 ttl: float = config.VISION_CACHE_TTL,
+                 threshold: int = config.VISION_CACHE_HAMMING):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def labels_key(labels: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+        """把检测类别整理为可比较的键 (None 表示不参与匹配)"""
+        if labels is None:
+            return None
+        return tuple(sorted(set(labels)))
+
+    def get(self, frame_hash: int, prompt: str, labels: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        查询缓存。
+
+        Returns:
+            命中时返回缓存的描述文本，否则返回 None
+        """
+        key_labels = self.labels_key(labels)
+        now = time.time()
+        with self._lock:
+            best_id, best_dist = None, self.threshold + 1
+            for entry_id, e in list(self._entries.items()):
+                if now - e["ts"] > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if e["prompt"] != prompt:
+                    continue
+                if key_labels is not None and e["labels"] is not None and e["labels"] != key_labels:
+                    continue
+                dist = hamming(e["hash"], frame_hash)
+                if dist < best_dist:
+                    best_id, best_dist = entry_id, dist
+
+            if best_id is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._hits += 1
+            return self._entries[best_id]["text"]
+
+    def put(self, frame_hash: int, prompt: str, text: str, labels: Optional[Iterable[str]] = None) -> None:
+        """写入一条描述，超过容量时淘汰最久未使用的条目"""
+        if not text:
+            return
+        with self._lock:
+            self._entries[self._next_id] = {
+                "hash": frame_hash,
+                "prompt": prompt,
+                "labels": self.labels_key(labels),
+                "text": text,
+                "ts": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+            }
@@ -1,17 +1,18 @@
+import threading
 import time
-import cv2
 import numpy as np
 from typing import List, Dict, Any, Tuple, Optional
 from ultralytics import YOLO
 from . import config
+from .overlay_renderer import OverlayRenderer
 
 class VisionService:
     """
     视觉服务类：负责加载模型、执行推理、计算风险等级以及绘制 HUD。
     """
-    def __init__(self):
+    def __init__(self, model_path: str = config.MODEL_PATH):
         # 加载 YOLO 模型
-        self.model = YOLO(config.MODEL_PATH)
+        self.model = YOLO(model_path)
         
         # 检测 CUDA 可用性
         import torch
@@ -24,6 +25,15 @@ class VisionService:
         dummy = np.zeros((config.IMG_SIZE, config.IMG_SIZE, 3), dtype=np.uint8)
         self.model.predict(dummy, imgsz=config.IMG_SIZE, verbose=False, half=self.use_half)
 
+        # 类名 -> 类别编号 (寻物精搜按类别过滤)
+        self.class_ids = {name: cls for cls, name in self.model.names.items()}
+        # 轻量 HUD 渲染器 (复用输出缓冲区、缓存标签文本尺寸)，框颜色与 ultralytics 保持一致
+        self.renderer = OverlayRenderer(self.class_ids)
+
+        # ultralytics 的 predictor 不是线程安全的。多设备时批量调度线程 (predict_batch) 与
+        # 处理循环 (超出共享内存槽位的大帧回退 predict、寻物精搜 predict_region) 会同时调用，必须串行
+        self._predict_lock = threading.Lock()
+
     def predict(self, frame: np.ndarray) -> Tuple[List[Dict[str, Any]], Any]:
         """
         对输入帧执行 YOLO 推理。
@@ -36,18 +46,85 @@ class VisionService:
             r: YOLO 的原始结果对象 (Result)
             infer_ms: 推理耗时 (毫秒)
         """
-        t0 = time.time()
-        results = self.model.predict(
-            frame, 
-            imgsz=config.IMG_SIZE, 
-            conf=config.CONF_THRESHOLD, 
-            iou=config.IOU_THRESHOLD,
-            verbose=False,
-            half=self.use_half
-        )
-        infer_ms = (time.time() - t0) * 1000.0
+        with self._predict_lock:
+            t0 = time.time()
+            results = self.model.predict(
+                frame, 
+                imgsz=config.IMG_SIZE, 
+                conf=config.CONF_THRESHOLD, 
+                iou=config.IOU_THRESHOLD,
+                verbose=False,
+                half=self.use_half
+            )
+            infer_ms = (time.time() - t0) * 1000.0
         
         r = results[0]
+        return self._extract_boxes(r), r, infer_ms
+
+    def predict_batch(self, frames: List[np.ndarray]) -> Tuple[List[List[Dict[str, Any]]], float]:
+        """
+        对多路设备的帧执行一次批量推理 (单次前向)。
+
+        Args:
+            frames: 各路的原始图像 (尺寸可以不同)
+
+        Returns:
+            (每帧的检测框列表, 本批推理总耗时 ms)
+        """
+        with self._predict_lock:
+            t0 = time.time()
+            results = self.model.predict(
+                list(frames),
+                imgsz=config.IMG_SIZE,
+                conf=config.CONF_THRESHOLD,
+                iou=config.IOU_THRESHOLD,
+                verbose=False,
+                half=self.use_half
+            )
+            infer_ms = (time.time() - t0) * 1000.0
+        return [self._extract_boxes(r) for r in results], infer_ms
+
+    def predict_region(self, frame: np.ndarray, roi: Tuple[int, int, int, int], target_class: str,
+                       imgsz: int = config.SEARCH_REFINE_IMG_SIZE,
+                       conf: float = config.SEARCH_REFINE_CONF) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        对帧中的一块区域推理，只检测一个类别 (寻物精搜)。
+
+        Args:
+            frame: 原始分辨率帧
+            roi: 区域 (x1, y1, x2, y2)，像素
+            target_class: 要检测的类别 (COCO 类名)
+
+        Returns:
+            (检测框列表 (全帧坐标), 推理耗时 ms)；未知类别返回 ([], 0.0)
+        """
+        cls = self.class_ids.get(target_class)
+        if cls is None:
+            return [], 0.0
+        x1, y1, x2, y2 = roi
+        crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        with self._predict_lock:
+            t0 = time.time()
+            results = self.model.predict(
+                crop,
+                imgsz=imgsz,
+                conf=conf,
+                iou=config.IOU_THRESHOLD,
+                classes=[cls],
+                verbose=False,
+                half=self.use_half
+            )
+            infer_ms = (time.time() - t0) * 1000.0
+        boxes = self._extract_boxes(results[0])
+        for b in boxes:
+            b["x1"] += x1
+            b["x2"] += x1
+            b["y1"] += y1
+            b["y2"] += y1
+        return boxes, infer_ms
+
+    def _extract_boxes(self, r: Any) -> List[Dict[str, Any]]:
+        """将 YOLO 结果对象转换为检测框字典列表"""
         boxes = []
         if r.boxes is not None:
             xyxy = r.boxes.xyxy.cpu().numpy()
@@ -60,7 +137,7 @@ class VisionService:
                     "conf": float(c),
                     "x1": float(x1), "y1": float(y1), "x2": float(x2), "y2": float(y2),
                 })
-        return boxes, r, infer_ms
+        return boxes
 
     def compute_risk(self, boxes: List[Dict[str, Any]], w: int, h: int, prev_area: Dict[str, float]) -> Tuple[int, str, Optional[Dict[str, Any]], Dict[str, float]]:
         """
@@ -127,19 +204,21 @@ class VisionService:
         text = config.ALERT_TEXT.get(best["level"], "") if best else ""
         return (best["level"] if best else 0), text, best, curr_area
 
-    def draw_hud(self, annotated: np.ndarray, fps: float, delay: float, count: int, level: int, text: str) -> bytes:
+    def new_renderer(self) -> OverlayRenderer:
+        """为另一个处理循环 (如多设备会话) 创建独立的渲染器，各自复用自己的缓冲区"""
+        return OverlayRenderer(self.renderer.class_ids)
+
+    def render_overlay(self, frame: np.ndarray, boxes: List[Dict[str, Any]], fps: float, delay: float,
+                       level: int, search_box: Optional[Dict[str, Any]] = None,
+                       renderer: Optional[OverlayRenderer] = None) -> np.ndarray:
         """
-        在图像上绘制 HUD 信息 (FPS, 延迟, 警报) 并编码为 JPEG。
+        使用轻量渲染器绘制 HUD 画面 (关注类别检测框、寻物目标与 HUD 文本)，替代 r.plot() + 逐帧 putText。
+        返回的图像为复用缓冲区，需在下一帧渲染前完成编码。
+
+        Args:
+            renderer: 调用方自己的渲染器 (见 new_renderer)；为空时使用默认渲染器
         """
-        cv2.putText(annotated, f"FPS: {fps:.1f}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(annotated, f"Delay: {delay:.0f} ms", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(annotated, f"Count: {count}", (10, 75), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        if level > 0:
-            cv2.putText(annotated, f"ALERT L{level}", (10, 105), cv2.FONT_HERSHEY_SIMPLEX, 0.85, (0, 0, 255), 2)
-            # 注意: OpenCV 默认不支持中文，中文警报文本在前端显示
-        
-        ok, buf = cv2.imencode(".jpg", annotated, [int(cv2.IMWRITE_JPEG_QUALITY), config.JPEG_QUALITY])
-        return buf.tobytes() if ok else b""
+        return (renderer or self.renderer).render(frame, boxes, fps, delay, level, search_box)
 
     def locate_target(self, boxes: List[Dict[str, Any]], target_class: str, w: int, h: int) -> Optional[Dict[str, Any]]:
         """
@@ -6,22 +6,30 @@ import asyncio
 import queue
 import edge_tts
 import cv2
+import numpy as np
 import base64
+import wave
+import tempfile
 from http import HTTPStatus
 from pathlib import Path
 from openai import OpenAI
 from PIL import Image
-from typing import Optional
+from typing import Optional, Callable, List, Tuple
 
 from . import config
 from .state import AppState
 from .audio_service import AudioService
+from .scene_summary import SceneSummarizer
+from .speculation import SpeculationPolicy, SpeculativeRequest
+from .vision_cache import VisionDescriptionCache, dhash
+from .tts_cache import TTSCache
+from .reply_stream import ReplyStream
 import re
 
 # 阿里云 DashScope ASR
 try:
     import dashscope
-    from dashscope.audio.asr import Recognition
+    from dashscope.audio.asr import Recognition, RecognitionCallback, RecognitionResult
     # Qwen-TTS-Realtime imports
     from dashscope.audio.qwen_tts_realtime import QwenTtsRealtime, QwenTtsRealtimeCallback, AudioFormat
     DASHSCOPE_ASR_AVAILABLE = True
@@ -71,11 +79,77 @@ if DASHSCOPE_ASR_AVAILABLE:
         def wait_for_finished(self, timeout: int = 10) -> bool:
             return self.complete_event.wait(timeout)
 
+    class _PartialASRCallback(RecognitionCallback):
+        """流式识别回调：累积识别文本，并把部分识别结果转发给投机策略"""
+        def __init__(self, on_partial: Optional[Callable[[str], None]] = None):
+            super().__init__()
+            self.on_partial = on_partial
+            self.sentences = []  # 已结束的句子
+            self.partial = ""    # 当前未结束的句子
+            self.error_msg = None
+
+        @property
+        def text(self) -> str:
+            return ''.join(self.sentences) + self.partial
+
+        def on_event(self, result) -> None:
+            sentence = result.get_sentence()
+            if not isinstance(sentence, dict):
+                return
+            if RecognitionResult.is_sentence_end(sentence):
+                self.sentences.append(sentence.get('text', ''))
+                self.partial = ""
+            else:
+                self.partial = sentence.get('text', '')
+            if self.on_partial:
+                try:
+                    self.on_partial(self.text)
+                except Exception as e:
+                    print(f"[Speculation] Partial callback error: {e}")
+
+        def on_error(self, result) -> None:
+            self.error_msg = getattr(result, 'message', str(result))
+
 class VoiceAssistant:
-    def __init__(self, state: AppState, audio_svc: AudioService):
+    def __init__(self, state: AppState, audio_svc: AudioService, share_with: Optional["VoiceAssistant"] = None,
+                 camera_link=None):
+        """
+        Args:
+            state: 所属设备的状态
+            audio_svc: 所属设备的音频服务
+            share_with: 同一进程中已有的语音助手；给定时共用其 API 客户端、线程池、VLM 描述缓存与
+                        TTS 短语缓存 (多设备会话)，只为本设备新建状态相关的部分
+            camera_link: 所属设备的相机控制通道 (CameraLink)，设备在线时为视觉请求拍摄高清快照
+        """
         self.state = state
         self.audio = audio_svc
-        
+
+        # 高清快照 (每台设备同一时间只拍一张)
+        self.camera_link = camera_link
+        self._snapshot_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="hq-snapshot")
+        self.hq_stats = {"requested": 0, "used": 0, "fallback": 0, "skipped": 0}
+
+        # 使用线程安全的队列替代列表
+        self.process_queue = queue.Queue()
+
+        # 本地场景摘要 (YOLO 检测结果快速回答)
+        self.scene = SceneSummarizer()
+
+        # 投机视觉请求策略 (根据部分识别文本启动/取消 VLM)
+        self.speculation = SpeculationPolicy()
+        # 正在进行的 VLM 任务 -> 流式回复通道
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+
+        if share_with is not None:
+            self.client = share_with.client
+            self.model_name = getattr(share_with, "model_name", None)
+            self.executor = share_with.executor
+            self.vision_cache = share_with.vision_cache
+            self.tts_cache = share_with.tts_cache
+            threading.Thread(target=self._worker, daemon=True).start()
+            return
+
         # 配置 OpenAI (用于视觉推理)
         api_key = os.getenv("OPENAI_API_KEY")
         base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -94,12 +168,17 @@ class VoiceAssistant:
             self.client = None
             print("VoiceAssistant: WARNING - OPENAI_API_KEY not found. AI features disabled.")
 
-        # 使用线程安全的队列替代列表
-        self.process_queue = queue.Queue()
-        
         # 线程池用于并发执行 Vision 请求
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
 
+        # VLM 描述缓存 (感知哈希 + Prompt)
+        self.vision_cache = VisionDescriptionCache()
+
+        # TTS 短语缓存 (固定提示语零网络延迟播放)
+        self.tts_cache = TTSCache()
+        if config.TTS_PREWARM:
+            threading.Thread(target=self._prewarm_tts_cache, daemon=True).start()
+
         # 启动处理线程
         threading.Thread(target=self._worker, daemon=True).start()
 
@@ -121,8 +200,17 @@ class VoiceAssistant:
             self._process_audio(target_wav)
             self.process_queue.task_done()
 
-    def _recognize_with_aliyun(self, wav_path: Path) -> str:
-        """使用阿里云 Paraformer 进行语音识别"""
+    def _recognize_with_aliyun(self, wav_path: Path, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """
+        使用阿里云 Paraformer 进行语音识别。
+
+        Args:
+            wav_path: 录音文件
+            on_partial: 部分识别结果回调；提供时使用流式识别，边识别边回调
+        """
+        if on_partial is not None:
+            return self._recognize_streaming(wav_path, on_partial)
+
         recognition = Recognition(
             model='paraformer-realtime-v2',
             format='wav',
@@ -147,16 +235,131 @@ class VoiceAssistant:
             print(f"Aliyun ASR Error: {result.message}")
         return ""
 
-    def _generate_vision_description(self, frame, prompt: str = "直接描述画面前方的内容，不要包含'这张图片'、'视角'等开场白，不要解释画面质量。重点关注障碍物、人和文字。直接说结果。50字以内。") -> Optional[str]:
-        """后台执行的视觉分析任务"""
+    def _recognize_streaming(self, wav_path: Path, on_partial: Callable[[str], None]) -> str:
+        """流式识别：按 100ms 分片推送录音，部分识别结果实时回调"""
+        with wave.open(str(wav_path), 'rb') as wf:
+            pcm = wf.readframes(wf.getnframes())
+
+        callback = _PartialASRCallback(on_partial)
+        recognition = Recognition(
+            model='paraformer-realtime-v2',
+            format='pcm',
+            sample_rate=16000,
+            language_hints=['zh', 'en'],
+            callback=callback
+        )
+        recognition.start()
+        chunk = 3200  # 100ms @ 16kHz 16bit
+        for i in range(0, len(pcm), chunk):
+            recognition.send_audio_frame(pcm[i:i + chunk])
+        recognition.stop()
+
+        if callback.error_msg:
+            print(f"Aliyun ASR Error: {callback.error_msg}")
+        return callback.text
+
+    def _generate_vision_description(self, frame, prompt: str = "直接描述画面前方的内容，不要包含'这张图片'、'视角'等开场白，不要解释画面质量。重点关注障碍物、人和文字。直接说结果。50字以内。",
+                                     begin_send: Optional[Callable[[], bool]] = None,
+                                     stream: Optional[ReplyStream] = None,
+                                     hq: Optional[concurrent.futures.Future] = None,
+                                     question: Optional[Callable[[], str]] = None) -> Optional[str]:
+        """
+        后台执行的视觉分析任务。
+
+        Args:
+            begin_send: 投机请求的发送凭证，发出网络请求前调用，返回 False 表示已被取消
+            stream: 提供时以流式方式请求 VLM，文本增量实时推送给播报线程
+            hq: 高清快照 (JPEG 字节) 的 Future，拿到时代替实时帧；最多等待 VISION_HQ_TIMEOUT
+            question: 返回当前已识别的问题文本，包含读字关键词时改用读字 Prompt
+
+        Returns:
+            完整的回复文本，失败时返回 None
+        """
+        try:
+            return self._run_vision_request(frame, prompt, begin_send, stream, hq, question)
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _hq_available(self) -> bool:
+        link = self.camera_link
+        return config.VISION_HQ_ENABLED and link is not None and link.connected
+
+    def _request_hq_snapshot(self) -> Optional[concurrent.futures.Future]:
+        """设备在线且当前没有较高警报时，开始拍摄一张高清快照 (与 ASR、VLM 任务排队并行)"""
+        if not self._hq_available():
+            return None
+        if self.state.alert.level > config.VISION_HQ_MAX_ALERT:
+            # 拍摄期间固件暂停推流，有风险时不牺牲避障画面
+            self.hq_stats["skipped"] += 1
+            return None
+        self.hq_stats["requested"] += 1
+        return self._snapshot_executor.submit(self.camera_link.snapshot, config.VISION_HQ_TIMEOUT)
+
+    def _await_hq_snapshot(self, hq: concurrent.futures.Future) -> Optional[bytes]:
+        """等待高清快照，超时或失败返回 None (退回实时帧)"""
+        t0 = time.time()
+        try:
+            jpg = hq.result(timeout=config.VISION_HQ_TIMEOUT + 0.5)
+        except Exception:
+            jpg = None
+        if jpg is None:
+            self.hq_stats["fallback"] += 1
+            print("VoiceAssistant: [Async] HQ snapshot unavailable, using live frame")
+        else:
+            self.hq_stats["used"] += 1
+            print(f"[Timing] HQ snapshot ready after {time.time()-t0:.2f}s wait ({len(jpg)//1024} KB)")
+        return jpg
+
+    def _run_vision_request(self, frame, prompt: str,
+                            begin_send: Optional[Callable[[], bool]],
+                            stream: Optional[ReplyStream],
+                            hq: Optional[concurrent.futures.Future] = None,
+                            question: Optional[Callable[[], str]] = None) -> Optional[str]:
+        """_generate_vision_description 的实现 (高清快照 -> 缓存 -> 编码 -> 请求 VLM)"""
         print("VoiceAssistant: [Async] Starting Vision Analysis...")
         if not self.client:
             return None
         
         try:
-            # 编码图片
-            _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            # 高清快照：原始 SXGA JPEG 直接上传，不重新编码
+            hq_jpg = self._await_hq_snapshot(hq) if hq is not None else None
+            if hq_jpg is not None:
+                hq_frame = cv2.imdecode(np.frombuffer(hq_jpg, np.uint8), cv2.IMREAD_COLOR)
+                if hq_frame is not None:
+                    frame = hq_frame
+                else:
+                    hq_jpg = None
+
+            # 等快照期间识别多半已有结果：读字问题改用读字 Prompt
+            reading = question is not None and any(k in question() for k in config.VISION_READ_KEYWORDS)
+            if reading:
+                prompt = config.VISION_READ_PROMPT
+
+            # 查询描述缓存：原地重复提问时直接返回
+            frame_hash, labels = None, None
+            if config.VISION_CACHE_ENABLED:
+                frame_hash = dhash(frame)
+                if config.VISION_CACHE_USE_DETECTIONS:
+                    labels = [b["label"] for b in self.state.get_detection()[0]]
+                cached = self.vision_cache.get(frame_hash, prompt, labels)
+                if cached:
+                    print("VoiceAssistant: [Async] Vision cache hit")
+                    if stream is not None:
+                        stream.push(cached)
+                    return cached
+
+            # 编码图片 (读字时提高实时帧的编码质量)
+            if hq_jpg is not None:
+                buffer = hq_jpg
+            else:
+                _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90 if reading else 70])
             jpg_as_text = base64.b64encode(buffer).decode('utf-8')
+            detail = "high" if hq_jpg is not None or reading else "low"
+
+            if begin_send is not None and not begin_send():
+                print("VoiceAssistant: [Async] Vision request cancelled")
+                return None
             
             t0 = time.time()
             response = self.client.chat.completions.create(
@@ -170,21 +373,47 @@ class VoiceAssistant:
                                 "type": "image_url",
                                 "image_url": {
                                     "url": f"data:image/jpeg;base64,{jpg_as_text}",
-                                    "detail": "low"
+                                    "detail": detail
                                 }
                             }
                         ]
                     }
                 ],
-                max_tokens=100
+                max_tokens=200 if reading else 100,
+                stream=stream is not None
             )
-            reply_text = response.choices[0].message.content
+            if stream is not None:
+                # 流式：逐块推送文本增量，播报线程可以边生成边合成
+                parts = []
+                for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            print(f"VoiceAssistant: [Async] Vision first token in {time.time()-t0:.2f}s")
+                        parts.append(delta)
+                        stream.push(delta)
+                reply_text = "".join(parts)
+            else:
+                reply_text = response.choices[0].message.content
             print(f"VoiceAssistant: [Async] Vision Done in {time.time()-t0:.2f}s")
+            if frame_hash is not None:
+                self.vision_cache.put(frame_hash, prompt, reply_text, labels)
             return reply_text
         except Exception as e:
             print(f"VoiceAssistant: [Async] Vision Error: {e}")
             return None
 
+    def _answer_from_detections(self, question: str) -> Optional[str]:
+        """本地快速通道：用最新的 YOLO 检测结果回答，无法回答时返回 None (升级到 VLM)"""
+        t0 = time.time()
+        boxes, shape, ts = self.state.get_detection()
+        reply = self.scene.answer(question, boxes, shape[1], shape[0], ts)
+        if reply:
+            print(f"[Timing] Local scene answer: {(time.time()-t0)*1000:.1f}ms")
+        return reply
+
     def _sanitize_for_tts(self, text: str) -> str:
         """清洗文本，移除 Markdown 符号，使其更适合朗读"""
         import re
@@ -199,26 +428,102 @@ class VoiceAssistant:
         return text.strip()
 
     def _process_audio(self, wav_path: Path) -> None:
-        """核心处理流程: 并发(Vision, STT) -> 关键词过滤 -> TTS"""
+        """核心处理流程: 并发(投机 Vision, 流式 STT) -> 关键词过滤 -> TTS"""
         print(f"VoiceAssistant: Processing {wav_path.name}...")
         
-        # 1. 立即获取当前画面并启动 Vision 任务 (Async)
-        frame, _ = self.state.get_frame()
-        vision_future = None
+        # 1. 立即获取当前画面 (最近一小段时间内最清晰的一帧)，准备投机 Vision 任务 (Async)
+        frame, _ = self.state.get_best_frame()
+        speculative = None
         
         if frame is not None:
-             # 因为我们还没拿到用户的具体问题，所以只能用通用 Prompt
-             vision_future = self.executor.submit(self._generate_vision_description, frame)
+            # 因为我们还没拿到用户的具体问题，所以只能用通用 Prompt
+            # 快照在 ASR 回调里 (部分/最终识别文本判定为视觉问题时) 开始拍摄，视觉任务只等待结果
+            speculative = SpeculativeRequest(
+                self.speculation,
+                lambda begin_send: self._submit_vision(frame, begin_send, lambda: speculative.text,
+                                                       speculative.hq),
+                self._request_hq_snapshot if self._hq_available() else None
+            )
+            # 近期视觉问题较多时立即启动，否则等部分识别结果再决定
+            if self.speculation.should_start_early(self.state.get_search_state()["active"]):
+                speculative.start("early")
         else:
-             print("VoiceAssistant: No frame available for async vision.")
+            print("VoiceAssistant: No frame available for async vision.")
 
+        try:
+            self._handle_utterance(wav_path, speculative)
+        finally:
+            # 没被取用的投机请求在这里取消或记为浪费
+            if speculative:
+                speculative.discard()
+
+    def _submit_vision(self, frame, begin_send: Callable[[], bool],
+                       question: Optional[Callable[[], str]] = None,
+                       hq: Optional[concurrent.futures.Future] = None) -> concurrent.futures.Future:
+        """
+        提交 VLM 任务；启用流式回复时为 Future 附带 ReplyStream 供逐句播报。
+        投机请求在识别完成前启动，识别文本判定为视觉问题时开始拍摄快照 (与 ASR 并行)，经 hq 交给任务。
+        """
+        stream = ReplyStream() if config.STREAM_REPLY_ENABLED else None
+
+        def submit(hq: Optional[concurrent.futures.Future]) -> concurrent.futures.Future:
+            return self.executor.submit(self._generate_vision_description, frame,
+                                        begin_send=begin_send, stream=stream, hq=hq, question=question)
+
+        future = submit(hq) if hq is None or hq.done() else self._submit_after(hq, submit)
+        with self._streams_lock:
+            self._streams[future] = stream
+        future.add_done_callback(self._forget_stream)
+        return future
+
+    def _submit_after(self, hq: concurrent.futures.Future,
+                      submit: Callable[[Optional[concurrent.futures.Future]], concurrent.futures.Future]
+                      ) -> concurrent.futures.Future:
+        """
+        快照结束 (或等待 VISION_HQ_TIMEOUT 仍未结束) 后再把视觉任务提交到线程池：
+        等待识别结果与快照期间不占用工作线程 (线程池由所有设备共用)。
+        返回的 Future 在提交前可被取消 (投机请求被丢弃时不再提交)。
+        """
+        outer: concurrent.futures.Future = concurrent.futures.Future()
+        once = threading.Lock()
+
+        def relay(inner: concurrent.futures.Future) -> None:
+            if inner.exception() is not None:
+                outer.set_exception(inner.exception())
+            else:
+                outer.set_result(inner.result())
+
+        def launch(*_) -> None:
+            if not once.acquire(blocking=False):
+                return
+            timer.cancel()
+            if not outer.set_running_or_notify_cancel():
+                return
+            ready = hq.done()
+            if not ready:
+                self.hq_stats["fallback"] += 1
+                print("VoiceAssistant: [Async] HQ snapshot not ready, using live frame")
+            submit(hq if ready else None).add_done_callback(relay)
+
+        timer = threading.Timer(config.VISION_HQ_TIMEOUT, launch)
+        timer.daemon = True
+        timer.start()
+        hq.add_done_callback(launch)
+        return outer
+
+    def _forget_stream(self, future: concurrent.futures.Future) -> None:
+        with self._streams_lock:
+            self._streams.pop(future, None)
+
+    def _handle_utterance(self, wav_path: Path, speculative: Optional[SpeculativeRequest]) -> None:
+        """STT -> 指令分派 -> 视觉问答"""
         text = ""
         
-        # 2. 并行执行 Speech To Text
+        # 2. 并行执行 Speech To Text (流式识别，部分结果驱动投机策略)
         try:
             t0 = time.time()
             if DASHSCOPE_ASR_AVAILABLE:
-                text = self._recognize_with_aliyun(wav_path)
+                text = self._recognize_with_aliyun(wav_path, speculative.on_partial if speculative else None)
                 print(f"[Timing] Aliyun ASR: {time.time()-t0:.2f}s")
             else:
                 # Fallback: Google Web Speech API
@@ -252,6 +557,10 @@ class VoiceAssistant:
             self.state.update_voice_state("idle")
             return
 
+        self.speculation.observe(text)
+        if speculative:
+            speculative.text = text
+
         # 3. 寻物指令检测 (优先于其他指令)
         if self._parse_stop_search_command(text):
             return
@@ -259,14 +568,34 @@ class VoiceAssistant:
             return
 
         # 3. 关键词检测 & 结果同步
-        # 关键词: "看", "描述", "前面", "什么", "读", "识别"
-        keywords = ["看", "描述", "前面", "什么", "读", "识别", "在哪"]
-        
         # 如果包含关键词，我们去取 Vision 结果并播报
-        if any(k in text for k in keywords):
+        if any(k in text for k in config.VISION_KEYWORDS):
+            # 本地快速通道：检测结果足以回答时直接播报，不再等待 VLM
+            local_reply = self._answer_from_detections(text)
+            if local_reply:
+                print(f"AI Reply (local): {local_reply}")
+                self.state.add_voice_log("ai", local_reply)
+                self._speak(local_reply)
+                return
+
             print("VoiceAssistant: Keywords detected. Waiting for Vision result...")
             
+            vision_future = None
+            if speculative:
+                # 投机未命中时在这里补发请求
+                if not speculative.started:
+                    speculative.start("late")
+                vision_future = speculative.take()
+
+            stream = None
             if vision_future:
+                # 任务已结束时通道会被移除，直接走下面的整段播报
+                with self._streams_lock:
+                    stream = self._streams.get(vision_future)
+
+            if stream is not None:
+                self._speak_stream(stream)
+            elif vision_future:
                 try:
                     # 等待 Vision 结果 (如果 STT 很快，这里会阻塞一会儿；如果 STT 慢，这里可能已经好了)
                     ai_reply = vision_future.result(timeout=10) 
@@ -279,14 +608,14 @@ class VoiceAssistant:
                         clean_reply = self._sanitize_for_tts(ai_reply)
                         self._speak(clean_reply)
                     else:
-                        self._speak("抱歉，我无法看清画面")
+                        self._speak(config.VOICE_PROMPTS["vision_unclear"], cacheable=True)
                 except Exception as e:
                     print(f"VoiceAssistant: Failed to get vision result: {e}")
-                    self._speak("视觉服务响应超时")
+                    self._speak(config.VOICE_PROMPTS["vision_timeout"], cacheable=True)
             else:
-                 self._speak("抱歉，没有获取到画面")
+                 self._speak(config.VOICE_PROMPTS["no_frame"], cacheable=True)
         else:
-            # 不包含关键词，忽略 Vision 结果 (如果还在跑，它会自己跑完但没人接)
+            # 不包含关键词，投机请求会在 _process_audio 中取消或记为浪费
             print("VoiceAssistant: No keyword match. Ignoring vision result.")
             self.state.update_voice_state("idle")
 
@@ -339,11 +668,13 @@ class VoiceAssistant:
         
         if target_class:
             self.state.start_search(target_class, item_name)
-            self._speak(f"开始寻找{item_name}，请慢慢移动摄像头")
+            # 只缓存别名表中的物品名 (启动时已预合成)；识别出的任意文本不写入短语缓存
+            self._speak(config.VOICE_PROMPTS["search_start"].format(item=item_name),
+                        cacheable=item_name in config.SEARCH_ALIASES)
             return True
         else:
-            # 无法识别的物品
-            self._speak(f"抱歉，我不认识{item_name}，请尝试换个说法")
+            # 无法识别的物品 (物品名来自识别文本，不缓存)
+            self._speak(config.VOICE_PROMPTS["search_unknown"].format(item=item_name))
             return True  # 返回 True 表示已处理，不走后续流程
 
     def _parse_stop_search_command(self, text: str) -> bool:
@@ -358,11 +689,10 @@ class VoiceAssistant:
         if not search_state["active"]:
             return False
         
-        stop_keywords = ["停止", "找到了", "取消", "不找了", "结束", "关闭"]
-        if any(k in text for k in stop_keywords):
+        if any(k in text for k in config.SEARCH_STOP_KEYWORDS):
             target_label = search_state["target_label"]
             self.state.stop_search()
-            self._speak(f"寻物模式已关闭")
+            self._speak(config.VOICE_PROMPTS["search_stop"], cacheable=True)
             return True
         
         return False
@@ -370,15 +700,11 @@ class VoiceAssistant:
 # ==============================================================================
 # Qwen-TTS-Realtime Integration
 # ==============================================================================
-    def _speak_with_qwen(self, text: str):
-        """Use Qwen-TTS-Realtime for speech synthesis (Buffered)"""
-        if not DASHSCOPE_ASR_AVAILABLE:
-            print("DashScope not available, using EdgeTTS")
-            self._speak_edge_tts(text)
-            return
+    def _synthesize_with_qwen(self, text: str) -> Optional[bytes]:
+        """Use Qwen-TTS-Realtime for speech synthesis (Buffered), returns 16k PCM"""
+        if not DASHSCOPE_ASR_AVAILABLE or not text:
+            return None
 
-        if not text: return
-        
         callback = _QwenTTSCallback()
         
         try:
@@ -391,9 +717,9 @@ class VoiceAssistant:
             # Connect
             tts_client.connect()
             
-            # Update Session: Voice='Cherry', 16k 16bit mono
+            # Update Session: 16k 16bit mono
             tts_client.update_session(
-                voice='Cherry', 
+                voice=config.TTS_QWEN_VOICE, 
                 response_format=AudioFormat.PCM_16000HZ_MONO_16BIT, 
                 mode='server_commit'
             )
@@ -412,56 +738,154 @@ class VoiceAssistant:
                 
             if callback.error_msg:
                 print(f"QwenTTS API Error: {callback.error_msg}")
-                # Fallback?
-                self._speak_edge_tts(text)
-                return
+                return None
 
             if len(callback.audio_buffer) > 0:
-                print(f"QwenTTS generated {len(callback.audio_buffer)} bytes. Playing...")
-                self.audio.play_pcm_bytes(bytes(callback.audio_buffer), sample_rate=16000)
-            else:
-                print("QwenTTS: No audio received.")
-                self._speak_edge_tts(text)
+                print(f"QwenTTS generated {len(callback.audio_buffer)} bytes.")
+                return bytes(callback.audio_buffer)
+            print("QwenTTS: No audio received.")
+            return None
 
         except Exception as e:
             print(f"QwenTTS Exception: {e}")
-            print("Fallback to EdgeTTS...")
-            self._speak_edge_tts(text)
+            return None
+
+    def _tts_voices(self) -> List[str]:
+        """按优先级排列的可用音色 (首选 Qwen，其次 Edge)"""
+        if DASHSCOPE_ASR_AVAILABLE and os.getenv("OPENAI_API_KEY"):
+            return [config.TTS_QWEN_VOICE, config.TTS_EDGE_VOICE]
+        return [config.TTS_EDGE_VOICE]
+
+    def _synthesize(self, text: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        合成语音，Qwen 失败时回退 EdgeTTS。
+
+        Returns:
+            (pcm, voice): 16k 16bit mono PCM 与实际使用的音色；全部失败时为 (None, None)
+        """
+        for voice in self._tts_voices():
+            if voice == config.TTS_QWEN_VOICE:
+                pcm = self._synthesize_with_qwen(text)
+            else:
+                pcm = self._synthesize_edge_tts(text)
+            if pcm:
+                return pcm, voice
+            print(f"TTS voice {voice} failed, trying fallback...")
+        return None, None
 
-    def _speak(self, text: str) -> None:
-        """Unified TTS Entry Point"""
+    def _cached_speech(self, text: str) -> Optional[bytes]:
+        """按音色优先级查询短语缓存"""
+        for voice in self._tts_voices():
+            pcm = self.tts_cache.get(text, voice)
+            if pcm is not None:
+                return pcm
+        return None
+
+    def _prewarm_tts_cache(self) -> None:
+        """预合成固定提示语与所有寻物模板，写入短语缓存"""
+        prompts = config.VOICE_PROMPTS
+        phrases = [v for k, v in prompts.items() if "{item}" not in v]
+        phrases += [prompts["search_start"].format(item=alias) for alias in config.SEARCH_ALIASES]
+
+        voice = self._tts_voices()[0]
+        warmed = 0
+        for phrase in phrases:
+            if self.tts_cache.contains(phrase, voice):
+                continue
+            pcm, used_voice = self._synthesize(phrase)
+            if not pcm:
+                # 云端不可用，稍后说到时再合成
+                print("[TTSCache] Prewarm aborted: TTS unavailable")
+                return
+            self.tts_cache.put(phrase, used_voice, pcm)
+            warmed += 1
+        print(f"[TTSCache] Prewarm done ({warmed} new / {len(phrases)} phrases)")
+
+    def _speak_stream(self, stream: ReplyStream) -> None:
+        """
+        逐句播报流式回复：LLM 生成、TTS 合成与 ESP32 播放三者流水线并行。
+        每拿到一句就清洗、合成并送入播放队列，同时 LLM 继续生成下一句。
+        """
+        self.state.update_voice_state("speaking")
+        spoken = 0
+        t0 = time.time()
+        try:
+            for sentence in stream.sentences():
+                clean = self._sanitize_for_tts(sentence)
+                if not clean:
+                    continue
+                pcm, _ = self._synthesize(clean)
+                if pcm:
+                    if spoken == 0:
+                        print(f"[Timing] First sentence ready in {time.time()-t0:.2f}s")
+                    # 阻塞入队，保证句子不被丢弃且按顺序播放
+                    self.audio.play_pcm_bytes(pcm, sample_rate=config.TTS_SAMPLE_RATE, wait=True)
+                    spoken += 1
+        except TimeoutError:
+            print("VoiceAssistant: Vision stream timed out")
+            if spoken == 0:
+                self._speak(config.VOICE_PROMPTS["vision_timeout"], cacheable=True)
+                return
+        finally:
+            self.state.update_voice_state("idle")
+
+        ai_reply = stream.text
+        if ai_reply:
+            print(f"AI Reply: {ai_reply}")
+            self.state.add_voice_log("ai", ai_reply)
+        if spoken == 0:
+            self._speak(config.VOICE_PROMPTS["vision_unclear"], cacheable=True)
+
+    def _speak(self, text: str, cacheable: bool = False) -> None:
+        """
+        Unified TTS Entry Point
+
+        Args:
+            text: 要播报的文本
+            cacheable: 是否为固定提示语；是则优先读取短语缓存，合成后写回缓存
+        """
         if not text: return
         
         self.state.update_voice_state("speaking")
         try:
-            # Prefer Qwen TTS if available
-            if DASHSCOPE_ASR_AVAILABLE and os.getenv("OPENAI_API_KEY"):
-               self._speak_with_qwen(text)
-            else:
-               self._speak_edge_tts(text)
+            pcm = self._cached_speech(text) if cacheable else None
+            if pcm is None:
+                pcm, voice = self._synthesize(text)
+                if pcm and cacheable:
+                    self.tts_cache.put(text, voice, pcm)
+            if pcm:
+                self.audio.play_pcm_bytes(pcm, sample_rate=config.TTS_SAMPLE_RATE)
         finally:
             self.state.update_voice_state("idle")
 
-    def _speak_edge_tts(self, text: str) -> None:
-        """Edge-TTS Fallback"""
+    def _synthesize_edge_tts(self, text: str) -> Optional[bytes]:
+        """Edge-TTS Fallback, returns 16k PCM"""
+        temp_mp3 = None
+        loop = asyncio.new_event_loop()
         try:
-            loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
-            communicate = edge_tts.Communicate(text, "zh-CN-YunxiNeural")
+            communicate = edge_tts.Communicate(text, config.TTS_EDGE_VOICE)
             
-            temp_mp3 = Path("temp_tts.mp3")
+            # 预热线程与对话线程可能同时合成，临时文件名需要唯一
+            fd, tmp_name = tempfile.mkstemp(suffix=".mp3", prefix="tts_")
+            os.close(fd)
+            temp_mp3 = Path(tmp_name)
             loop.run_until_complete(communicate.save(str(temp_mp3)))
             
             from pydub import AudioSegment
             sound = AudioSegment.from_mp3(str(temp_mp3))
             
-            sound = sound.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-            pcm_data = sound.raw_data
-            
-            self.audio.play_pcm_bytes(pcm_data)
-            os.remove(temp_mp3)
+            sound = sound.set_frame_rate(config.TTS_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+            return sound.raw_data
             
         except Exception as e:
             print(f"EdgeTTS Error: {e}")
-
+            return None
+        finally:
+            loop.close()
+            if temp_mp3 is not None:
+                try:
+                    os.remove(temp_mp3)
+                except OSError:
+                    pass
@@ -7,11 +7,19 @@
 // 自动检测后端地址：
 // 1. 如果当前端口是 5500 (Live Server)，则假设后端在同域名的 5000 端口
 // 2. 否则，假设后端与前端同源 (Flask 托管)
+// 设备页面 /d/<设备ID>/ 下，所有 HUD 端点都带同样的设备前缀
 const isLiveServer = window.location.port === "5500";
-const DEFAULT_BASE = isLiveServer
+const DEVICE_PREFIX = (window.location.pathname.match(/^\/d\/[A-Za-z0-9_-]+/) || [""])[0];
+const DEFAULT_BASE = (isLiveServer
     ? `${window.location.protocol}//${window.location.hostname}:5000`
-    : window.location.origin;
-const POLL_INTERVAL = 250; // 默认轮询间隔 (毫秒)
+    : window.location.origin) + DEVICE_PREFIX;
+const POLL_INTERVAL = 250; // 两次轮询之间的最小间隔 (毫秒)
+const LONG_POLL_WAIT = 20000; // 长轮询等待时间 (毫秒)，状态无变化时服务端最多挂起这么久
+const PUSH_RETRY_MS = 5000;   // 推送通道断开后，退回轮询并在此时间后重试推送
+// 前端叠加模式：页面地址带 ?overlay=client 时，视频直通相机原始 JPEG，检测框与 HUD 由前端按帧绘制
+const CLIENT_OVERLAY = new URLSearchParams(window.location.search).get("overlay") === "client";
+const OVERLAY_KEEP = 60;      // 缓存最近多少帧的叠加数据
+const OVERLAY_WAIT_MS = 200;  // 原始帧等待对应检测结果的最长时间，超时后配最近一次检测结果绘制
 
 // =========================
 // DOM 元素引用 (Element References)
@@ -23,6 +31,7 @@ const el = {
 
     // 核心显示区域
     video: document.getElementById("video-stream"),
+    videoCanvas: document.getElementById("video-canvas"),
     videoShell: document.querySelector(".video-hud-container"),
 
     // HUD 数据面板
@@ -68,7 +77,14 @@ const el = {
 // 全局状态变量
 // =========================
 let baseUrl = DEFAULT_BASE;
-let pollTimer = null;    // 轮询定时器句柄
+let polling = false;     // 是否处于轮询中
+let pollGen = 0;         // 轮询循环代号，用于在暂停/重启后让旧循环退出
+let lastVersion = null;  // 上次收到的状态版本号 (长轮询 since 参数)
+let pollAbort = null;    // 当前长轮询请求的 AbortController
+let live = false;        // 用户是否开启了实时检测 (推送或轮询)
+let eventSource = null;  // SSE 推送通道
+let pushRetryTimer = null; // 推送重试定时器
+let hudData = {};        // 推送通道累积的完整状态 (快照 + 增量)
 let lastOk = 0;          // 上次请求成功的时间戳
 let pollInterval = POLL_INTERVAL;
 let backoffMs = 0;       // 请求失败后的退避时间
@@ -138,6 +154,18 @@ function updateLinks() {
     if (el.linkVideo) el.linkVideo.href = `${baseUrl}/video`;
 }
 
+/**
+ * 视频档位参数：页面地址带 ?profile=low|mid|high 时直接使用，
+ * 否则上报浏览器估算的下行带宽 (Network Information API)，由服务端选择档位
+ */
+function videoQuality() {
+    const profile = new URLSearchParams(window.location.search).get("profile");
+    if (profile) return `profile=${encodeURIComponent(profile)}&`;
+    const conn = navigator.connection;
+    if (conn && conn.downlink) return `kbps=${Math.round(conn.downlink * 1000)}&`;
+    return "";
+}
+
 /**
  * 刷新 MJPEG 视频流 (通过更新 src 时间戳)
  * 增加防抖逻辑：只有当 baseUrl 真正改变时才更新，避免频繁刷新
@@ -156,11 +184,233 @@ function updateVideo(force = false) {
     }
 
     lastVideoBaseUrl = baseUrl;
-    const videoUrl = `${baseUrl}/video?ts=${Date.now()}`;
+    if (CLIENT_OVERLAY && el.videoCanvas) {
+        startClientOverlay();
+        return;
+    }
+    const videoUrl = `${baseUrl}/video?${videoQuality()}ts=${Date.now()}`;
     console.log("Setting video src to:", videoUrl);
     el.video.src = videoUrl;
 }
 
+// =========================
+// 前端叠加绘制 (Client-side Overlay)
+// /video?profile=raw 原样直通相机 JPEG (分段头 X-Frame-Seq 带帧序号)，
+// /overlay 推送按帧序号标记的检测结果，二者按序号对齐后绘制到 canvas：
+// 原始帧先缓存，等到同序号的检测结果再绘制 (检测框与画面一致)；
+// 未被推理的帧等待 OVERLAY_WAIT_MS 后配最近一次检测结果绘制，画面延迟不超过该值
+// =========================
+
+const LEVEL_COLORS = ["#00ff00", "#ffff00", "#ff8800", "#ff0000"];
+const overlayBySeq = new Map(); // 帧序号 -> 叠加数据
+const pendingFrames = new Map(); // 帧序号 -> { jpeg, ts }，等待检测结果的原始帧
+let overlaySource = null;       // /overlay 的 EventSource
+let rawAbort = null;            // 直通视频流请求的 AbortController
+let lastDrawnSeq = -1;          // 已绘制的最新帧序号 (不回退绘制更早的帧)
+let drawing = false;            // 是否有帧正在解码绘制
+let nextDraw = null;            // 绘制期间到达的最新一帧，绘制完成后补画
+
+function startClientOverlay() {
+    stopClientOverlay();
+    el.video.style.display = "none";
+    el.videoCanvas.style.display = "block";
+
+    overlaySource = new EventSource(`${baseUrl}/overlay`);
+    overlaySource.addEventListener("overlay", (e) => {
+        const o = JSON.parse(e.data);
+        overlayBySeq.set(o.seq, o);
+        if (overlayBySeq.size > OVERLAY_KEEP) {
+            overlayBySeq.delete(overlayBySeq.keys().next().value);
+        }
+        // 对应的原始帧已到达：立即配本次结果绘制，更早的待绘帧不再绘制
+        const frame = pendingFrames.get(o.seq);
+        for (const s of [...pendingFrames.keys()]) {
+            if (s <= o.seq) pendingFrames.delete(s);
+        }
+        if (frame) queueDraw(frame.jpeg, o.seq);
+    });
+
+    rawAbort = new AbortController();
+    readRawStream(rawAbort.signal);
+}
+
+function stopClientOverlay() {
+    if (overlaySource) {
+        overlaySource.close();
+        overlaySource = null;
+    }
+    if (rawAbort) {
+        rawAbort.abort();
+        rawAbort = null;
+    }
+    overlayBySeq.clear();
+    pendingFrames.clear();
+    lastDrawnSeq = -1;
+    nextDraw = null;
+}
+
+function indexOfHeaderEnd(buf) {
+    // 查找 multipart 分段头结束标记 \r\n\r\n
+    for (let i = 0; i + 3 < buf.length; i++) {
+        if (buf[i] === 13 && buf[i + 1] === 10 && buf[i + 2] === 13 && buf[i + 3] === 10) return i;
+    }
+    return -1;
+}
+
+async function readRawStream(signal) {
+    const decoder = new TextDecoder();
+    try {
+        const res = await fetch(`${baseUrl}/video?profile=raw&ts=${Date.now()}`, { cache: "no-store", signal });
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        lastDrawnSeq = -1;  // 服务端重启后帧序号从头开始
+        const reader = res.body.getReader();
+        let buf = new Uint8Array(0);
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            const merged = new Uint8Array(buf.length + value.length);
+            merged.set(buf);
+            merged.set(value, buf.length);
+            buf = merged;
+
+            // 逐段解析：分段头 (含 Content-Length 与 X-Frame-Seq) + JPEG 数据
+            while (true) {
+                const headerEnd = indexOfHeaderEnd(buf);
+                if (headerEnd < 0) break;
+                const header = decoder.decode(buf.subarray(0, headerEnd));
+                const lenMatch = header.match(/Content-Length:\s*(\d+)/i);
+                if (!lenMatch) {
+                    buf = buf.slice(headerEnd + 4);
+                    continue;
+                }
+                const start = headerEnd + 4;
+                const end = start + parseInt(lenMatch[1], 10);
+                if (buf.length < end) break;
+                const seqMatch = header.match(/X-Frame-Seq:\s*(\d+)/i);
+                const jpeg = buf.slice(start, end);
+                buf = buf.slice(end);
+                onRawFrame(jpeg, seqMatch ? parseInt(seqMatch[1], 10) : null);
+            }
+        }
+    } catch (err) {
+        if (err.name === "AbortError") return;
+        console.error("Raw stream error:", err);
+    }
+    // 连接断开后重连
+    if (!signal.aborted) setTimeout(() => { if (!signal.aborted) readRawStream(signal); }, 1000);
+}
+
+function onRawFrame(jpeg, seq) {
+    // 没有帧序号或检测结果已先到达时直接绘制，否则等待同序号的检测结果
+    if (seq === null || overlayBySeq.has(seq)) {
+        queueDraw(jpeg, seq);
+        return;
+    }
+    pendingFrames.set(seq, { jpeg, ts: performance.now() });
+    if (pendingFrames.size > OVERLAY_KEEP) {
+        pendingFrames.delete(pendingFrames.keys().next().value);
+    }
+    setTimeout(flushPendingFrames, OVERLAY_WAIT_MS);
+}
+
+function flushPendingFrames() {
+    // 等待超时的帧 (多半未被推理)：只绘制其中最新的一帧，配最近一次检测结果
+    const now = performance.now();
+    let latest = null;
+    for (const [s, f] of [...pendingFrames]) {
+        if (now - f.ts < OVERLAY_WAIT_MS) continue;
+        pendingFrames.delete(s);
+        if (!latest || s > latest.seq) latest = { seq: s, jpeg: f.jpeg };
+    }
+    if (latest) queueDraw(latest.jpeg, latest.seq);
+}
+
+function queueDraw(jpeg, seq) {
+    if (seq !== null) {
+        if (seq <= lastDrawnSeq) return;
+        lastDrawnSeq = seq;
+    }
+    // 上一帧还在解码时只保留最新一帧，绘制完成后补画
+    if (drawing) {
+        nextDraw = { jpeg, seq };
+        return;
+    }
+    startDraw(jpeg, seq);
+}
+
+function startDraw(jpeg, seq) {
+    drawing = true;
+    drawRawFrame(jpeg, seq)
+        .catch((err) => console.error("Overlay draw error:", err))
+        .finally(() => {
+            drawing = false;
+            const next = nextDraw;
+            nextDraw = null;
+            if (next) startDraw(next.jpeg, next.seq);
+        });
+}
+
+function pickOverlay(seq) {
+    // 选择序号不超过当前帧的最新检测结果 (推理帧率低于相机帧率时沿用上一次结果)
+    let best = null;
+    for (const [s, o] of overlayBySeq) {
+        if ((seq === null || s <= seq) && (!best || s > best.seq)) best = o;
+    }
+    return best;
+}
+
+async function drawRawFrame(jpeg, seq) {
+    const bmp = await createImageBitmap(new Blob([jpeg], { type: "image/jpeg" }));
+    const canvas = el.videoCanvas;
+    if (canvas.width !== bmp.width || canvas.height !== bmp.height) {
+        canvas.width = bmp.width;
+        canvas.height = bmp.height;
+    }
+    const ctx = canvas.getContext("2d");
+    ctx.drawImage(bmp, 0, 0);
+    bmp.close();
+    drawOverlay(ctx, pickOverlay(seq), canvas.width, canvas.height);
+}
+
+function drawOverlay(ctx, o, w, h) {
+    if (!o) return;
+    // 检测坐标基于推理所用帧的尺寸，按当前画面缩放
+    const sx = w / (o.w || w);
+    const sy = h / (o.h || h);
+    const rect = (b) => [b[0] * sx, b[1] * sy, (b[2] - b[0]) * sx, (b[3] - b[1]) * sy];
+
+    ctx.font = "14px monospace";
+    ctx.lineWidth = 2;
+    for (const b of o.b) {
+        const [x, y, bw, bh] = rect(b);
+        ctx.strokeStyle = "#00f3ff";
+        ctx.strokeRect(x, y, bw, bh);
+        ctx.fillStyle = "#00f3ff";
+        ctx.fillText(`${b[4]} ${b[5].toFixed(2)}`, x + 2, Math.max(12, y - 4));
+    }
+    if (o.at) {
+        ctx.lineWidth = 3;
+        ctx.strokeStyle = LEVEL_COLORS[o.lv] || LEVEL_COLORS[0];
+        ctx.strokeRect(...rect(o.at));
+    }
+    if (o.st) {
+        ctx.lineWidth = 3;
+        ctx.strokeStyle = "#ff00ff";
+        ctx.strokeRect(...rect(o.st));
+    }
+
+    // HUD 文本 (与服务端 draw_hud 一致)
+    ctx.font = "bold 18px monospace";
+    ctx.fillStyle = "#00ff00";
+    ctx.fillText(`FPS: ${o.fps.toFixed(1)}`, 10, 25);
+    ctx.fillText(`Delay: ${Math.round(o.dl)} ms`, 10, 50);
+    ctx.fillText(`Count: ${o.b.length}`, 10, 75);
+    if (o.lv > 0) {
+        ctx.fillStyle = "#ff0000";
+        ctx.fillText(`ALERT L${o.lv}`, 10, 105);
+    }
+}
+
 // =========================
 // UI 更新逻辑 (UI Updates)
 // =========================
@@ -343,21 +593,33 @@ function updateFromDetect(data) {
 // 轮询机制 (Polling Logic)
 // =========================
 
+function sleep(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
 async function pollDetect() {
     if (inflight) return; // 避免请求堆积
     try {
         inflight = true;
-        // 使用 no-store 避免缓存
-        const res = await fetch(`${baseUrl}/detect`, { cache: "no-store" });
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        const data = await res.json();
-
-        updateFromDetect(data);
+        pollAbort = new AbortController();
+        // 带上版本号进行长轮询：状态变化时立即返回，无变化时返回 304
+        const url = lastVersion === null
+            ? `${baseUrl}/detect`
+            : `${baseUrl}/detect?since=${lastVersion}&wait=${document.hidden ? 0 : LONG_POLL_WAIT}`;
+        // 使用 no-store 避免浏览器缓存，版本判断由 since 参数完成
+        const res = await fetch(url, { cache: "no-store", signal: pollAbort.signal });
+        if (res.status !== 304) {
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            const data = await res.json();
+            lastVersion = data.version ?? null;
+            updateFromDetect(data);
+        }
 
         lastOk = Date.now();
         backoffMs = 0; // 重置退避
         setServerStatus(true);
     } catch (err) {
+        if (err.name === "AbortError") return; // 主动取消 (切换地址/暂停)，不计为失败
         console.error("Poll error:", err);
         // 如果连续失败，显示错误到 UI
         if (Date.now() - lastOk > 2000) {
@@ -375,35 +637,96 @@ async function pollDetect() {
         backoffMs = Math.min(backoffMs ? backoffMs * 1.6 : 600, 4000);
     } finally {
         inflight = false;
+        pollAbort = null;
     }
 }
 
-function schedulePolling() {
-    if (pollTimer) clearInterval(pollTimer);
-    pollTimer = setInterval(() => {
-        // 页面不可见时停止轮询，省电
-        if (document.hidden) return;
-
-        if (backoffMs) {
-            // 如果处于退避状态，使用 setTimeout 延迟执行
-            setTimeout(pollDetect, backoffMs);
-        } else {
-            pollDetect();
+async function pollLoop(gen) {
+    while (polling && gen === pollGen) {
+        // 页面不可见时降低频率，省电
+        if (document.hidden) {
+            await sleep(pollInterval);
+            if (document.hidden) continue;
         }
-    }, pollInterval);
+        const started = Date.now();
+        await pollDetect();
+        // 失败时退避；成功时保证最小间隔，避免状态高频变化时请求过密
+        const wait = backoffMs || Math.max(0, pollInterval - (Date.now() - started));
+        if (wait) await sleep(wait);
+    }
 }
 
 function startPolling() {
-    if (pollTimer) return;
-    schedulePolling();
-    pollDetect();
-    if (el.toggleBtn) setText(el.toggleBtn, "暂停检测");
+    if (polling) return;
+    polling = true;
+    pollLoop(++pollGen);
 }
 
 function stopPolling() {
-    if (!pollTimer) return;
-    clearInterval(pollTimer);
-    pollTimer = null;
+    if (!polling) return;
+    polling = false;
+    pollGen++;
+    if (pollAbort) pollAbort.abort();
+}
+
+// =========================
+// 推送机制 (Server-Sent Events)，不可用时退回长轮询
+// =========================
+
+function applyPush(data, isSnapshot) {
+    if (isSnapshot) hudData = data;
+    else Object.assign(hudData, data);
+    lastVersion = hudData.version ?? null;
+    updateFromDetect(hudData);
+    lastOk = Date.now();
+    setServerStatus(true);
+}
+
+function startPush() {
+    stopPush();
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const es = new EventSource(`${baseUrl}/events`);
+    eventSource = es;
+    es.addEventListener("snapshot", (e) => {
+        stopPolling(); // 推送已建立，停止轮询
+        applyPush(JSON.parse(e.data), true);
+    });
+    es.addEventListener("delta", (e) => applyPush(JSON.parse(e.data), false));
+    es.onerror = () => {
+        if (es !== eventSource) return;
+        // 推送不可用：关闭通道、退回轮询，稍后再尝试推送
+        stopPush();
+        startPolling();
+        pushRetryTimer = setTimeout(() => { if (live) startPush(); }, PUSH_RETRY_MS);
+    };
+}
+
+function stopPush() {
+    if (pushRetryTimer) {
+        clearTimeout(pushRetryTimer);
+        pushRetryTimer = null;
+    }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+}
+
+function startLive() {
+    if (live) return;
+    live = true;
+    startPush();
+    if (el.toggleBtn) setText(el.toggleBtn, "暂停检测");
+}
+
+function stopLive() {
+    if (!live) return;
+    live = false;
+    stopPush();
+    stopPolling();
     if (el.toggleBtn) setText(el.toggleBtn, "恢复检测");
 }
 
@@ -413,15 +736,21 @@ function applyBaseUrl() {
     updateLinks();
     updateVideo(true); // 用户明确更改了地址，强制刷新
     lastOk = 0;
-    pollDetect();
+    lastVersion = null; // 新地址的版本号序列与旧地址无关
+    if (pollAbort) pollAbort.abort(); // 取消挂起在旧地址上的长轮询
+    if (live) startPush(); // 在新地址上重新建立推送
+    else pollDetect();
     setText(el.statusBase, baseUrl.replace(/^https?:\/\//, ""));
 }
 
 function applyRotate() {
-    el.video.classList.remove("rot-90", "rot-180", "rot-270");
-    if (rotateStep === 1) el.video.classList.add("rot-90");
-    else if (rotateStep === 2) el.video.classList.add("rot-180");
-    else if (rotateStep === 3) el.video.classList.add("rot-270");
+    for (const node of [el.video, el.videoCanvas]) {
+        if (!node) continue;
+        node.classList.remove("rot-90", "rot-180", "rot-270");
+        if (rotateStep === 1) node.classList.add("rot-90");
+        else if (rotateStep === 2) node.classList.add("rot-180");
+        else if (rotateStep === 3) node.classList.add("rot-270");
+    }
 }
 
 // =========================
@@ -429,7 +758,7 @@ function applyRotate() {
 // =========================
 
 // 为存在的元素添加事件监听器，在添加前先检查元素是否存在
-if (el.toggleBtn) el.toggleBtn.addEventListener("click", () => pollTimer ? stopPolling() : startPolling());
+if (el.toggleBtn) el.toggleBtn.addEventListener("click", () => live ? stopLive() : startLive());
 if (el.refreshBtn) el.refreshBtn.addEventListener("click", () => updateVideo(true)); // 强制刷新
 // 注意：当前 HTML 中没有 rotateBtn，所以这里用可选链式调用
 if (el.rotateBtn) {
@@ -444,6 +773,7 @@ if (el.pixelBtn) {
     el.pixelBtn.addEventListener("click", () => {
         isPixel = !isPixel;
         el.video.classList.toggle("pixel", isPixel);
+        if (el.videoCanvas) el.videoCanvas.classList.toggle("pixel", isPixel);
         setText(el.pixelBtn, `锐化：${isPixel ? "开" : "关"}`);
     });
 }
@@ -476,14 +806,13 @@ if (el.baseUrl && ((el.baseUrl.value.includes("127.0.0.1") && !window.location.h
 // 初始化：只在启动时设置一次视频流
 updateLinks();
 updateVideo(); // 这里会设置 lastVideoBaseUrl，后续不会重复刷新
-startPolling();
+startLive();
 applyRotate();
 if (el.statusBase) setText(el.statusBase, baseUrl.replace(/^https?:\/\//, ""));
 
 // 页面可见性改变时调整轮询策略
 document.addEventListener("visibilitychange", () => {
     pollInterval = document.hidden ? 1200 : POLL_INTERVAL; // 后台时降低频率
-    if (pollTimer) schedulePolling();
 });
 
 // =========================
@@ -29,6 +29,7 @@ const char *password = "meiyoumima";
 const char* PC_HOST = "192.168.132.5"; // 电脑 IP
 const int PC_MIC_PORT = 23457;         // 电脑接收麦克风端口
 const int TTS_SERVER_PORT = 23456;     // ESP32 接收音频端口
+const char* DEVICE_ID = "default";     // 设备 ID (一台服务器连接多副眼镜时各不相同，与服务端 DEVICES 对应)
 // =======================================================
 
 // --- 摄像头引脚 ---
@@ -100,6 +101,9 @@ void config_speaker_i2s() {
 
 httpd_handle_t stream_httpd = NULL;
 
+// 推流帧率上限 (0 = 不限)，由服务器码控经 /control?var=fps 调整
+volatile int g_stream_fps = 0;
+
 static esp_err_t stream_handler(httpd_req_t *req) {
     camera_fb_t * fb = NULL;
     esp_err_t res = ESP_OK;
@@ -127,8 +131,11 @@ static esp_err_t stream_handler(httpd_req_t *req) {
             esp_camera_fb_return(fb);
             if (res != ESP_OK) break;
         }
-        // 小延迟给音频任务让路
-        vTaskDelay(pdMS_TO_TICKS(20));
+        // 小延迟给音频任务让路；设置了帧率上限时按周期节流
+        int delay_ms = 20;
+        int fps = g_stream_fps;
+        if (fps > 0 && 1000 / fps > delay_ms) delay_ms = 1000 / fps;
+        vTaskDelay(pdMS_TO_TICKS(delay_ms));
     }
     return res;
 }
@@ -150,6 +157,36 @@ static esp_err_t capture_handler(httpd_req_t *req) {
     return res;
 }
 
+// 相机参数控制 (与 esp32-camera CameraWebServer 示例的 /control 兼容)
+// GET /control?var=framesize&val=8|9|10 (VGA/SVGA/XGA) | var=quality&val=5~40 | var=fps&val=0 或 5~60
+static esp_err_t control_handler(httpd_req_t *req) {
+    char query[64], var[16], val[16];
+    if (httpd_req_get_url_query_str(req, query, sizeof(query)) != ESP_OK ||
+        httpd_query_key_value(query, "var", var, sizeof(var)) != ESP_OK ||
+        httpd_query_key_value(query, "val", val, sizeof(val)) != ESP_OK) {
+        httpd_resp_send_404(req);
+        return ESP_FAIL;
+    }
+    int value = atoi(val);
+    sensor_t *s = esp_camera_sensor_get();
+    if (!s) return httpd_resp_send_500(req);
+    int res = 0;
+    if (!strcmp(var, "framesize")) {
+        if (value >= FRAMESIZE_VGA && value <= FRAMESIZE_XGA) res = s->set_framesize(s, (framesize_t)value);
+        else res = -1;
+    } else if (!strcmp(var, "quality")) {
+        res = s->set_quality(s, constrain(value, 5, 40));
+    } else if (!strcmp(var, "fps")) {
+        g_stream_fps = value <= 0 ? 0 : constrain(value, 5, 60);
+    } else {
+        res = -1;
+    }
+    if (res < 0) return httpd_resp_send_500(req);
+    Serial.printf("📷 control %s=%d\n", var, value);
+    httpd_resp_set_hdr(req, "Access-Control-Allow-Origin", "*");
+    return httpd_resp_send(req, NULL, 0);
+}
+
 httpd_handle_t capture_httpd = NULL;
 
 void startCameraServer() {
@@ -182,9 +219,18 @@ void startCameraServer() {
         .user_ctx  = NULL
     };
 
+    httpd_uri_t control_uri = {
+        .uri       = "/control",
+        .method    = HTTP_GET,
+        .handler   = control_handler,
+        .user_ctx  = NULL
+    };
+
     if (httpd_start(&capture_httpd, &capture_config) == ESP_OK) {
         httpd_register_uri_handler(capture_httpd, &capture_uri);
+        httpd_register_uri_handler(capture_httpd, &control_uri);
         Serial.println("✅ Camera Capture: http://IP:80/capture");
+        Serial.println("✅ Camera Control: http://IP:80/control?var=&val=");
     }
 }
 
@@ -209,6 +255,10 @@ void mic_task(void *param) {
             if (!client.connected()) {
                 if (client.connect(PC_HOST, PC_MIC_PORT)) {
                     Serial.println("🔗 Mic Connected to PC");
+                    // 握手：告诉服务器这条音频流属于哪台设备
+                    client.print("DEV:");
+                    client.print(DEVICE_ID);
+                    client.print("\n");
                     Serial.println("🎤 Starting audio recording...");
                     client.setNoDelay(true);
                 } else {
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+异步 HUD 服务器单元测试
+
+测试 /detect 的 ETag 与长轮询、/events 推送、/video 扇出、Flask 路由转交、按设备划分的端点以及线程数不随观看者增长
+"""
+import asyncio
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from services.async_server import AsyncHUDServer  # noqa: E402
+from services.device_registry import DeviceRegistry  # noqa: E402
+from services.video_broadcaster import MJPEGBroadcaster  # noqa: E402
+
+
+def _flask_app():
+    app = Flask(__name__)
+
+    @app.get("/health")
+    def health():
+        return jsonify({"ok": True})
+
+    @app.post("/echo")
+    def echo():
+        return jsonify({"q": request.args.get("q"), "body": request.get_data(as_text=True)})
+
+    return app
+
+
+def run_with_client(coro_fn, devices=None):
+    """启动异步服务器并以测试客户端执行 coro_fn(client, state, hub)，state / hub 属于默认设备"""
+    if devices is None:
+        devices = DeviceRegistry()
+        devices.add("default", "127.0.0.1")
+    session = devices.default
+    session.video_hub = MJPEGBroadcaster(timeout=0.2)
+    server = AsyncHUDServer(_flask_app(), devices, wsgi_workers=2)
+
+    async def main():
+        client = TestClient(TestServer(server.build_app()))
+        await client.start_server()
+        try:
+            await coro_fn(client, session.state, session.video_hub)
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+
+
+class TestAsyncServer:
+
+    def test_detect_etag(self):
+        async def check(client, state, hub):
+            resp = await client.get("/detect")
+            assert resp.status == 200
+            data = await resp.json()
+            etag = resp.headers["ETag"]
+            assert etag == f'"{data["version"]}"'
+            resp = await client.get("/detect", headers={"If-None-Match": etag})
+            assert resp.status == 304
+        run_with_client(check)
+
+    def test_detect_long_poll_wakes(self):
+        async def check(client, state, hub):
+            timer = threading.Timer(0.1, state.start_search, args=("cup", "杯子"))
+            timer.start()
+            resp = await client.get("/detect", params={"since": 0, "wait": 5000})
+            assert resp.status == 200
+            assert (await resp.json())["search_mode"] is True
+            timer.join()
+        run_with_client(check)
+
+    def test_detect_long_poll_timeout(self):
+        async def check(client, state, hub):
+            resp = await client.get("/detect", params={"since": 0, "wait": 100})
+            assert resp.status == 304
+        run_with_client(check)
+
+    def test_events_snapshot_then_delta(self):
+        async def check(client, state, hub):
+            resp = await client.get("/events")
+            first = await resp.content.readuntil(b"\n\n")
+            assert first.startswith(b"event: snapshot")
+            state.add_voice_log("user", "你好")
+            second = await asyncio.wait_for(resp.content.readuntil(b"\n\n"), 5.0)
+            assert second.startswith(b"event: delta")
+            assert "你好".encode() in second
+            resp.close()
+        run_with_client(check)
+
+    def test_video_receives_published_frames(self):
+        async def check(client, state, hub):
+            resp = await client.get("/video", params={"profile": "high"})
+            assert resp.headers["Content-Type"].startswith("multipart/x-mixed-replace")
+            await resp.content.readuntil(b"\r\n--frame")  # 占位图
+            while hub.client_count == 0:
+                await asyncio.sleep(0.01)
+            threading.Thread(target=hub.publish, args=(b"JPEGDATA", "high")).start()
+            data = await asyncio.wait_for(resp.content.readuntil(b"JPEGDATA"), 5.0)
+            assert data.endswith(b"JPEGDATA")
+            resp.close()
+        run_with_client(check)
+
+    def test_flask_routes_forwarded(self):
+        async def check(client, state, hub):
+            resp = await client.get("/health")
+            assert await resp.json() == {"ok": True}
+            resp = await client.post("/echo?q=%E4%BD%A0", data="body")
+            assert await resp.json() == {"q": "你", "body": "body"}
+            resp = await client.get("/missing")
+            assert resp.status == 404
+        run_with_client(check)
+
+    def test_thread_count_flat(self):
+        """观看者增加时线程数不变"""
+        async def check(client, state, hub):
+            await client.get("/health")  # 先让 WSGI 线程池创建线程
+            before = threading.active_count()
+            streams = []
+            for i in range(20):
+                streams.append(await client.get("/video", params={"profile": "low"}))
+                streams.append(await client.get("/events"))
+            while hub.client_count < 20:
+                await asyncio.sleep(0.01)
+            assert threading.active_count() <= before + 1
+            for resp in streams:
+                resp.close()
+        run_with_client(check)
+
+    def test_device_namespaces(self):
+        """/d/<设备ID>/ 下的端点只反映该设备的状态，不带前缀的端点对应默认设备"""
+        devices = DeviceRegistry()
+        devices.add("default", "10.0.0.1")
+        alice = devices.add("alice", "10.0.0.2")
+
+        async def check(client, state, hub):
+            alice.state.start_search("cup", "杯子")
+            resp = await client.get("/d/alice/detect")
+            assert (await resp.json())["search_mode"] is True
+            resp = await client.get("/detect")
+            assert (await resp.json())["search_mode"] is False
+            resp = await client.get("/d/default/detect")
+            assert (await resp.json())["search_mode"] is False
+            resp = await client.get("/d/bob/detect")
+            assert resp.status == 404
+            # 长轮询只被本设备的发布唤醒
+            timer = threading.Timer(0.1, alice.state.add_voice_log, args=("user", "你好"))
+            timer.start()
+            resp = await client.get("/detect", params={"since": state.version, "wait": 300})
+            assert resp.status == 304
+            timer.join()
+        run_with_client(check, devices)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+多路批量推理调度器单元测试
+
+使用记录批大小的假视觉服务，测试凑批、结果分发、每路 FPS 目标与最长排队时间
+"""
+import time
+
+import numpy as np
+
+from services.batch_scheduler import BatchScheduler
+from services.state import AppState
+
+
+class FakeVision:
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, frames):
+        self.batches.append(len(frames))
+        return [[{"label": "v", "conf": float(f[0, 0, 0])}] for f in frames], 5.0
+
+
+def _state_with_frame(value):
+    state = AppState()
+    state.update_frame(np.full((4, 4, 3), value, dtype=np.uint8), time.time())
+    return state
+
+
+class TestBatchScheduler:
+
+    def test_streams_batched_and_scattered(self):
+        vision = FakeVision()
+        sched = BatchScheduler(vision, window_ms=50)
+        states = [_state_with_frame(v) for v in (1, 2, 3)]
+        streams = [sched.register(f"dev{i}", lambda s=s: s.frame) for i, s in enumerate(states)]
+        batch = sched.collect()
+        sched.run_batch(batch)
+        assert vision.batches == [3]
+        for stream, value in zip(streams, (1, 2, 3)):
+            snap, boxes, infer_ms = stream.get(timeout=0.1)
+            assert boxes[0]["conf"] == value
+            assert snap.seq == 1
+
+    def test_same_frame_not_reinferred(self):
+        sched = BatchScheduler(FakeVision())
+        state = _state_with_frame(1)
+        sched.register("dev", lambda: state.frame, fps=1000)
+        sched.run_batch(sched.collect())
+        time.sleep(0.01)
+        assert sched.collect() == []
+        state.update_frame(np.zeros((4, 4, 3), dtype=np.uint8), time.time())
+        assert len(sched.collect()) == 1
+
+    def test_fps_target(self):
+        sched = BatchScheduler(FakeVision())
+        state = _state_with_frame(1)
+        sched.register("dev", lambda: state.frame, fps=5)
+        sched.run_batch(sched.collect())
+        state.update_frame(np.zeros((4, 4, 3), dtype=np.uint8), time.time())
+        assert sched.collect() == []  # 未到 200 ms 间隔
+        time.sleep(0.21)
+        assert len(sched.collect()) == 1
+
+    def test_max_queue_bounds_wait(self):
+        """另一路在窗口内到期但一直没有新帧时，最多等待最长排队时间"""
+        sched = BatchScheduler(FakeVision(), window_ms=500)
+        ready = _state_with_frame(1)
+        idle = AppState()  # 没有画面
+        sched.register("ready", lambda: ready.frame, max_queue_ms=30)
+        sched.register("idle", lambda: idle.frame, max_queue_ms=30)
+        t0 = time.time()
+        batch = sched.collect()
+        assert len(batch) == 1
+        assert time.time() - t0 < 0.2
+
+    def test_offline_stream_not_waited(self):
+        """已到期但相机离线 (没有新帧) 的路不拖慢其他路"""
+        sched = BatchScheduler(FakeVision(), window_ms=500)
+        live = _state_with_frame(1)
+        offline = AppState()
+        sched.register("live", lambda: live.frame, max_queue_ms=500)
+        sched.register("offline", lambda: offline.frame, max_queue_ms=500)
+        t0 = time.time()
+        assert len(sched.collect()) == 1
+        assert time.time() - t0 < 0.05
+
+    def test_single_stream_no_wait(self):
+        sched = BatchScheduler(FakeVision(), window_ms=500)
+        state = _state_with_frame(1)
+        sched.register("dev", lambda: state.frame)
+        t0 = time.time()
+        assert len(sched.collect()) == 1
+        assert time.time() - t0 < 0.05
+
+    def test_background_thread_delivers(self):
+        vision = FakeVision()
+        sched = BatchScheduler(vision)
+        state = _state_with_frame(7)
+        stream = sched.register("dev", lambda: state.frame)
+        sched.start()
+        try:
+            result = stream.get(timeout=2.0)
+        finally:
+            sched.stop()
+        assert result is not None and result[1][0]["conf"] == 7
+        assert sched.get_stats()["frames"] >= 1
+
+    def test_pace_adjusts_interval_and_skips(self):
+        """pace 回调按运动状态调整本路间隔，返回 None 时跳过当前帧"""
+        sched = BatchScheduler(FakeVision())
+        state = _state_with_frame(1)
+        pace = {"interval": 0.5}
+        stream = sched.register("dev", lambda: state.frame, fps=100, pace=lambda base: pace["interval"])
+        sched.run_batch(sched.collect())
+        assert stream.interval == 0.5
+        state.update_frame(np.zeros((4, 4, 3), dtype=np.uint8), time.time())
+        assert sched.collect() == []  # 静止降频：未到 500 ms
+        stream.next_due = 0.0
+        pace["interval"] = None       # 快速转头
+        assert sched.collect() == []
+        assert sched.collect() == []
+        assert stream.get_stats()["motion_skipped"] == 1  # 同一帧只计一次
+        pace["interval"] = 0.01
+        assert len(sched.collect()) == 1
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+相机闭环码控单元测试
+
+测试按处理链路耗时选择发送帧率、拥塞时先降画质再降分辨率、恢复期后逐步回升、
+按警报等级以分辨率换帧率，以及控制周期只下发变化的设置
+"""
+import time
+
+from services import config
+from services.camera_controller import CameraMeasure, CameraRateController, CameraTuner
+from services.camera_ingest import FrameSlot
+from services.device_registry import DeviceRegistry
+
+HEALTHY = CameraMeasure(arrival_fps=10.0, infer_ms=20.0, decode_ms=3.0, age_ms=60.0)
+CONGESTED = CameraMeasure(arrival_fps=10.0, infer_ms=20.0, decode_ms=3.0, age_ms=900.0)
+
+
+def _run(tuner, measure, level, start, cycles):
+    """按控制周期连续调用，返回最后一次结果与结束时间"""
+    result = None
+    t = start
+    for _ in range(cycles):
+        result = tuner.update(measure, level, t)
+        t += config.CAMERA_CTRL_INTERVAL
+    return result, t
+
+
+class TestCameraTuner:
+
+    def test_fps_follows_pipeline(self):
+        tuner = CameraTuner()
+        # 推理 200 ms/帧：可消费 5 FPS × 余量
+        _, _, fps = tuner.update(CameraMeasure(arrival_fps=10.0, infer_ms=200.0), 3, 0.0)
+        assert fps == round(5 * config.CAMERA_CTRL_HEADROOM)
+        # 推理很快：受警报等级的帧率上限约束
+        _, _, fps = tuner.update(HEALTHY, 3, 1.0)
+        assert fps == config.CAMERA_CTRL_PROFILES[3][1]
+
+    def test_calm_upgrades_resolution_after_recovery(self):
+        tuner = CameraTuner()
+        assert tuner.update(HEALTHY, 0, 0.0)[0] == "VGA"         # 未过恢复期不升级
+        (size, _, fps), _ = _run(tuner, HEALTHY, 0, 1.0, int(config.CAMERA_CTRL_RECOVER_S) + 2)
+        assert size == "SVGA" and fps == config.CAMERA_CTRL_PROFILES[0][1]
+
+    def test_alert_trades_resolution_for_fps(self):
+        tuner = CameraTuner()
+        _, t = _run(tuner, HEALTHY, 0, 0.0, int(config.CAMERA_CTRL_RECOVER_S) + 3)
+        assert tuner.framesize == "SVGA"
+        size, _, fps = tuner.update(HEALTHY, 2, t)                # 风险出现：立即降分辨率、提帧率
+        assert size == "VGA" and fps == config.CAMERA_CTRL_PROFILES[2][1]
+
+    def test_congestion_degrades_quality_then_resolution(self):
+        best, worst = config.CAMERA_CTRL_QUALITY
+        tuner = CameraTuner()
+        tuner.framesize = "SVGA"
+        size, quality, fps = tuner.update(CONGESTED, 0, 0.0)
+        assert size == "SVGA" and quality == config.CAMERA_CTRL_QUALITY_START + config.CAMERA_CTRL_QUALITY_STEP
+        assert fps < config.CAMERA_CTRL_PROFILES[0][1]
+        (size, quality, _), t = _run(tuner, CONGESTED, 0, 1.0, 10)
+        assert quality == worst and size == "VGA"
+        # 降分辨率后短期内不再升回
+        (size, quality, _), _ = _run(tuner, HEALTHY, 0, t, int(config.CAMERA_CTRL_RECOVER_S) + 5)
+        assert size == "VGA" and best <= quality < worst
+
+    def test_link_bound_reduces_bytes(self):
+        tuner = CameraTuner()
+        _, _, fps = tuner.update(HEALTHY, 1, 0.0)
+        slow = CameraMeasure(arrival_fps=fps * config.CAMERA_CTRL_LINK_RATIO / 2, infer_ms=20.0)
+        _, quality, _ = tuner.update(slow, 1, 1.0)
+        assert quality > config.CAMERA_CTRL_QUALITY_START and tuner.reason == "link"
+
+    def test_settling_ignores_stale_measurements(self):
+        tuner = CameraTuner()
+        t = 0.0
+        while tuner.update(HEALTHY, 0, t)[0] != "SVGA":
+            t += config.CAMERA_CTRL_INTERVAL
+        quality = tuner.quality
+        tuner.update(CONGESTED, 0, t + config.CAMERA_CTRL_INTERVAL)   # 相机正在切换分辨率
+        assert tuner.quality <= quality and tuner.reason == "ok"
+
+
+class FakeLink:
+    transport = "ws"
+
+    def __init__(self):
+        self.framesize = self.quality = self.fps = None
+        self.sent = []
+
+    def set_framesize(self, v):
+        self.framesize = v
+        self.sent.append(("framesize", v))
+
+    def set_quality(self, v):
+        self.quality = v
+        self.sent.append(("quality", v))
+
+    def set_fps(self, v):
+        self.fps = v
+        self.sent.append(("fps", v))
+
+
+class TestCameraRateController:
+
+    def _session(self):
+        devices = DeviceRegistry()
+        session = devices.add("dev", "10.0.0.1")
+        session.camera = FrameSlot("dev", session.state, "ws")
+        session.camera_link = FakeLink()
+        return devices, session
+
+    def test_step_sends_only_changes(self):
+        devices, session = self._session()
+        ctrl = CameraRateController(devices, interval=1.0)
+        now = time.time()
+        ctrl.step(now)                                  # 首个周期只记录计数
+        assert session.camera_link.sent == []
+        session.camera.received += 10
+        session.camera.bytes_received += 50000
+        ctrl.step(now + 1.0)
+        sent = dict(session.camera_link.sent)
+        assert set(sent) == {"framesize", "quality", "fps"}
+        stats = ctrl.get_stats()["devices"][0]
+        assert stats["arrival_fps"] == 10.0 and stats["kbps"] == 400.0
+        # 设置未变化时不重复下发
+        session.camera_link.sent.clear()
+        session.camera.received += 10
+        ctrl.step(now + 2.0)
+        assert session.camera_link.sent == []
+
+    def test_skips_without_transport_or_frames(self):
+        devices, session = self._session()
+        ctrl = CameraRateController(devices, interval=1.0)
+        now = time.time()
+        ctrl.step(now)
+        ctrl.step(now + 1.0)                            # 没有收到帧
+        session.camera_link.transport = None
+        session.camera.received += 10
+        ctrl.step(now + 2.0)                            # 没有控制通道
+        assert session.camera_link.sent == [] and ctrl.get_stats()["devices"] == []
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+相机接入引擎单元测试
+
+测试增量 MJPEG 分帧 (按长度 / 按标记、任意切分)、帧槽只解码最新一帧，
+以及单事件循环同时拉取多路 MJPEG 与消费 WebSocket 推流
+"""
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from services.camera_ingest import CameraIngestEngine, FrameSlot, MJPEGDemuxer
+from services.state import AppState
+from services.video_broadcaster import make_chunk
+
+
+def _jpeg(value: int) -> bytes:
+    frame = np.full((24, 32, 3), value, dtype=np.uint8)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+def _feed_split(demux, data: bytes, step: int):
+    frames = []
+    for i in range(0, len(data), step):
+        frames += demux.feed(data[i:i + step])
+    return frames
+
+
+class TestMJPEGDemuxer:
+
+    @pytest.mark.parametrize("step", [1, 7, 4096])
+    def test_by_length(self, step):
+        jpgs = [_jpeg(v) for v in (10, 120, 240)]
+        stream = b"".join(make_chunk(j, seq) for seq, j in enumerate(jpgs))
+        assert _feed_split(MJPEGDemuxer(), stream, step) == jpgs
+
+    @pytest.mark.parametrize("step", [1, 7, 4096])
+    def test_by_marker_without_length(self, step):
+        jpgs = [_jpeg(v) for v in (10, 120, 240)]
+        stream = b"".join(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + j + b"\r\n" for j in jpgs)
+        assert _feed_split(MJPEGDemuxer(), stream, step) == jpgs
+
+    def test_garbage_resyncs(self):
+        demux = MJPEGDemuxer(max_frame=1024)
+        assert demux.feed(b"x" * 5000) == []
+        jpg = _jpeg(50)
+        assert demux.feed(make_chunk(jpg)) == [jpg]
+
+
+class TestFrameSlot:
+
+    def test_only_latest_decoded(self):
+        state = AppState()
+        published = []
+        slot = FrameSlot("dev", state, "push", on_jpeg=lambda jpg, seq: published.append(seq))
+        assert slot.put(_jpeg(10), 1.0) is True
+        assert slot.put(_jpeg(20), 2.0) is False   # 已有解码在排队
+        assert slot.put(_jpeg(30), 3.0) is False
+        slot.drain()
+        assert slot.received == 3 and slot.dropped == 2 and slot.decoded == 1
+        assert state.frame.ts == 3.0 and abs(int(state.frame.raw[0, 0, 0]) - 30) <= 2
+        assert published == [state.frame.seq]
+        assert slot.put(_jpeg(40), 4.0) is True    # 解码完成后重新调度
+
+
+pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+
+async def _mjpeg_handler(request):
+    resp = web.StreamResponse(headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame"})
+    await resp.prepare(request)
+    value = int(request.match_info["value"])
+    try:
+        while True:
+            await resp.write(make_chunk(_jpeg(value)))
+            await asyncio.sleep(0.02)
+    except ConnectionResetError:
+        pass
+    return resp
+
+
+class TestCameraIngestEngine:
+
+    def test_many_streams_one_loop(self):
+        started = threading.Event()
+        holder = {}
+
+        def serve():
+            async def main():
+                app = web.Application()
+                app.router.add_get("/stream/{value}", _mjpeg_handler)
+                runner = web.AppRunner(app)
+                await runner.setup()
+                site = web.TCPSite(runner, "127.0.0.1", 0)
+                await site.start()
+                holder["port"] = runner.addresses[0][1]
+                holder["loop"] = asyncio.get_running_loop()
+                holder["stop"] = asyncio.Event()
+                started.set()
+                await holder["stop"].wait()
+                await runner.cleanup()
+            asyncio.run(main())
+
+        server = threading.Thread(target=serve, daemon=True)
+        server.start()
+        assert started.wait(5)
+
+        engine = CameraIngestEngine(decode_workers=2)
+        try:
+            threads_before = threading.active_count()
+            states = [AppState() for _ in range(6)]
+            for i, state in enumerate(states):
+                engine.add_mjpeg(f"dev{i}", f"http://127.0.0.1:{holder['port']}/stream/{i * 40}", state)
+            deadline = time.time() + 10
+            while time.time() < deadline and any(s.frame.seq < 3 for s in states):
+                time.sleep(0.05)
+            # 每路帧写入各自的状态
+            for i, state in enumerate(states):
+                assert state.frame.seq >= 3
+                assert abs(int(state.frame.raw[0, 0, 0]) - i * 40) <= 2
+            # 相机增多不增加线程 (至多解码线程池按需创建)
+            assert threading.active_count() <= threads_before + engine.decode_workers
+            stats = engine.get_stats()
+            assert stats["cameras"] == 6 and all(s["connected"] for s in stats["streams"])
+        finally:
+            engine.close()
+            holder["loop"].call_soon_threadsafe(holder["stop"].set)
+            server.join(timeout=5)
+
+    def test_ingest_ws(self):
+        engine = CameraIngestEngine(decode_workers=1)
+        state = AppState()
+        texts = []
+
+        async def main():
+            slot = engine.attach("dev", state, "ws")
+
+            async def handler(request):
+                ws = web.WebSocketResponse()
+                await ws.prepare(request)
+                await engine.ingest_ws(slot, ws, on_text=texts.append)
+                return ws
+
+            app = web.Application()
+            app.router.add_get("/ws/camera", handler)
+            from aiohttp.test_utils import TestClient, TestServer
+            client = TestClient(TestServer(app))
+            await client.start_server()
+            try:
+                ws = await client.ws_connect("/ws/camera")
+                await ws.send_bytes(_jpeg(77))
+                await ws.send_str("hello")
+                await ws.close()
+            finally:
+                await client.close()
+
+        try:
+            asyncio.run(main())
+            deadline = time.time() + 5
+            while state.frame.seq == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            assert abs(int(state.frame.raw[0, 0, 0]) - 77) <= 2
+            assert texts == ["hello"]
+        finally:
+            engine.close()
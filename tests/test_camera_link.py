@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+相机控制通道单元测试
+
+测试控制命令按固件范围约束、WebSocket 推流写入设备状态、高清快照应答
+(SNAP:BEGIN / 二进制 / SNAP:END，含中间插入的普通帧) 以及快照超时
+"""
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from services.camera_link import CameraLink
+
+pytest.importorskip("aiohttp")
+import aiohttp  # noqa: E402
+
+from services.camera_ingest import CameraIngestEngine  # noqa: E402
+from services.camera_link import CameraPushServer  # noqa: E402
+from services.device_registry import DeviceRegistry  # noqa: E402
+
+
+def _jpeg(value: int, size=(24, 32)) -> bytes:
+    frame = np.full((size[0], size[1], 3), value, dtype=np.uint8)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+class TestCameraLinkCommands:
+
+    def test_values_constrained_offline(self):
+        link = CameraLink("dev")
+        assert link.set_quality(2) is False      # 未连接：不下发，但记录设置供连入后补发
+        assert link.quality == 5
+        link.set_quality(99)
+        assert link.quality == 40
+        link.set_fps(-3)
+        assert link.fps == 0
+        link.set_fps(2)
+        assert link.fps == 5
+        link.set_fps(120)
+        assert link.fps == 60
+        link.set_framesize("svga")
+        assert link.framesize == "SVGA"
+        with pytest.raises(ValueError):
+            link.set_framesize("UXGA")
+
+    def test_snapshot_offline(self):
+        assert CameraLink("dev").snapshot(timeout=0.1) is None
+
+
+class FakeFirmware:
+    """模拟 example/compile.ino 的相机 WebSocket 客户端 (独立线程与事件循环)"""
+
+    def __init__(self, url: str, snap_ok: bool = True):
+        self.url = url
+        self.snap_ok = snap_ok
+        self.commands = []
+        self.connected = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self._stop = None
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self._run(),), daemon=True)
+        self.thread.start()
+        assert self.connected.wait(5)
+
+    async def _run(self):
+        self._stop = asyncio.Event()
+        async with aiohttp.ClientSession() as http:
+            async with http.ws_connect(self.url) as ws:
+                self.connected.set()
+                sender = asyncio.ensure_future(self._send_frames(ws))
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    self.commands.append(msg.data)
+                    if msg.data == "SNAP:HQ" and self.snap_ok:
+                        await ws.send_str("SNAP:BEGIN")
+                        await ws.send_bytes(_jpeg(60))                # 发送任务插入的普通帧
+                        await ws.send_bytes(_jpeg(200, (96, 128)))    # 高清快照
+                        await ws.send_str("SNAP:END")
+                    if msg.data == "BYE":
+                        break
+                sender.cancel()
+
+    async def _send_frames(self, ws):
+        while True:
+            await ws.send_bytes(_jpeg(90))
+            await asyncio.sleep(0.02)
+
+
+class TestCameraPushServer:
+
+    def setup_method(self):
+        self.engine = CameraIngestEngine(decode_workers=1)
+        self.devices = DeviceRegistry(auto_register=True)
+        self.devices.add("default", "10.0.0.1")
+        self.server = CameraPushServer(self.engine, self.devices, host="127.0.0.1", port=0)
+        self.server.start()
+        self.firmware = None
+
+    def teardown_method(self):
+        if self.firmware is not None:
+            link = self.devices.get("glasses").camera_link
+            link.send("BYE")
+            self.firmware.thread.join(timeout=5)
+        self.server.close()
+        self.engine.close()
+
+    def _connect(self, **kwargs):
+        url = f"http://127.0.0.1:{self.server.port}/ws/camera?device=glasses"
+        self.firmware = FakeFirmware(url, **kwargs)
+        session = self.devices.get("glasses")
+        deadline = time.time() + 5
+        while session.state.frame.seq < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        return session
+
+    def test_frames_and_commands(self):
+        session = self._connect()
+        assert session.camera_link.connected
+        assert abs(int(session.state.frame.raw[0, 0, 0]) - 90) <= 2
+        assert self.devices.default.state.frame.seq == 0   # 按 ?device= 写入对应会话
+        session.camera_link.set_quality(50)
+        session.camera_link.set_fps(15)
+        deadline = time.time() + 5
+        while len(self.firmware.commands) < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        assert self.firmware.commands == ["SET:QUALITY=40", "SET:FPS=15"]
+
+    def test_snapshot(self):
+        session = self._connect()
+        session.camera_link.set_quality(12)
+        jpg = session.camera_link.snapshot(timeout=3.0)
+        assert jpg is not None
+        img = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR)
+        assert img.shape[:2] == (96, 128)                   # 取标记之间最大的一帧
+        deadline = time.time() + 5
+        while self.firmware.commands[-1:] != ["SET:QUALITY=12"] and time.time() < deadline:
+            time.sleep(0.02)
+        # 快照后固件恢复编译时画质，重新下发设置的画质
+        assert self.firmware.commands == ["SET:QUALITY=12", "SNAP:HQ", "SET:QUALITY=12"]
+        # 快照不作为视频帧写入
+        assert session.state.frame.raw.shape[:2] == (24, 32)
+
+    def test_unknown_peer_rejected(self):
+        """未登记 ID、未带 ID 且来源 IP 不匹配的连接一律 404，不归入默认设备"""
+        import aiohttp
+        self.devices.auto_register = False
+
+        async def connect(query):
+            async with aiohttp.ClientSession() as http:
+                try:
+                    async with http.ws_connect(f"http://127.0.0.1:{self.server.port}/ws/camera{query}"):
+                        return 101
+                except aiohttp.WSServerHandshakeError as e:
+                    return e.status
+
+        for query in ("?device=stranger", ""):
+            status = asyncio.run_coroutine_threadsafe(connect(query), self.engine.loop).result(timeout=5)
+            assert status == 404
+        assert self.devices.default.camera_link is None
+        assert self.devices.default.state.frame.seq == 0
+
+    def test_snapshot_timeout(self):
+        session = self._connect(snap_ok=False)
+        t0 = time.time()
+        assert session.camera_link.snapshot(timeout=0.3) is None
+        assert time.time() - t0 < 1.0
+        assert session.camera_link.snapshot_failures == 1
+
+
+class TestHttpControl:
+
+    def test_set_commands_map_to_control_endpoint(self):
+        from aiohttp import web
+        engine = CameraIngestEngine(decode_workers=1)
+        requests = []
+
+        async def control(request):
+            requests.append((request.query["var"], request.query["val"]))
+            return web.Response()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_get("/control", control)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", 0).start()
+            return runner
+
+        runner = asyncio.run_coroutine_threadsafe(serve(), engine.loop).result(timeout=5)
+        try:
+            port = runner.addresses[0][1]
+            link = CameraLink("dev", http_base=f"http://127.0.0.1:{port}", loop=engine.loop)
+            assert link.transport == "http" and not link.connected
+            assert link.set_framesize("SVGA") and link.set_quality(3) and link.set_fps(12)
+            assert link.snapshot(timeout=0.1) is None           # 高清快照只能经 WebSocket
+            deadline = time.time() + 5
+            while len(requests) < 3 and time.time() < deadline:
+                time.sleep(0.02)
+            assert sorted(requests) == [("fps", "12"), ("framesize", "9"), ("quality", "5")]
+            assert link.http_errors == 0
+        finally:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), engine.loop).result(timeout=5)
+            engine.close()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+设备会话注册表与麦克风握手单元测试
+
+测试会话隔离、按握手 ID / 来源 IP / 默认设备路由，以及握手读取不吞掉旧固件的 PCM 数据
+"""
+import socket
+import threading
+
+from services.device_registry import DeviceRegistry
+from services.microphone_service import MicrophoneService
+
+
+def _registry(**kwargs):
+    devices = DeviceRegistry(**kwargs)
+    devices.add("alice", "10.0.0.1")
+    devices.add("bob", "10.0.0.2")
+    return devices
+
+
+class TestDeviceRegistry:
+
+    def test_sessions_isolated(self):
+        devices = _registry()
+        alice, bob = devices.get("alice"), devices.get("bob")
+        alice.state.start_search("cup", "杯子")
+        assert alice.state.search.active and not bob.state.search.active
+        assert alice.payloads is not bob.payloads and alice.video_hub is not bob.video_hub
+
+    def test_first_device_is_default(self):
+        devices = _registry()
+        assert devices.default.id == "alice"
+        assert devices.get() is devices.default
+        assert devices.get("carol") is None
+
+    def test_resolve_order(self):
+        devices = _registry(auto_register=False)
+        assert devices.resolve("bob", "10.0.0.1").id == "bob"       # 握手优先于 IP
+        assert devices.resolve(None, "10.0.0.2").id == "bob"        # 旧固件按来源 IP
+        assert devices.resolve(None, "10.9.9.9").id == "alice"      # 兜底默认设备
+        assert devices.resolve("carol", "10.0.0.2").id == "bob"     # 未登记 ID 不自动创建
+        assert devices.resolve("carol", "10.9.9.9", fallback_default=False) is None
+        assert devices.resolve(None, "10.0.0.2", fallback_default=False).id == "bob"
+        assert devices.get("carol") is None
+
+    def test_auto_register_calls_hook(self):
+        created = []
+        devices = _registry(on_create=created.append, auto_register=True)
+        session = devices.resolve("carol", "10.0.0.3")
+        assert session.id == "carol" and session.ip == "10.0.0.3"
+        assert [s.id for s in created] == ["alice", "bob", "carol"]
+        assert devices.resolve("carol", "10.0.0.3") is session
+
+    def test_auto_register_allowlist_and_cap(self):
+        devices = _registry(auto_register=True, allowed_ids={"carol", "dave"}, max_sessions=3)
+        assert devices.resolve("mallory", "10.0.0.9").id == "alice"   # 不在白名单
+        assert devices.resolve("carol", "10.0.0.3").id == "carol"
+        assert devices.resolve("dave", "10.0.0.4").id == "alice"      # 已达上限
+        assert [s.id for s in devices.sessions()] == ["alice", "bob", "carol"]
+
+    def test_auto_register_off_by_default(self):
+        assert DeviceRegistry().auto_register is False
+
+    def test_route_mic_delivers_to_session_voice(self):
+        devices = _registry()
+        received = []
+
+        class FakeVoice:
+            def on_recording_complete(self, path):
+                received.append(path)
+
+        devices.get("bob").voice = FakeVoice()
+        name, callback = devices.route_mic("bob", "10.0.0.1")
+        callback("cmd.wav")
+        assert name == "bob" and received == ["cmd.wav"]
+
+
+class TestMicHandshake:
+
+    def setup_method(self):
+        self.mic = MicrophoneService.__new__(MicrophoneService)  # 不启动监听线程
+        self.a, self.b = socket.socketpair()
+
+    def teardown_method(self):
+        self.a.close()
+        self.b.close()
+
+    def test_handshake_consumed(self):
+        self.a.sendall(b"DEV:alice\n" + b"\x01\x02" * 8)
+        assert self.mic._read_handshake(self.b) == "alice"
+        assert self.b.recv(64) == b"\x01\x02" * 8
+
+    def test_legacy_stream_untouched(self):
+        pcm = b"\x10\x00\xf0\xff" * 8
+        self.a.sendall(pcm)
+        assert self.mic._read_handshake(self.b) is None
+        assert self.b.recv(64) == pcm
+
+    def test_split_prefix(self):
+        self.a.sendall(b"DE")
+        threading.Timer(0.05, self.a.sendall, args=(b"V:bob\nPCM",)).start()
+        assert self.mic._read_handshake(self.b) == "bob"
+        assert self.b.recv(64) == b"PCM"
+
+    def test_invalid_id_rejected(self):
+        self.a.sendall(b"DEV:../../etc\n")
+        assert self.mic._read_handshake(self.b) is None
+
+    def test_silent_client_times_out(self):
+        assert self.mic._read_handshake(self.b) is None
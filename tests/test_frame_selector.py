@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+最佳帧选择单元测试
+
+测试拉普拉斯方差清晰度、新鲜度窗口内挑选最清晰的帧、最小提升倍数，以及 AppState 的取帧接口
+"""
+import time
+
+import cv2
+import numpy as np
+
+from services import config
+from services.frame_selector import SharpFrameRing, sharpness
+from services.state import AppState, FrameSnapshot
+
+
+def _sharp(h=480, w=640):
+    """棋盘格：边缘锐利"""
+    yy, xx = np.mgrid[0:h, 0:w]
+    board = (((yy // 16) + (xx // 16)) % 2 * 255).astype(np.uint8)
+    return cv2.cvtColor(board, cv2.COLOR_GRAY2BGR)
+
+
+def _blurred(ksize=21):
+    return cv2.GaussianBlur(_sharp(), (ksize, ksize), 0)
+
+
+def _snap(frame, ts, seq):
+    return FrameSnapshot(raw=frame, ts=ts, shape=frame.shape[:2], seq=seq)
+
+
+class TestSharpness:
+
+    def test_blur_scores_lower(self):
+        assert sharpness(_sharp()) > 5 * sharpness(_blurred())
+        assert sharpness(_blurred(9)) > sharpness(_blurred(31))
+
+    def test_resolution_independent_scale(self):
+        small = cv2.resize(_sharp(), (320, 240), interpolation=cv2.INTER_AREA)
+        big = _sharp()
+        assert 0.5 < sharpness(small) / sharpness(big) < 2.0
+
+    def test_flat_frame(self):
+        assert sharpness(np.zeros((120, 160, 3), dtype=np.uint8)) == 0.0
+
+
+class TestFrameRing:
+
+    def test_ring_keeps_latest(self):
+        ring = SharpFrameRing(size=3)
+        for i in range(5):
+            ring.push(_snap(_blurred(), float(i), i + 1))
+        stats = ring.get_stats()
+        assert stats["frames"] == 3
+
+    def test_picks_sharpest_fresh_frame(self):
+        ring = SharpFrameRing()
+        now = 100.0
+        ring.push(_snap(_blurred(), now - 0.3, 1))
+        ring.push(_snap(_sharp(), now - 0.2, 2))
+        ring.push(_snap(_blurred(), now - 0.1, 3))
+        ring.push(_snap(_blurred(31), now, 4))
+        assert ring.best(now=now).seq == 2
+        assert ring.replaced == 1 and ring.gain_avg > config.FRAME_BEST_MIN_GAIN
+
+    def test_stale_frames_ignored(self):
+        ring = SharpFrameRing()
+        now = 100.0
+        ring.push(_snap(_sharp(), now - 5.0, 1))
+        ring.push(_snap(_blurred(), now, 2))
+        assert ring.best(max_age=0.5, now=now).seq == 2
+
+    def test_latest_kept_without_clear_gain(self):
+        """旧帧只略清晰时保留最新帧 (新鲜度优先)"""
+        ring = SharpFrameRing()
+        now = 100.0
+        frame = _blurred()
+        ring.push(_snap(frame, now - 0.1, 1))
+        ring.push(_snap(frame, now, 2))
+        assert ring.best(now=now).seq == 2
+        assert ring.replaced == 0
+
+    def test_empty(self):
+        assert SharpFrameRing().best() is None
+
+
+class TestAppStateBestFrame:
+
+    def test_get_best_frame(self):
+        state = AppState()
+        assert state.get_best_frame() == (None, 0.0)
+        now = time.time()
+        sharp = _sharp()
+        state.update_frame(sharp, now - 0.1)
+        state.update_frame(_blurred(), now)
+        frame, ts = state.get_best_frame()
+        assert frame is sharp and ts == now - 0.1
+        assert state.get_frame()[1] == now  # 最新帧不受影响
+
+    def test_stale_falls_back_to_latest(self):
+        state = AppState()
+        state.update_frame(_sharp(), 10.0)
+        state.update_frame(_blurred(), 10.05)
+        assert state.get_best_frame()[1] == 10.05
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+视觉问答高清快照单元测试
+
+测试视觉任务优先使用并行拍摄的高清快照 (原始 JPEG、detail=high)、超时退回实时帧、
+读字问题改用读字 Prompt、警报较高时不拍快照，以及投机请求在识别文本判定为视觉问题时才拍快照、
+等待快照期间不占用线程池
+"""
+import base64
+import concurrent.futures
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from services import config
+from services.speculation import SpeculationPolicy, SpeculativeRequest
+from services.state import AppState
+from services.vision_cache import VisionDescriptionCache
+from services.voice_assistant import VoiceAssistant
+
+
+def _jpeg(value: int, size=(48, 64)) -> bytes:
+    frame = np.full((size[0], size[1], 3), value, dtype=np.uint8)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+class FakeLink:
+    connected = True
+
+    def __init__(self, jpg=None, delay=0.0):
+        self.jpg = jpg
+        self.delay = delay
+        self.calls = 0
+
+    def snapshot(self, timeout):
+        self.calls += 1
+        time.sleep(min(self.delay, timeout))
+        return None if self.delay >= timeout else self.jpg
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="门牌 302"))])
+
+    def sent(self):
+        content = self.requests[-1]["messages"][0]["content"]
+        image = content[1]["image_url"]
+        jpg = base64.b64decode(image["url"].split(",", 1)[1])
+        return content[0]["text"], image["detail"], jpg
+
+
+def _assistant(link):
+    va = VoiceAssistant.__new__(VoiceAssistant)   # 不初始化 API 客户端与工作线程
+    va.state = AppState()
+    va.client = FakeClient()
+    va.model_name = "test"
+    va.vision_cache = VisionDescriptionCache()
+    va.camera_link = link
+    va._snapshot_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    va.hq_stats = {"requested": 0, "used": 0, "fallback": 0, "skipped": 0}
+    va.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    va._streams, va._streams_lock = {}, threading.Lock()
+    return va
+
+
+LIVE = np.full((24, 32, 3), 90, dtype=np.uint8)
+
+
+class TestHQSnapshot:
+
+    def test_uses_hq_jpeg_and_read_prompt(self):
+        hq_jpg = _jpeg(200)
+        va = _assistant(FakeLink(hq_jpg, delay=0.05))
+        hq = va._request_hq_snapshot()
+        reply = va._generate_vision_description(LIVE, hq=hq, question=lambda: "帮我读一下上面写的")
+        assert reply == "门牌 302"
+        prompt, detail, jpg = va.client.sent()
+        assert jpg == hq_jpg and detail == "high"          # 原始快照直接上传，不重新编码
+        assert prompt == config.VISION_READ_PROMPT
+        assert va.hq_stats == {"requested": 1, "used": 1, "fallback": 0, "skipped": 0}
+
+    def test_timeout_falls_back_to_live_frame(self, monkeypatch):
+        monkeypatch.setattr(config, "VISION_HQ_TIMEOUT", 0.1)
+        va = _assistant(FakeLink(_jpeg(200), delay=5.0))
+        hq = va._request_hq_snapshot()
+        t0 = time.time()
+        va._generate_vision_description(LIVE, hq=hq, question=lambda: "前面有什么")
+        assert time.time() - t0 < 1.5
+        prompt, detail, jpg = va.client.sent()
+        assert cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR).shape == LIVE.shape
+        assert detail == "low" and prompt != config.VISION_READ_PROMPT
+        assert va.hq_stats["fallback"] == 1
+
+    def test_skipped_when_alert_high_or_offline(self):
+        link = FakeLink(_jpeg(200))
+        va = _assistant(link)
+        va.state.update_alert(config.VISION_HQ_MAX_ALERT + 1, "危险", None, True)
+        assert va._request_hq_snapshot() is None
+        assert va.hq_stats["skipped"] == 1
+        va.state.update_alert(0, "", None, False)
+        link.connected = False
+        assert va._request_hq_snapshot() is None
+        assert link.calls == 0
+
+    def test_question_resolved_at_send_time(self):
+        """投机请求在识别完成前启动，Prompt 按发出请求时已识别的文本选择"""
+        gate = threading.Event()
+        va = _assistant(FakeLink(_jpeg(200)))
+        heard = {"text": ""}
+        link = va.camera_link
+        link.snapshot = lambda timeout: gate.wait(1) and _jpeg(200)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(va._generate_vision_description, LIVE,
+                                 hq=va._request_hq_snapshot(), question=lambda: heard["text"])
+        heard["text"] = "这上面的字是什么"   # 快照拍摄期间识别出问题
+        gate.set()
+        future.result(timeout=5)
+        assert va.client.sent()[0] == config.VISION_READ_PROMPT
+
+
+class TestSpeculativeSnapshot:
+    """投机请求：识别文本判定为视觉问题时才拍快照，快照就绪后才占用工作线程"""
+
+    @pytest.fixture(autouse=True)
+    def _no_stream(self, monkeypatch):
+        monkeypatch.setattr(config, "STREAM_REPLY_ENABLED", False)
+
+    def _speculate(self, va):
+        req = SpeculativeRequest(
+            SpeculationPolicy(),
+            lambda begin_send: va._submit_vision(LIVE, begin_send, lambda: req.text, req.hq),
+            va._request_hq_snapshot)
+        req.start("early")
+        return req
+
+    def test_snapshot_on_vision_partial(self):
+        hq_jpg = _jpeg(200)
+        va = _assistant(FakeLink(hq_jpg, delay=0.05))
+        req = self._speculate(va)
+        time.sleep(0.05)
+        assert va.camera_link.calls == 0 and va.client.requests == []
+        req.on_partial("前面有什么")
+        assert va.camera_link.calls == 1
+        assert req.take().result(timeout=5) == "门牌 302"
+        assert va.client.sent()[2] == hq_jpg
+        assert va.hq_stats["used"] == 1
+
+    def test_discarded_speculation_skips_snapshot(self):
+        va = _assistant(FakeLink(_jpeg(200)))
+        req = self._speculate(va)
+        future = req.future
+        req.discard()
+        assert future.cancelled()
+        assert va.camera_link.calls == 0 and va.hq_stats["requested"] == 0
+        assert va.client.requests == []
+
+    def test_waiting_does_not_hold_worker(self):
+        """等待识别结果期间，共用线程池 (仅 1 个工作线程) 仍可执行其他任务"""
+        va = _assistant(FakeLink(_jpeg(200)))
+        req = self._speculate(va)
+        assert va.executor.submit(lambda: "other").result(timeout=0.5) == "other"
+        req.discard()
+
+    def test_live_frame_after_timeout(self, monkeypatch):
+        """迟迟没有判定为视觉问题时，等待 VISION_HQ_TIMEOUT 后用实时帧发出请求"""
+        monkeypatch.setattr(config, "VISION_HQ_TIMEOUT", 0.1)
+        va = _assistant(FakeLink(_jpeg(200)))
+        req = self._speculate(va)
+        assert req.future.result(timeout=2) == "门牌 302"
+        assert va.client.sent()[1] == "low"
+        assert va.hq_stats["fallback"] == 1
+        req.discard()
+        assert va.camera_link.calls == 0
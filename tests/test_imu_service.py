@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+IMU 接收与运动感知调度单元测试
+
+测试环形缓冲窗口、静止/步行/转头判定、推理间隔调整，以及 UDP 包解析与按来源 IP 路由
+"""
+import json
+import math
+import socket
+import time
+
+import pytest
+
+from services import config
+from services.device_registry import DeviceRegistry
+from services.imu_service import ImuService, ImuTrack, estimate_motion
+
+GRAVITY = (0.0, 0.0, 9.8)
+
+
+def _feed(track, seconds, now, accel=lambda t: GRAVITY, gyro=lambda t: (0.0, 0.0, 0.0)):
+    """以 IMU_RATE_HZ 写入截至 now 的 seconds 秒样本"""
+    n = int(seconds * config.IMU_RATE_HZ)
+    for i in range(n):
+        t = now - seconds + (i + 1) / config.IMU_RATE_HZ
+        track.add(t, t, 30.0, accel(t), gyro(t))
+
+
+def _packet(**overrides):
+    payload = {"ts": 1000, "temp_c": 31.5, "accel": {"x": 0, "y": 0, "z": 9.8}, "gyro": {"x": 0, "y": 0, "z": 0}}
+    payload.update(overrides)
+    return json.dumps(payload).encode()
+
+
+class TestImuTrack:
+
+    def test_ring_buffer_window(self):
+        track = ImuTrack("dev", capacity=10)
+        for i in range(25):
+            track.add(float(i), float(i), 0.0, (i, 0, 0), (0, 0, 0))
+        window = track.window(100.0, now=24.0)
+        assert len(window) == 10
+        assert list(window[:, 3]) == list(range(15, 25))  # 只保留最新的样本，按时间顺序
+        assert len(track.window(2.0, now=24.0)) == 3
+
+    def test_stationary(self):
+        track, now = ImuTrack("dev"), time.time()
+        _feed(track, 1.0, now)
+        motion = track.current(now)
+        assert motion.state == "stationary"
+        assert track.infer_interval(0.1) == pytest.approx(0.1 / config.MOTION_FPS_SCALE["stationary"])
+
+    def test_walking(self):
+        track, now = ImuTrack("dev"), time.time()
+        _feed(track, 1.0, now, accel=lambda t: (0.0, 0.0, 9.8 + 2.0 * math.sin(2 * math.pi * 2 * t)))
+        assert track.current(now).state == "walking"
+
+    def test_turning_and_blur(self):
+        track, now = ImuTrack("dev"), time.time()
+        _feed(track, 1.0, now, gyro=lambda t: (0.0, 0.0, 80.0))
+        assert track.current(now).state == "turning"
+        assert track.infer_interval(0.1) == pytest.approx(0.1 / config.MOTION_FPS_SCALE["turning"])
+        _feed(track, 0.5, now + 0.5, gyro=lambda t: (0.0, 200.0, 0.0))
+        assert track.infer_interval(0.1) is None
+
+    def test_unknown_or_stale_keeps_base(self):
+        track = ImuTrack("dev")
+        assert track.infer_interval(0.1) == 0.1
+        _feed(track, 1.0, time.time() - 10.0)
+        assert track.current().state == "unknown"
+        assert track.infer_interval(0.1) == 0.1
+
+    def test_estimate_needs_samples(self):
+        assert estimate_motion(ImuTrack("dev").window(1.0), time.time()).state == "unknown"
+
+
+class TestImuService:
+
+    def _registry(self):
+        registry = DeviceRegistry(auto_register=False)
+        for device_id, ip in (("alice", "10.0.0.1"), ("bob", "10.0.0.2")):
+            registry.add(device_id, ip).imu = ImuTrack(device_id)
+        return registry
+
+    def test_routes_by_ip_and_device_id(self):
+        registry = self._registry()
+        service = ImuService(registry)
+        assert service.handle(_packet(), "10.0.0.2", 1.0)
+        assert service.handle(_packet(dev="alice"), "10.0.0.9", 1.0)
+        assert registry.get("bob").imu.samples == 1
+        assert registry.get("alice").imu.samples == 1
+        assert registry.get("bob").imu.temp_c == 31.5
+        assert service.packets == 2
+
+    def test_never_creates_sessions(self):
+        registry = self._registry()
+        registry.auto_register = True
+        service = ImuService(registry)
+        assert not service.handle(_packet(dev="../evil id"), "10.0.0.1", 1.0)
+        assert not service.handle(_packet(dev="mallory"), "10.0.0.1", 1.0)
+        assert not service.handle(_packet(), "10.0.0.9", 1.0)  # 未登记的来源 IP
+        assert [s.id for s in registry.sessions()] == ["alice", "bob"]
+        assert service.bad_packets == 1 and service.unrouted == 2
+
+    def test_bad_packets(self):
+        service = ImuService(self._registry())
+        assert not service.handle(b"not json", "10.0.0.1", 1.0)
+        assert not service.handle(b"\xff\xfe", "10.0.0.1", 1.0)
+        assert not service.handle(json.dumps({"accel": {"x": 0}}).encode(), "10.0.0.1", 1.0)
+        assert service.bad_packets == 3 and service.packets == 0
+
+    def test_udp_receive(self):
+        registry = self._registry()
+        service = ImuService(registry, host="127.0.0.1", port=0)
+        service.start()
+        try:
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            for _ in range(5):
+                sender.sendto(_packet(dev="alice"), ("127.0.0.1", service.port))
+            sender.close()
+            deadline = time.time() + 2.0
+            while service.packets < 5 and time.time() < deadline:
+                time.sleep(0.01)
+            assert registry.get("alice").imu.samples == 5
+        finally:
+            service.stop()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+推理进程池单元测试
+
+使用不加载模型的假预测器，测试共享内存帧环、按帧序返回结果以及多进程交替处理
+"""
+import time
+
+import numpy as np
+import pytest
+
+from services.inference_pool import FrameRing, InferencePool
+
+
+class FakePredictor:
+    """在推理进程中运行：奇数帧耗时更长，使结果乱序完成"""
+
+    def predict(self, frame):
+        value = int(frame[0, 0, 0])
+        time.sleep(0.06 if value % 2 else 0.01)
+        box = {"label": "v", "conf": float(value), "x1": 0.0, "y1": 0.0,
+               "x2": float(frame.shape[1]), "y2": float(frame.shape[0])}
+        return [box], None, 1.0
+
+
+def _frame(value, shape=(48, 64)):
+    return np.full(shape + (3,), value, dtype=np.uint8)
+
+
+class TestFrameRing:
+
+    def test_write_view_release(self):
+        ring = FrameRing(2, (48, 64))
+        try:
+            a = ring.write(_frame(7))
+            b = ring.write(_frame(9, (24, 32)))
+            assert ring.write(_frame(1)) is None  # 没有空闲槽位
+            assert (FrameRing.view(ring.shm, a, ring.slot_bytes, (48, 64)) == 7).all()
+            assert (FrameRing.view(ring.shm, b, ring.slot_bytes, (24, 32)) == 9).all()
+            ring.release(a)
+            assert ring.write(_frame(3)) == a
+        finally:
+            ring.close()
+
+    def test_oversize_frame_rejected(self):
+        ring = FrameRing(1, (48, 64))
+        try:
+            assert not ring.fits(_frame(1, (96, 128)))
+            assert ring.write(_frame(1, (96, 128))) is None
+        finally:
+            ring.close()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    p = InferencePool(workers=2, max_shape=(48, 64), predictor="tests.test_inference_pool:FakePredictor")
+    assert p.wait_ready(timeout=120)
+    yield p
+    p.close()
+
+
+class TestInferencePool:
+
+    def test_results_in_frame_order(self, pool):
+        results = []
+        next_value = 0
+        deadline = time.time() + 30
+        while len(results) < 10 and time.time() < deadline:
+            if next_value < 10 and pool.submit(_frame(next_value), tag=next_value):
+                next_value += 1
+            r = pool.get(timeout=0.005)
+            if r is not None:
+                results.append(r)
+        assert [tag for tag, _, _ in results] == list(range(10))
+        # 检测结果来自对应帧 (推理进程读到的是共享内存中的正确帧)
+        assert [boxes[0]["conf"] for _, boxes, _ in results] == [float(v) for v in range(10)]
+        # 两个进程交替处理
+        assert all(w["done"] > 0 for w in pool.get_stats()["workers"])
+
+    def test_one_frame_per_worker(self, pool):
+        assert pool.submit(_frame(0), 0)
+        assert pool.submit(_frame(2), 1)
+        assert not pool.submit(_frame(4), 2)  # 两个进程都在忙
+        assert pool.in_flight == 2
+        got = []
+        deadline = time.time() + 10
+        while len(got) < 2 and time.time() < deadline:
+            r = pool.get(timeout=0.01)
+            if r is not None:
+                got.append(r[0])
+        assert got == [0, 1]
+
+    def test_oversize_frame_not_submitted(self, pool):
+        frame = _frame(1, (96, 128))
+        assert not pool.fits(frame)
+        assert not pool.submit(frame)
+
+
+class TestWorkerRestart:
+
+    def test_restart_does_not_block_get(self):
+        pool = InferencePool(workers=1, max_shape=(48, 64), predictor="tests.test_inference_pool:FakePredictor")
+        try:
+            assert pool.wait_ready(timeout=120)
+            old_pid = pool.get_stats()["workers"][0]["pid"]
+            pool._workers[0].proc.kill()
+            # 发现进程退出并启动替换进程，但 get() 不等待其加载完成
+            deadline = time.time() + 10
+            while pool.get_stats()["restarts"] == 0 and time.time() < deadline:
+                t0 = time.time()
+                assert pool.get(timeout=0.05) is None
+                assert time.time() - t0 < 1.0
+            stats = pool.get_stats()
+            assert stats["restarts"] == 1 and not stats["workers"][0]["ready"]
+            assert not pool.submit(_frame(1), 1)
+            # 替换进程连回后恢复工作
+            deadline = time.time() + 60
+            while not pool.get_stats()["workers"][0]["ready"] and time.time() < deadline:
+                pool.get(timeout=0.05)
+            worker = pool.get_stats()["workers"][0]
+            assert worker["ready"] and worker["pid"] != old_pid
+            assert pool.submit(_frame(3), 3)
+            result = None
+            while result is None and time.time() < deadline:
+                result = pool.get(timeout=0.05)
+            assert result is not None and result[0] == 3
+        finally:
+            pool.close()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+OverlayRenderer 单元测试
+
+测试缓冲区复用、原始帧不被修改、关注类别过滤以及 HUD 文本与原 putText 绘制一致
+"""
+import cv2
+import numpy as np
+
+from services import config
+from services.overlay_renderer import OverlayRenderer
+
+
+def _box(label, x1=100, y1=100, x2=200, y2=220, conf=0.8):
+    return {"label": label, "conf": conf, "x1": x1, "y1": y1, "x2": x2, "y2": y2}
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+
+ALERT_LABEL = sorted(config.ALERT_CLASSES)[0]
+
+
+class TestOverlayRenderer:
+
+    def test_frame_untouched_and_buffer_reused(self):
+        frame = _frame()
+        orig = frame.copy()
+        r = OverlayRenderer()
+        out1 = r.render(frame, [_box(ALERT_LABEL)], 20.0, 50.0, 2)
+        out2 = r.render(frame, [], 20.0, 50.0, 0)
+        assert np.array_equal(frame, orig)
+        assert out1 is out2
+
+    def test_hud_text_matches_putText(self):
+        """无检测框时输出与原先逐帧 putText 的 HUD 逐像素一致"""
+        frame = _frame()
+        out = OverlayRenderer().render(frame, [], 19.5, 83.0, 3)
+        expected = frame.copy()
+        cv2.putText(expected, "FPS: 19.5", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(expected, "Delay: 83 ms", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(expected, "Count: 0", (10, 75), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(expected, "ALERT L3", (10, 105), cv2.FONT_HERSHEY_SIMPLEX, 0.85, (0, 0, 255), 2)
+        assert np.array_equal(out, expected)
+
+    def test_only_alert_classes_drawn(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        r = OverlayRenderer()
+        region = (slice(300, 480), slice(300, 640))
+        other = _box("__not_an_alert_class__", 350, 350, 500, 450)
+        assert not r.render(frame, [other], 0.0, 0.0, 0)[region].any()
+        assert r.render(frame, [_box(ALERT_LABEL, 350, 350, 500, 450)], 0.0, 0.0, 0)[region].any()
+
+    def test_search_box_drawn(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        target = _box("cup", 350, 350, 500, 450)
+        out = OverlayRenderer().render(frame, [target], 0.0, 0.0, 0, search_box=target)
+        # 寻物目标框为洋红色
+        assert (out[350:450, 350:500] == (255, 0, 255)).all(axis=2).any()
+
+    def test_alert_line_only_when_level(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        r = OverlayRenderer()
+        alert_row = (slice(88, 112), slice(0, 200))
+        assert not r.render(frame, [], 0.0, 0.0, 0)[alert_row][..., 2].any()
+        assert r.render(frame, [], 0.0, 0.0, 1)[alert_row][..., 2].any()
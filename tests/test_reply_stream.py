@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+ReplyStream / SentenceSplitter 单元测试
+
+测试流式回复的增量断句与超时
+"""
+import threading
+import time
+import pytest
+
+from services.reply_stream import ReplyStream, SentenceSplitter
+
+
+class TestSentenceSplitter:
+    def test_split_incrementally(self):
+        splitter = SentenceSplitter(min_chars=2)
+        assert splitter.feed("前方有一") == []
+        assert splitter.feed("个人。右边有") == ["前方有一个人。"]
+        assert splitter.feed("椅子！") == ["右边有椅子！"]
+        assert splitter.flush() is None
+
+    def test_short_sentences_merged(self):
+        """过短的句子与下一句合并"""
+        splitter = SentenceSplitter(min_chars=4)
+        assert splitter.feed("好。前方有台阶。") == ["好。前方有台阶。"]
+
+    def test_flush_tail(self):
+        splitter = SentenceSplitter()
+        splitter.feed("前方畅通")
+        assert splitter.flush() == "前方畅通"
+
+
+class TestReplyStream:
+    def test_sentences_while_producing(self):
+        """生产者边推送，消费者边取句"""
+        stream = ReplyStream()
+
+        def producer():
+            for delta in ["前方有", "一个人。", "右边有", "一把椅子。"]:
+                stream.push(delta)
+                time.sleep(0.01)
+            stream.close()
+
+        threading.Thread(target=producer).start()
+        assert list(stream.sentences(first_timeout=1, idle_timeout=1)) == ["前方有一个人。", "右边有一把椅子。"]
+        assert stream.text == "前方有一个人。右边有一把椅子。"
+
+    def test_first_timeout(self):
+        stream = ReplyStream()
+        with pytest.raises(TimeoutError):
+            list(stream.sentences(first_timeout=0.05))
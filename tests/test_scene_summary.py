@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+SceneSummarizer 单元测试
+
+测试本地场景摘要的中文描述生成与升级 (VLM) 规则
+"""
+import time
+import pytest
+
+from services.scene_summary import SceneSummarizer
+
+
+def _box(label, x1, y1, x2, y2, conf=0.9):
+    return {"label": label, "conf": conf, "x1": x1, "y1": y1, "x2": x2, "y2": y2}
+
+
+class TestSceneSummary:
+    """测试 summarize 的中文描述"""
+
+    def test_empty_boxes(self):
+        """无检测结果时返回空描述"""
+        text, conf = SceneSummarizer().summarize([], 640, 480)
+        assert text == ""
+        assert conf == 0.0
+
+    def test_people_on_both_sides(self):
+        """两个人分别在左边和正前方"""
+        boxes = [_box("person", 10, 100, 60, 200), _box("person", 300, 100, 340, 200)]
+        text, conf = SceneSummarizer().summarize(boxes, 640, 480)
+        assert text.startswith("前方有两个人")
+        assert "左边一个" in text
+        assert "正前方一个" in text
+        assert conf == pytest.approx(0.9)
+
+    def test_single_position_and_near(self):
+        """单一方向的大目标应提示距离较近"""
+        boxes = [_box("chair", 450, 100, 640, 400)]
+        text, _ = SceneSummarizer().summarize(boxes, 640, 480)
+        assert text == "右边有一把椅子，距离较近。"
+
+    def test_alert_class_first(self):
+        """关注类别 (person) 优先播报"""
+        boxes = [_box("chair", 0, 0, 400, 400), _box("person", 300, 100, 340, 200)]
+        text, _ = SceneSummarizer().summarize(boxes, 640, 480)
+        assert text.index("人") < text.index("椅子")
+
+
+class TestSceneAnswerRule:
+    """测试本地回答与升级 VLM 的置信度规则"""
+
+    def test_confident_answer(self):
+        boxes = [_box("person", 300, 100, 340, 200)]
+        reply = SceneSummarizer().answer("前面有什么", boxes, 640, 480, time.time())
+        assert reply == "正前方有一个人。"
+
+    def test_escalate_reading(self):
+        """读字类问题必须交给 VLM"""
+        boxes = [_box("book", 300, 100, 340, 200)]
+        assert SceneSummarizer().answer("帮我读一下", boxes, 640, 480, time.time()) is None
+
+    def test_escalate_stale(self):
+        """检测结果过期时交给 VLM"""
+        boxes = [_box("person", 300, 100, 340, 200)]
+        assert SceneSummarizer().answer("前面有什么", boxes, 640, 480, time.time() - 10) is None
+
+    def test_escalate_low_confidence(self):
+        boxes = [_box("person", 300, 100, 340, 200, conf=0.36)]
+        assert SceneSummarizer().answer("前面有什么", boxes, 640, 480, time.time()) is None
+
+    def test_escalate_no_detection(self):
+        assert SceneSummarizer().answer("前面有什么", [], 640, 480, time.time()) is None
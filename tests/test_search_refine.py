@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+寻物精搜 (ROI 二次推理) 单元测试
+
+使用记录裁剪区域的假视觉服务，测试候选/跟踪/扫描三种裁剪方式与坐标映射，
+以及 VisionService.predict_region 的类别过滤与坐标还原
+"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from services import config
+from services.search_refine import SearchRefiner
+from services.vision_service import VisionService
+
+W, H = 640, 480
+
+
+def _box(label, x1, y1, x2, y2, conf=0.5):
+    return {"label": label, "conf": conf, "x1": x1, "y1": y1, "x2": x2, "y2": y2}
+
+
+class FakeVision:
+    """在 hits 指定的位置 (全帧坐标) 放置目标，落在裁剪区域内即检出"""
+
+    def __init__(self, hits=()):
+        self.hits = list(hits)
+        self.rois = []
+
+    def predict_region(self, frame, roi, target_class):
+        self.rois.append(roi)
+        x1, y1, x2, y2 = roi
+        found = [b for b in self.hits
+                 if b["label"] == target_class and x1 <= b["x1"] and b["x2"] <= x2 and y1 <= b["y1"] and b["y2"] <= y2]
+        return [dict(b) for b in found], 4.0
+
+
+def _frame():
+    return np.zeros((H, W, 3), dtype=np.uint8)
+
+
+class TestSearchRefiner:
+
+    def test_large_target_skips_refine(self):
+        vision = FakeVision()
+        refiner = SearchRefiner(vision)
+        big = _box("remote", 200, 150, 400, 350)  # 面积占比约 0.13
+        assert refiner.refine(_frame(), [big], "remote", 1.0) == []
+        assert vision.rois == [] and refiner.skipped == 1
+
+    def test_candidate_centered_crop(self):
+        small = _box("remote", 500, 100, 520, 112)
+        vision = FakeVision([small])
+        refiner = SearchRefiner(vision)
+        refined = refiner.refine(_frame(), [small], "remote", 1.0)
+        x1, y1, x2, y2 = vision.rois[0]
+        side = int(min(W, H) * config.SEARCH_REFINE_CROP)
+        assert x2 - x1 == side and y2 - y1 == side
+        assert x1 <= 500 and 520 <= x2 and y1 <= 100 and 112 <= y2
+        assert refined == [small] and refiner.runs["candidate"] == 1 and refiner.rescued == 0
+
+    def test_track_last_location_then_scan(self):
+        small = _box("cell phone", 40, 400, 60, 420)
+        vision = FakeVision([small])
+        refiner = SearchRefiner(vision)
+        refiner.refine(_frame(), [small], "cell phone", 1.0)
+        # 全图漏检：在最近一次出现的位置附近精搜
+        refined = refiner.refine(_frame(), [], "cell phone", 1.5)
+        assert refined and refiner.runs["track"] == 1 and refiner.rescued == 1
+        # 位置过期：改为扫描
+        vision.hits = []
+        refiner.refine(_frame(), [], "cell phone", 1.5 + config.SEARCH_REFINE_TRACK_S + 0.1)
+        assert refiner.runs["scan"] == 1
+
+    def test_scan_covers_frame(self):
+        vision = FakeVision()
+        refiner = SearchRefiner(vision)
+        side = int(min(W, H) * config.SEARCH_REFINE_CROP)
+        tiles = -(-W // side) * -(-H // side)
+        for i in range(tiles):
+            refiner.refine(_frame(), [], "remote", float(i))
+        covered = np.zeros((H, W), dtype=bool)
+        for x1, y1, x2, y2 in vision.rois:
+            assert 0 <= x1 and x2 <= W and 0 <= y1 and y2 <= H
+            covered[y1:y2, x1:x2] = True
+        assert covered.all()
+
+    def test_scan_finds_small_object(self):
+        hidden = _box("remote", 600, 20, 615, 28)
+        vision = FakeVision([hidden])
+        refiner = SearchRefiner(vision)
+        for i in range(6):
+            if refiner.refine(_frame(), [], "remote", float(i) * 0.1):
+                break
+        assert refiner.rescued == 1
+        # 找到后转入跟踪
+        refiner.refine(_frame(), [], "remote", 1.0)
+        assert refiner.runs["track"] == 1
+
+    def test_target_change_resets(self):
+        small = _box("remote", 40, 400, 60, 420)
+        refiner = SearchRefiner(FakeVision([small]))
+        refiner.refine(_frame(), [small], "remote", 1.0)
+        refiner.refine(_frame(), [], "cup", 1.1)
+        assert refiner.runs["scan"] == 1 and refiner.get_stats()["target"] == "cup"
+
+
+class FakeModel:
+    names = {0: "person", 65: "remote"}
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, **kwargs):
+        self.calls.append((source.shape, kwargs))
+        boxes = SimpleNamespace(xyxy=torch.tensor([[10.0, 20.0, 30.0, 40.0]]),
+                                conf=torch.tensor([0.4]), cls=torch.tensor([65.0]))
+        return [SimpleNamespace(boxes=boxes)]
+
+
+class TestPredictRegion:
+
+    def _vision(self):
+        vision = VisionService.__new__(VisionService)
+        vision.model = FakeModel()
+        vision.use_half = False
+        vision.class_ids = {name: cls for cls, name in vision.model.names.items()}
+        vision._predict_lock = threading.Lock()
+        return vision
+
+    def test_class_filter_and_offset(self):
+        vision = self._vision()
+        boxes, _ = vision.predict_region(_frame(), (100, 50, 340, 290), "remote")
+        shape, kwargs = vision.model.calls[0]
+        assert shape == (240, 240, 3)
+        assert kwargs["classes"] == [65] and kwargs["imgsz"] == config.SEARCH_REFINE_IMG_SIZE
+        assert boxes == [_box("remote", 110.0, 70.0, 130.0, 90.0, conf=boxes[0]["conf"])]
+
+    def test_unknown_class(self):
+        vision = self._vision()
+        assert vision.predict_region(_frame(), (0, 0, 100, 100), "unicorn") == ([], 0.0)
+        assert vision.model.calls == []
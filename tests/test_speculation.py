@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+SpeculationPolicy 单元测试
+
+测试投机视觉请求的启动、取消、升级逻辑与统计
+"""
+import concurrent.futures
+import threading
+
+from services.speculation import SpeculationPolicy, SpeculativeRequest
+
+
+class TestSpeculationPolicy:
+    """测试意图分类与决策"""
+
+    def test_classify(self):
+        policy = SpeculationPolicy()
+        assert policy.classify("帮我找手机") == "command"
+        assert policy.classify("停止") == "command"
+        assert policy.classify("前面有什么") == "vision"
+        assert policy.classify("你好") == "unknown"
+
+    def test_decide(self):
+        policy = SpeculationPolicy()
+        assert policy.decide("前面", started=False) == "start"
+        assert policy.decide("找手", started=True) == "cancel"
+        assert policy.decide("你好", started=True) == "keep"
+
+    def test_prior_follows_history(self):
+        """连续的非视觉指令会降低先验，不再提前启动"""
+        policy = SpeculationPolicy()
+        for _ in range(5):
+            policy.observe("找手机")
+        assert not policy.should_start_early()
+        for _ in range(10):
+            policy.observe("前面有什么")
+        assert policy.should_start_early()
+        assert not policy.should_start_early(search_active=True)
+
+
+class TestSpeculativeRequest:
+    """测试单次投机请求的生命周期统计"""
+
+    def _make(self, policy, gate=None):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        def job(begin_send):
+            if gate:
+                gate.wait(1)
+            return "ok" if begin_send() else None
+
+        return SpeculativeRequest(policy, lambda begin_send: executor.submit(job, begin_send))
+
+    def test_upgrade_and_use(self):
+        policy = SpeculationPolicy()
+        req = self._make(policy)
+        req.on_partial("前面")
+        future = req.take()
+        assert future.result(timeout=1) == "ok"
+        req.discard()
+        stats = policy.get_stats()
+        assert stats["upgraded"] == 1
+        assert stats["used"] == 1
+        assert stats["wasted"] == 0
+
+    def test_cancel_before_send(self):
+        """请求尚未发出时取消，不计为浪费"""
+        policy = SpeculationPolicy()
+        gate = threading.Event()
+        req = self._make(policy, gate)
+        req.start("early")
+        req.on_partial("找手机")
+        gate.set()
+        stats = policy.get_stats()
+        assert stats["cancelled"] == 1
+        assert stats["wasted"] == 0
+
+    def test_wasted_after_send(self):
+        policy = SpeculationPolicy()
+        req = self._make(policy)
+        req.start("early")
+        req.future.result(timeout=1)
+        req.discard()
+        assert policy.get_stats()["wasted"] == 1
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+AppState 快照发布与 AlertFilter 单元测试
+
+测试不可变快照的一致性、寻物状态的过期写保护以及警报迟滞/冷却逻辑
+"""
+import dataclasses
+import threading
+import numpy as np
+import pytest
+
+from services import config
+from services.state import AppState
+from services.alert_filter import AlertFilter
+
+
+class TestSnapshots:
+    """测试按领域发布的不可变快照"""
+
+    def test_snapshot_is_frozen(self):
+        state = AppState()
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            state.search.active = True
+
+    def test_frame_snapshot(self):
+        state = AppState()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        state.update_frame(frame, 12.5)
+        snap = state.frame
+        assert snap.shape == (480, 640)
+        assert state.get_frame() == (frame, 12.5)
+
+    def test_reader_keeps_old_snapshot(self):
+        """读者持有的旧快照不会被之后的发布修改"""
+        state = AppState()
+        state.update_detection([{"label": "person"}], 10.0, 100.0, 20.0)
+        old = state.detection
+        state.update_detection([], 5.0, 200.0, 10.0)
+        assert old.count == 1
+        assert old.infer_ms == 10.0
+        assert state.detection.count == 0
+
+    def test_ui_data(self):
+        state = AppState()
+        state.update_frame(np.zeros((240, 320, 3), dtype=np.uint8), 1.0)
+        state.update_detection([{"label": "chair"}], 8.0, 125.0, 30.0)
+        state.update_alert(2, "注意", None, True)
+        data = state.get_ui_data()
+        assert data["shape"] == {"h": 240, "w": 320}
+        assert data["count"] == 1
+        assert data["alert_level"] == 2
+        assert data["should_notify"] is True
+
+    def test_voice_log_concurrent_append(self):
+        """多个写者并发追加日志时不丢失更新，且只保留最近 10 条"""
+        state = AppState()
+
+        def writer(n):
+            for i in range(50):
+                state.add_voice_log("user", f"{n}-{i}")
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(state.voice.log) == 10
+
+    def test_stale_search_update_ignored(self):
+        """寻物结束或换目标后，处理循环基于旧快照的写入会被忽略"""
+        state = AppState()
+        state.start_search("cup", "杯子")
+        started = state.search.started_ts
+        state.stop_search()
+        state.update_search_target({"distance": "near"}, started_ts=started)
+        assert state.search.target_info is None
+        assert state.get_search_state()["active"] is False
+
+        state.start_search("cup", "杯子")
+        state.update_search_target({"distance": "near"}, started_ts=state.search.started_ts)
+        assert state.get_ui_data()["search_info"] == {"distance": "near"}
+
+
+class TestAlertFilter:
+    """测试警报迟滞与冷却"""
+
+    def test_hysteresis(self):
+        f = AlertFilter()
+        for _ in range(config.ALERT_CONSECUTIVE_ON - 1):
+            assert f.update(2, "注意", None)[0] == 0
+        assert f.update(2, "注意", None)[0] == 2
+        assert f.just_triggered
+        for _ in range(config.ALERT_CONSECUTIVE_OFF - 1):
+            assert f.update(0, "", None)[0] == 2
+        assert f.update(0, "", None) == (0, "", None)
+
+    def test_cooldown(self):
+        f = AlertFilter()
+        assert f.ready(1, 100.0)
+        f.mark_emitted(1, 100.0)
+        assert not f.ready(1, 100.0)
+        later = 100.0 + max(config.ALERT_COOLDOWN[1], config.ALERT_REPEAT_MIN[1])
+        assert f.ready(1, later)
+
+
+class TestStateVersion:
+    """测试状态版本号与长轮询等待"""
+
+    def test_version_bumps_on_publish(self):
+        state = AppState()
+        v0 = state.version
+        state.add_voice_log("user", "你好")
+        assert state.version == v0 + 1
+        assert state.get_ui_data()["version"] == state.version
+
+    def test_unchanged_publish_keeps_version(self):
+        """内容未变的发布与心跳不改变版本号"""
+        state = AppState()
+        state.update_alert(0, "", None, False)
+        state.update_voice_state("idle")
+        state.heartbeat()
+        assert state.version == 0
+
+    def test_wait_for_version_timeout(self):
+        state = AppState()
+        assert state.wait_for_version(0, timeout=0.05) == 0
+
+    def test_wait_for_version_wakes_on_change(self):
+        state = AppState()
+        timer = threading.Timer(0.05, state.start_search, args=("cup", "杯子"))
+        timer.start()
+        assert state.wait_for_version(0, timeout=5.0) == 1
+        timer.join()
+
+    def test_wait_for_version_after_restart(self):
+        """客户端持有的版本号比服务端新 (服务重启) 时立即返回"""
+        state = AppState()
+        assert state.wait_for_version(100, timeout=5.0) == 0
+
+    def test_version_listener(self):
+        state = AppState()
+        seen = []
+        state.add_version_listener(seen.append)
+        state.start_search("cup", "杯子")
+        state.update_alert(0, "", None, False)  # 未变化，不通知
+        assert seen == [1]
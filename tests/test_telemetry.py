@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+HUD 推送增量与预序列化缓存单元测试
+
+测试 UI 数据增量计算、SSE 消息格式以及按版本缓存的序列化结果
+"""
+import json
+import numpy as np
+
+from services.state import AppState
+from services.telemetry import ui_delta, has_changes, format_sse, dumps, PayloadCache, overlay_payload
+
+
+class TestUIDelta:
+    """测试快照之间的增量"""
+
+    def test_first_message_is_full(self):
+        data = AppState().get_ui_data()
+        assert ui_delta(None, data) == data
+
+    def test_only_changed_fields(self):
+        state = AppState()
+        prev = state.get_ui_data()
+        state.update_alert(3, "危险", {"label": "person"}, True)
+        delta = ui_delta(prev, state.get_ui_data())
+        assert set(delta) == {"version", "ts", "alert_level", "alert_text", "alert_target", "should_notify"}
+        assert has_changes(delta)
+
+    def test_no_changes(self):
+        data = AppState().get_ui_data()
+        delta = ui_delta(data, dict(data))
+        assert not has_changes(delta)
+
+    def test_voice_log_delta(self):
+        state = AppState()
+        prev = state.get_ui_data()
+        state.add_voice_log("assistant", "前方有一个人")
+        delta = ui_delta(prev, state.get_ui_data())
+        assert delta["voice_log"][-1]["content"] == "前方有一个人"
+
+
+class TestFormatSSE:
+    def test_format(self):
+        msg = format_sse("delta", 7, dumps({"version": 7, "alert_text": "注意"})).decode("utf-8")
+        lines = msg.split("\n")
+        assert lines[0] == "event: delta"
+        assert lines[1] == "id: 7"
+        assert json.loads(lines[2][len("data: "):]) == {"version": 7, "alert_text": "注意"}
+        assert msg.endswith("\n\n")
+
+
+def _parse(msg):
+    """解析 SSE 消息为 (event, data)"""
+    lines = msg.decode("utf-8").split("\n")
+    return lines[0][len("event: "):], json.loads(lines[2][len("data: "):])
+
+
+class TestPayloadCache:
+    """测试每个版本只序列化一次"""
+
+    def test_serialize_once_per_version(self):
+        state = AppState()
+        cache = PayloadCache(state)
+        v1, body1 = cache.current()
+        v2, body2 = cache.current()
+        assert v1 == v2
+        assert body1 is body2
+        assert json.loads(body1)["version"] == v1
+        assert cache.get_stats()["serializations"] == 1
+
+        state.add_voice_log("user", "你好")
+        v3, body3 = cache.current()
+        assert v3 == v1 + 1
+        assert json.loads(body3)["voice_log"][0]["content"] == "你好"
+        assert cache.get_stats()["serializations"] == 2
+
+    def test_shared_delta_event(self):
+        state = AppState()
+        cache = PayloadCache(state)
+        since, _ = cache.snapshot_event()
+        state.update_alert(2, "注意", None, False)
+        v, msg1 = cache.delta_event(since)
+        _, msg2 = cache.delta_event(since)
+        assert msg1 is msg2
+        event, data = _parse(msg1)
+        assert event == "delta"
+        assert data["version"] == v
+        assert data["alert_level"] == 2
+        assert "voice_log" not in data
+
+    def test_unknown_since_returns_snapshot(self):
+        state = AppState()
+        cache = PayloadCache(state)
+        state.add_voice_log("user", "你好")
+        _, msg = cache.delta_event(12345)
+        event, data = _parse(msg)
+        assert event == "snapshot"
+        assert "voice_log" in data
+
+    def test_up_to_date(self):
+        cache = PayloadCache(AppState())
+        v, _ = cache.current()
+        assert cache.delta_event(v) == (v, b"")
+
+
+class TestOverlay:
+    """测试按帧序号对齐的叠加数据"""
+
+    def test_overlay_payload(self):
+        state = AppState()
+        seq = state.update_frame(np.zeros((240, 320, 3), dtype=np.uint8), 1.0, b"jpg")
+        box = {"label": "person", "conf": 0.876, "x1": 10.4, "y1": 20.0, "x2": 50.0, "y2": 90.0}
+        state.update_alert(2, "注意", dict(box, level=2), False)
+        state.update_detection([box], 8.0, 125.0, 30.0, seq)
+        o = overlay_payload(state)
+        assert o["seq"] == seq == 1
+        assert (o["w"], o["h"]) == (320, 240)
+        assert o["b"] == [[10, 20, 50, 90, "person", 0.88]]
+        assert o["lv"] == 2
+        assert o["at"] == [10, 20, 50, 90]
+        assert o["st"] is None
+
+    def test_overlay_event_cached_per_frame(self):
+        state = AppState()
+        cache = PayloadCache(state)
+        seq = state.update_frame(np.zeros((240, 320, 3), dtype=np.uint8), 1.0)
+        state.update_detection([], 8.0, 125.0, 30.0, seq)
+        s1, m1 = cache.overlay_event()
+        state.add_voice_log("user", "你好")  # 与检测无关的发布不产生新的叠加消息
+        s2, m2 = cache.overlay_event()
+        assert s1 == s2 == seq
+        assert m1 is m2
+        assert _parse(m1)[0] == "overlay"
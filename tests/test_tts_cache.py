@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+TTSCache 单元测试
+
+测试内容寻址键、内存 LRU、磁盘持久化与磁盘容量淘汰
+"""
+import os
+
+from services.tts_cache import TTSCache
+
+
+class TestTTSCache:
+    def test_key_depends_on_voice_and_format(self):
+        assert TTSCache.key("你好", "Cherry") != TTSCache.key("你好", "zh-CN-YunxiNeural")
+        assert TTSCache.key("你好", "Cherry", "a") != TTSCache.key("你好", "Cherry", "b")
+
+    def test_put_and_get(self, tmp_path):
+        cache = TTSCache(cache_dir=tmp_path)
+        assert cache.get("寻物模式已关闭", "Cherry") is None
+        cache.put("寻物模式已关闭", "Cherry", b"\x01\x02")
+        assert cache.get("寻物模式已关闭", "Cherry") == b"\x01\x02"
+        assert cache.get_stats()["memory_hits"] == 1
+
+    def test_persisted_across_instances(self, tmp_path):
+        """磁盘缓存在重启后依然可用"""
+        TTSCache(cache_dir=tmp_path).put("视觉服务响应超时", "Cherry", b"pcm")
+        cache = TTSCache(cache_dir=tmp_path)
+        assert cache.contains("视觉服务响应超时", "Cherry")
+        assert cache.get("视觉服务响应超时", "Cherry") == b"pcm"
+        assert cache.get_stats()["disk_hits"] == 1
+
+    def test_memory_lru_bounded(self, tmp_path):
+        cache = TTSCache(cache_dir=tmp_path, max_items=2)
+        for i in range(5):
+            cache.put(f"phrase {i}", "Cherry", b"x")
+        assert cache.get_stats()["memory_items"] == 2
+
+    def test_disk_budget_evicts_least_recently_used(self, tmp_path):
+        cache = TTSCache(cache_dir=tmp_path, max_disk_bytes=250)
+        paths = []
+        for i in range(3):
+            cache.put(f"phrase {i}", "Cherry", b"x" * 100)
+            paths.append(tmp_path / f"{TTSCache.key(f'phrase {i}', 'Cherry')}.pcm")
+            if i < 2:
+                os.utime(paths[i], (1000 + i, 1000 + i))
+        # 写入第三条时超出上限，最久未用的 phrase 0 从磁盘淘汰
+        assert [p.exists() for p in paths] == [False, True, True]
+        assert cache.get_stats()["disk_bytes"] == 200
+        assert cache.get_stats()["evicted"] == 1
+
+    def test_disk_budget_applied_on_start(self, tmp_path):
+        for i in range(4):
+            (tmp_path / f"{i:040x}.pcm").write_bytes(b"x" * 100)
+        cache = TTSCache(cache_dir=tmp_path, max_disk_bytes=200)
+        assert cache.get_stats()["disk_bytes"] == 200
+        assert len(list(tmp_path.glob("*.pcm"))) == 2
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+MJPEGBroadcaster 单元测试
+
+测试 multipart 数据共享、一格邮箱丢帧策略、占位图与多档位编码
+"""
+import cv2
+import numpy as np
+
+from services import config
+from services.video_broadcaster import MJPEGBroadcaster, make_chunk, resolve_profile, encode_variant
+
+
+class TestBroadcaster:
+
+    def test_placeholder_first(self):
+        hub = MJPEGBroadcaster(timeout=0.01)
+        gen = hub.stream()
+        first = next(gen)
+        assert first.startswith(b"--frame\r\nContent-Type: image/jpeg")
+        assert first is hub.placeholder  # 占位图只编码一次
+        assert next(gen) is hub.placeholder  # 超时后重发
+        gen.close()
+        assert hub.client_count == 0
+
+    def test_chunk_shared_between_clients(self):
+        hub = MJPEGBroadcaster(timeout=1.0)
+        a, b = hub.stream(), hub.stream()
+        next(a), next(b)
+        hub.publish(b"jpeg-1")
+        ca, cb = next(a), next(b)
+        assert ca == make_chunk(b"jpeg-1")
+        assert ca is cb
+        a.close(), b.close()
+
+    def test_slow_client_drops_old_frames(self):
+        hub = MJPEGBroadcaster(timeout=1.0)
+        gen = hub.stream()
+        next(gen)
+        for i in range(5):
+            hub.publish(f"jpeg-{i}".encode())
+        assert next(gen) == make_chunk(b"jpeg-4")
+        stats = hub.get_stats()
+        assert stats["clients"] == 1
+        assert stats["per_client"][0]["dropped"] == 4
+        assert stats["per_client"][0]["sent"] == 1
+        gen.close()
+
+    def test_new_client_gets_latest_frame(self):
+        hub = MJPEGBroadcaster()
+        hub.publish(b"jpeg")
+        gen = hub.stream()
+        assert next(gen) == make_chunk(b"jpeg")
+        gen.close()
+
+
+class TestProfiles:
+
+    def test_resolve_profile(self):
+        assert resolve_profile("low") == "low"
+        assert resolve_profile("bogus") == config.VIDEO_DEFAULT_PROFILE
+        assert resolve_profile(None) == config.VIDEO_DEFAULT_PROFILE
+        assert resolve_profile(None, kbps=config.VIDEO_PROFILES["mid"]["kbps"]) == "mid"
+        assert resolve_profile(None, kbps=1) == "low"
+
+    def test_encode_variant_downscales(self):
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        jpg = encode_variant(img, "low")
+        decoded = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape[1] == config.VIDEO_PROFILES["low"]["max_width"]
+        assert decoded.shape[1] / decoded.shape[0] == 640 / 480
+
+    def test_only_subscribed_profiles_encoded(self):
+        hub = MJPEGBroadcaster(timeout=1.0)
+        img = np.zeros((240, 320, 3), dtype=np.uint8)
+        assert hub.publish_frame(img) == {}
+
+        a, b = hub.stream("low"), hub.stream("low")
+        next(a), next(b)
+        jpgs = hub.publish_frame(img)
+        assert set(jpgs) == {"low"}
+        assert hub.get_stats()["encodes"]["low"] == 1
+        assert next(a) is next(b)
+        a.close(), b.close()
+        assert hub.active_profiles() == set()
+
+
+class TestRenderDemand:
+
+    def test_wants_frames(self):
+        hub = MJPEGBroadcaster(timeout=0.01)
+        assert not hub.wants_frames
+        gen = hub.stream("mid")
+        next(gen)
+        assert hub.wants_frames
+        gen.close()
+        assert not hub.wants_frames
+
+    def test_saved_render_time(self):
+        hub = MJPEGBroadcaster()
+        hub.record_render(12.0)
+        hub.record_skip()
+        hub.record_skip()
+        render = hub.get_stats()["render"]
+        assert render["rendered"] == 1
+        assert render["skipped"] == 2
+        assert render["saved_ms"] == 24.0
+
+
+class TestRawPassthrough:
+
+    def test_raw_client_does_not_need_render(self):
+        hub = MJPEGBroadcaster(timeout=1.0)
+        gen = hub.stream("raw")
+        next(gen)
+        assert not hub.wants_frames
+        assert hub.active_profiles() == set()
+
+        hub.publish_raw(b"camera-jpeg", 42)
+        chunk = next(gen)
+        assert b"X-Frame-Seq: 42\r\n" in chunk
+        assert chunk.endswith(b"camera-jpeg\r\n")
+        gen.close()
+
+    def test_publish_raw_without_subscribers(self):
+        hub = MJPEGBroadcaster()
+        hub.publish_raw(b"camera-jpeg", 1)
+        gen = hub.stream("raw")
+        assert next(gen) is hub.placeholder
+        gen.close()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+VisionDescriptionCache 单元测试
+
+测试感知哈希、相似度匹配、TTL 与 LRU 淘汰
+"""
+import numpy as np
+
+from services.vision_cache import VisionDescriptionCache, dhash, hamming
+
+
+def _scene(seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (12, 16, 3), dtype=np.uint8)
+    return np.kron(small, np.ones((40, 40, 1), dtype=np.uint8))
+
+
+class TestDHash:
+    def test_similar_frames_close(self):
+        """轻微噪声不应明显改变哈希"""
+        frame = _scene(1)
+        noisy = np.clip(frame.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+        assert hamming(dhash(frame), dhash(noisy)) <= 6
+
+    def test_different_frames_far(self):
+        assert hamming(dhash(_scene(1)), dhash(_scene(2))) > 6
+
+
+class TestVisionDescriptionCache:
+    def test_hit_and_miss(self):
+        cache = VisionDescriptionCache(max_entries=4, ttl=30, threshold=6)
+        h = dhash(_scene(1))
+        assert cache.get(h, "p") is None
+        cache.put(h, "p", "前方有一个人")
+        assert cache.get(h, "p") == "前方有一个人"
+        assert cache.get(h, "other prompt") is None
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_labels_must_match(self):
+        cache = VisionDescriptionCache()
+        cache.put(1, "p", "text", ["person", "chair"])
+        assert cache.get(1, "p", ["chair", "person"]) == "text"
+        assert cache.get(1, "p", ["person"]) is None
+
+    def test_ttl_expiry(self):
+        cache = VisionDescriptionCache(ttl=0.0)
+        cache.put(1, "p", "text")
+        assert cache.get(1, "p") is None
+
+    def test_lru_eviction(self):
+        cache = VisionDescriptionCache(max_entries=2, threshold=0)
+        cache.put(1, "p", "a")
+        cache.put(2, "p", "b")
+        cache.get(1, "p")      # 1 变为最近使用
+        cache.put(4, "p", "c")  # 淘汰 2
+        assert cache.get(2, "p") is None
+        assert cache.get(1, "p") == "a"
@@ -211,3 +211,39 @@ class TestLocateTarget:
         small_box = [{"label": "cup", "conf": 0.9, "x1": 300, "y1": 200, "x2": 340, "y2": 240}]
         result = self.locate_target_standalone(small_box, "cup", 640, 480)
         assert result["distance"] == "far"
+
+
+class TestPredictSerialized:
+    """批量调度线程与处理循环 (大帧回退) 共用一个 ultralytics predictor，推理调用必须串行"""
+
+    def test_predict_and_batch_never_overlap(self):
+        import threading
+        import time
+        from types import SimpleNamespace
+        from services.vision_service import VisionService
+
+        class FakeModel:
+            names = {0: "person"}
+            active = 0
+            max_active = 0
+
+            def predict(self, source, **kwargs):
+                FakeModel.active += 1
+                FakeModel.max_active = max(FakeModel.max_active, FakeModel.active)
+                time.sleep(0.002)
+                FakeModel.active -= 1
+                n = len(source) if isinstance(source, list) else 1
+                return [SimpleNamespace(boxes=None)] * n
+
+        vision = VisionService.__new__(VisionService)
+        vision.model = FakeModel()
+        vision.use_half = False
+        vision._predict_lock = threading.Lock()
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+
+        batch = threading.Thread(target=lambda: [vision.predict_batch([frame, frame]) for _ in range(50)])
+        batch.start()
+        for _ in range(50):
+            vision.predict(frame)
+        batch.join()
+        assert FakeModel.max_active == 1